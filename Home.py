@@ -3,6 +3,9 @@
 
 import streamlit as st
 from datetime import datetime
+from utils.db_manager import init_db, harvest_trend, planting_status_counts, query_harvest_sessions
+from utils.db_backup import start_backup_scheduler
+from utils.db_maintenance import start_maintenance_scheduler
 
 # ========== PAGE CONFIG ==========
 st.set_page_config(
@@ -12,6 +15,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Once per rerun: migrations (first run only), rerun stats, background jobs
+init_db()
+start_backup_scheduler()
+start_maintenance_scheduler()
+
 # ========== CUSTOM STYLING ==========
 st.markdown("""
 <style>
@@ -186,6 +194,7 @@ if 'house_database' in st.session_state and st.session_state.house_database:
     st.markdown("#### 🏠 Status per House")
     
     house_cols = st.columns(min(4, num_houses))
+    schedule_counts = planting_status_counts(by_house=True)
     
     for idx, (key, house) in enumerate(house_db.items()):
         col_idx = idx % 4
@@ -193,13 +202,12 @@ if 'house_database' in st.session_state and st.session_state.house_database:
             beds = house.get('beds', 12)
             plants = house.get('total_plants', 0)
             
-            # Status from planting_schedule if exists
+            # Most common bed status of this house in the planting schedule
             status = "⏳ Siap"
-            if 'planting_schedule' in st.session_state:
-                for entry in st.session_state.planting_schedule:
-                    if entry.get('house') == house.get('name'):
-                        status = f"🌱 {entry.get('status', 'aktif').capitalize()}"
-                        break
+            house_status = schedule_counts[schedule_counts['house'] == house.get('name')]
+            if not house_status.empty:
+                top_status = house_status.sort_values('beds', ascending=False).iloc[0]['status']
+                status = f"🌱 {top_status.capitalize()}"
             
             st.markdown(f"""
             <div style="background: rgba(16, 185, 129, 0.1); padding: 1rem; border-radius: 12px; text-align: center;">
@@ -237,14 +245,11 @@ if 'house_database' in st.session_state and st.session_state.house_database:
         st.metric("📊 Margin", f"{margin:.1f}%")
     
     # Harvest history if exists
-    if 'harvest_sessions' in st.session_state and st.session_state.harvest_sessions:
+    harvest_df = query_harvest_sessions(limit=5)  # Last 5
+    if not harvest_df.empty:
         st.markdown("---")
         st.markdown("#### 🌾 Riwayat Panen Terbaru")
-        
-        import pandas as pd
-        harvest_df = pd.DataFrame(st.session_state.harvest_sessions[-5:])  # Last 5
-        if not harvest_df.empty:
-            st.dataframe(harvest_df, use_container_width=True, hide_index=True)
+        st.dataframe(harvest_df, use_container_width=True, hide_index=True)
     
 else:
     st.info("💡 **Mulai dengan mengkonfigurasi House** di Kalkulator Produksi untuk melihat dashboard status")
@@ -260,6 +265,24 @@ else:
     with placeholder_cols[3]:
         st.metric("🌸 Tangkai/Tahun", "0")
 
+# ========== REALISASI PANEN (DATABASE) ==========
+# Monthly rollup: one row per month x house, cheap to read on every visit
+monthly_harvest = harvest_trend('month')
+if not monthly_harvest.empty:
+    st.markdown("---")
+    st.markdown("#### 🌾 Realisasi Panen per Bulan")
+    
+    last_month = monthly_harvest.iloc[-1]
+    real_cols = st.columns(3)
+    with real_cols[0]:
+        st.metric(f"🌸 Tangkai ({last_month['Periode']})", f"{int(last_month['Tangkai']):,}")
+    with real_cols[1]:
+        st.metric("💵 Pendapatan", f"Rp {int(last_month['Pendapatan']):,}")
+    with real_cols[2]:
+        st.metric("📊 Grade A", f"{last_month['Grade A %']:.1f}%")
+    
+    st.bar_chart(monthly_harvest.tail(12).set_index('Periode')['Tangkai'])
+
 st.markdown("---")
 
 # ========== VARIETY SHOWCASE ==========
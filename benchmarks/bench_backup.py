@@ -0,0 +1,104 @@
+# Benchmark: online snapshot of a synthetic krisan.db while a background
+# thread keeps saving grading reports. Reports the snapshot duration and
+# the save latency (one save every --pause-ms) with no backup running,
+# during a stepped backup (PAGES_PER_STEP pages per step) and during a
+# single-step backup.
+#
+#   python benchmarks/bench_backup.py --rows 1000000
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import db_backup, db_manager
+from synthetic import seed_harvest_db
+
+DETAILS = pd.DataFrame([{
+    'Tanggal': None, 'House': 'Bench', 'Varietas': 'Putih', 'Grade': 'Grade A', 'Tipe': 'Normal',
+    'Ukuran': '10 bt/ikat', 'Jml_Ikat': 10, 'Isi_per_Ikat': 10, 'Total_Batang': 100,
+    'Harga_per_Ikat': 15000, 'Harga_per_Batang': 1500.0, 'Total_Pendapatan': 150000,
+}] * 15)
+
+class SaveLoop:
+    """Saves one 15-row report after another and records each save's latency."""
+
+    def __init__(self, pause):
+        self.pause = pause
+        self.day = date(2100, 1, 1)
+        self.samples = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            tanggal = str(self.day)
+            self.day += timedelta(days=1)
+            start = time.perf_counter()
+            with db_manager.transaction() as conn:
+                db_manager.upsert_report(conn.cursor(), {
+                    'Tanggal': tanggal, 'House': 'Bench', 'Tangkai': 1500, 'Grade A %': 60.0,
+                    'Pendapatan': 2_250_000, 'Putih': 1500, 'Pink': 0, 'Kuning': 0,
+                }, DETAILS.assign(Tanggal=tanggal))
+            if self.samples is not None:
+                self.samples.append((time.perf_counter() - start) * 1000)
+            time.sleep(self.pause)
+
+    def measure(self, work):
+        """Run work() while saving; returns (work seconds, save latencies in ms)."""
+        self.samples = []
+        start = time.perf_counter()
+        result = work()
+        elapsed = time.perf_counter() - start
+        samples, self.samples = self.samples, None
+        return elapsed, samples, result
+
+def describe(samples):
+    if not samples:
+        return "no saves"
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return f"{len(samples):>5} saves  p50 {statistics.median(samples):6.2f} ms  p95 {p95:6.2f} ms  max {ordered[-1]:7.2f} ms"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="harvest_details rows to seed")
+    parser.add_argument("--pause-ms", type=float, default=5, help="pause between two saves")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_harvest_db(os.path.join(tmp, "krisan.db"), args.rows)
+        size_mb = os.path.getsize(db_manager.DB_PATH) / 1024 / 1024
+        backup_dir = os.path.join(tmp, "backups")
+        print(f"seeded {args.rows:,} detail rows ({size_mb:.0f} MB)")
+
+        loop = SaveLoop(args.pause_ms / 1000)
+        loop._thread.start()
+        time.sleep(0.5)  # warm-up
+
+        runs = [
+            ("no backup", None),
+            (f"stepped ({db_backup.PAGES_PER_STEP} pages/step)", db_backup.PAGES_PER_STEP),
+            ("single step", -1),
+        ]
+        for label, pages in runs:
+            if pages is None:
+                _, samples, _ = loop.measure(lambda: time.sleep(2.0))
+                print(f"{label:<28} {'':>24}  {describe(samples)}")
+                continue
+            elapsed, samples, meta = loop.measure(lambda: db_backup.create_snapshot(backup_dir=backup_dir, pages=pages))
+            print(f"{label:<28} {elapsed * 1000:7.0f} ms {meta['mode']:<11} "
+                  f"r{meta['restarts']}  {describe(samples)}")
+        loop._stop.set()
+        loop._thread.join()
+        db_manager.close_all_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Benchmark: plain-text harvest_details (schema 6) vs the dictionary-encoded
+# harvest_details_data + lookup tables (schema 7) on synthetic data. The
+# generator writes one report per house per day from 2023-01-01, so 1M rows
+# (15 per report, 6 houses) span about 30 years. Reports file size after
+# VACUUM, the migration time and a few representative queries; the windows
+# are the ORDER BY ... LIMIT reads query_harvest_details issues, ordered on
+# the indexed day numbers rather than the view's computed tanggal.
+#
+#   python benchmarks/bench_compact_details.py --rows 1000000
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import db_manager
+from synthetic import seed_harvest_db
+
+YEAR = ('2024-01-01', '2024-12-31')
+MONTH = ('2024-06-01', '2024-06-30')
+
+# (name, plain-text SQL, compact SQL, params as dates); both return the same rows
+QUERIES = [
+    (
+        "GROUP BY variety/grade, 1 year",
+        '''SELECT varietas, grade, tipe, ukuran, SUM(jml_ikat), SUM(total_batang), SUM(total_pendapatan)
+           FROM harvest_details WHERE tanggal BETWEEN ? AND ?
+           GROUP BY varietas, grade, tipe, ukuran''',
+        '''SELECT v.name, g.grade, g.tipe, g.ukuran, t.ikat, t.batang, t.pendapatan
+           FROM (SELECT variety_id, grade_id, SUM(jml_ikat) AS ikat, SUM(total_batang) AS batang,
+                        SUM(total_pendapatan) AS pendapatan
+                 FROM harvest_details_data WHERE day BETWEEN ? AND ? GROUP BY variety_id, grade_id) t
+           JOIN harvest_varieties v ON v.id = t.variety_id
+           JOIN harvest_grades g ON g.id = t.grade_id''',
+        YEAR,
+    ),
+    (
+        "1 house x 1 month totals",
+        '''SELECT COUNT(*), SUM(total_pendapatan) FROM harvest_details
+           WHERE tanggal BETWEEN ? AND ? AND house = 'House 3\'''',
+        '''SELECT COUNT(*), SUM(total_pendapatan) FROM harvest_details_data
+           WHERE day BETWEEN ? AND ? AND house_id = (SELECT id FROM harvest_houses WHERE name = 'House 3')''',
+        MONTH,
+    ),
+    (
+        "newest 50 rows of a month",
+        '''SELECT * FROM harvest_details WHERE tanggal BETWEEN ? AND ? ORDER BY tanggal DESC, id DESC LIMIT 50''',
+        '''SELECT v.* FROM harvest_details v JOIN harvest_details_data d ON d.id = v.id
+           WHERE d.day BETWEEN ? AND ? ORDER BY d.day DESC, d.id DESC LIMIT 50''',
+        MONTH,
+    ),
+    (
+        "newest 50 rows overall",
+        '''SELECT * FROM harvest_details ORDER BY tanggal DESC, id DESC LIMIT 50''',
+        '''SELECT v.* FROM harvest_details v JOIN harvest_details_data d ON d.id = v.id
+           ORDER BY d.day DESC, d.id DESC LIMIT 50''',
+        (),
+    ),
+]
+
+def time_query(path, sql, params, repeat):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(sql, params).fetchall()  # warm-up
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        conn.close()
+    return statistics.median(samples), sorted(map(tuple, rows))
+
+def vacuum(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path) / 1024 / 1024
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="harvest_details rows to seed")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "plain.db")
+        compact = os.path.join(tmp, "compact.db")
+        seed_harvest_db(plain, args.rows, schema_version=6)
+        db_manager.close_all_connections()
+        vacuum(plain)
+        shutil.copy(plain, compact)
+
+        db_manager.DB_PATH = compact
+        start = time.perf_counter()
+        db_manager.migrate()
+        migrate_s = time.perf_counter() - start
+        db_manager.close_all_connections()
+
+        plain_mb, compact_mb = vacuum(plain), vacuum(compact)
+        print(f"seeded {args.rows:,} detail rows; migration 6 -> 7 took {migrate_s:.1f}s")
+        print(f"{'':<40}{'plain':>12}{'compact':>12}")
+        print(f"{'file size (MB, after VACUUM)':<40}{plain_mb:>12.1f}{compact_mb:>12.1f}")
+
+        for name, plain_sql, compact_sql, dates in QUERIES:
+            compact_params = [db_manager.day_number(d) for d in dates]
+            plain_ms, plain_rows = time_query(plain, plain_sql, dates, args.repeat)
+            compact_ms, compact_rows = time_query(compact, compact_sql, compact_params, args.repeat)
+            assert plain_rows == compact_rows, name
+            print(f"{name + ' (ms)':<40}{plain_ms:>12.2f}{compact_ms:>12.2f}")
+
+if __name__ == "__main__":
+    main()
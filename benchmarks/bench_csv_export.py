@@ -0,0 +1,65 @@
+# Benchmark: full harvest_details CSV export, legacy in-memory path
+# (get_harvest_details() -> to_csv) vs the streaming exporter.
+# Each mode runs in its own process so peak RSS is comparable.
+#
+#   python benchmarks/bench_csv_export.py --rows 1000000
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pandas as pd
+from utils import db_manager
+from synthetic import seed_harvest_db
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_mode(mode, path, out_path):
+    db_manager.DB_PATH = path
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'legacy':
+        details = db_manager.get_harvest_details()
+        data = pd.DataFrame(details).to_csv(index=False).encode('utf-8')
+        with open(out_path, 'wb') as f:
+            f.write(data)
+    else:
+        with open(out_path, 'wb') as f:
+            db_manager.write_harvest_csv(f, 'details')
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed:.3f} {peak_rss_mb() - baseline:.1f} {os.path.getsize(out_path)}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="harvest_details rows to seed")
+    parser.add_argument("--mode", choices=["legacy", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.db, args.db + f".{args.mode}.csv")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "krisan.db")
+        seed_harvest_db(path, args.rows)
+        db_manager.close_all_connections()
+        print(f"seeded {args.rows:,} detail rows")
+        print(f"{'mode':<10}{'seconds':>10}{'peak RSS +MB':>15}{'CSV MB':>10}")
+        for mode in ("legacy", "stream"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--db", path],
+                check=True, capture_output=True, text=True,
+            ).stdout.split()
+            seconds, rss, size = float(out[-3]), float(out[-2]), int(out[-1])
+            print(f"{mode:<10}{seconds:>10.2f}{rss:>15.1f}{size / 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()
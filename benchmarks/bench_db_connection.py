@@ -0,0 +1,94 @@
+# Micro-benchmark: per-call latency of db_manager reads/writes,
+# legacy connect-per-call vs the pooled WAL connection manager.
+#
+#   python benchmarks/bench_db_connection.py --rows 300000
+
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import db_manager
+from synthetic import seed_harvest_db
+
+def timeit(fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+# Each write is a new report: (tanggal, house) is unique since migration 8
+_bench_houses = (f"Bench {n}" for n in itertools.count())
+
+# --- legacy pattern: fresh connection per call, default rollback journal ---
+def legacy_init_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS harvest_summary (id INTEGER PRIMARY KEY AUTOINCREMENT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS harvest_details (id INTEGER PRIMARY KEY AUTOINCREMENT)")
+    conn.commit()
+    conn.close()
+
+def legacy_point_read(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("SELECT * FROM harvest_summary ORDER BY id DESC LIMIT 1").fetchall()
+    finally:
+        conn.close()
+
+def legacy_write(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("INSERT INTO harvest_summary (tanggal, house) VALUES ('2025-01-01', ?)", (next(_bench_houses),))
+        conn.commit()
+    finally:
+        conn.close()
+
+# --- pooled pattern ---
+def pooled_point_read():
+    with db_manager.get_connection() as conn:
+        conn.execute("SELECT * FROM harvest_summary ORDER BY id DESC LIMIT 1").fetchall()
+
+def pooled_write():
+    with db_manager.transaction() as conn:
+        conn.execute("INSERT INTO harvest_summary (tanggal, house) VALUES ('2025-01-01', ?)", (next(_bench_houses),))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=300_000, help="harvest_details rows to seed")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "krisan.db")
+        n_summary = seed_harvest_db(path, args.rows)
+        db_manager.close_all_connections()
+        legacy = sqlite3.connect(path)
+        legacy.execute("PRAGMA journal_mode = DELETE")  # legacy files use the rollback journal
+        legacy.close()
+        print(f"seeded {args.rows:,} detail rows / {n_summary:,} summaries")
+
+        results = []
+        results.append(("init_db (per rerun)", timeit(lambda: legacy_init_db(path), args.repeat), None))
+        results.append(("point read", timeit(lambda: legacy_point_read(path), args.repeat), None))
+        results.append(("single-row write", timeit(lambda: legacy_write(path), args.repeat // 5), None))
+
+        db_manager.DB_PATH = path
+        pooled = [
+            timeit(db_manager.init_db, args.repeat),
+            timeit(pooled_point_read, args.repeat),
+            timeit(pooled_write, args.repeat // 5),
+        ]
+        results = [(name, before, after) for (name, before, _), after in zip(results, pooled)]
+        db_manager.close_all_connections()
+
+        print(f"{'call':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name, before, after in results:
+            print(f"{name:<22}{before:>12.3f}{after:>12.3f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Benchmark: harvest reads as the pages used to get them (read_sql ->
+# to_dict('records') -> pd.DataFrame, all text columns as strings) vs the
+# typed frames query_harvest_summary/query_harvest_details now return
+# (datetime64 dates, categorical house/variety/grade). Reports read latency,
+# frame memory, peak Python allocations while reading, and the time to
+# convert the frame to Arrow as st.dataframe does. The read cache is
+# bypassed so every run hits SQLite.
+#
+#   python benchmarks/bench_typed_frames.py --rows 1000000
+
+import argparse
+import inspect
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import db_manager
+from synthetic import seed_harvest_db
+
+def records_read(table, columns):
+    # The former path: a list of dicts, turned back into a DataFrame by the page
+    select = ', '.join(['id'] + [f'{db} AS "{name}"' for name, db in columns.items()])
+    with db_manager.get_connection() as conn:
+        df = pd.read_sql_query(f"SELECT {select} FROM {table} ORDER BY tanggal DESC, id DESC", conn)
+    return pd.DataFrame(df.to_dict('records'))
+
+def measure(read, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read()
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    read()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    pa.Table.from_pandas(df)
+    arrow_ms = (time.perf_counter() - start) * 1000
+    return statistics.median(samples), df.memory_usage(deep=True).sum(), peak, arrow_ms
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="harvest_details rows to seed")
+    parser.add_argument("--repeat", type=int, default=3, help="timed reads per mode (median reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_harvest_db(os.path.join(tmp, "krisan.db"), args.rows)
+        print(f"seeded {args.rows:,} detail rows")
+        details_columns = {'summary_id': 'summary_id', **db_manager.DETAIL_COLUMNS}
+        runs = [
+            ("summary records", lambda: records_read('harvest_summary', db_manager.SUMMARY_COLUMNS)),
+            ("summary typed", inspect.unwrap(db_manager.query_harvest_summary)),
+            ("details records", lambda: records_read('harvest_details', details_columns)),
+            ("details typed", inspect.unwrap(db_manager.query_harvest_details)),
+        ]
+        mb = 1024 * 1024
+        print(f"{'read':<18}{'ms':>10}{'frame MB':>11}{'peak MB':>10}{'arrow ms':>10}")
+        for label, read in runs:
+            ms, frame_bytes, peak, arrow_ms = measure(read, args.repeat)
+            print(f"{label:<18}{ms:>10.0f}{frame_bytes / mb:>11.1f}{peak / mb:>10.1f}{arrow_ms:>10.1f}")
+        db_manager.close_all_connections()
+
+if __name__ == "__main__":
+    main()
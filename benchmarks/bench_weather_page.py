@@ -0,0 +1,88 @@
+# Benchmark: time to first render of page 2 (Cuaca & Lingkungan) against a
+# local stand-in for the Open-Meteo forecast API that answers after
+# --latency-ms. The weather store is a temporary file; unless noted, each
+# run starts with it and the in-memory cache empty:
+#
+#   sequential  one request per block (current, hourly, daily), one after
+#               another, as the page did before the client combined them
+#   parallel    one request per block, issued together with get_json_many
+#   combined    one request for all blocks (get_weather)
+#   restart     combined, memory cache empty but the store on disk warm
+#               (a restarted process)
+#   cached      combined, with the memory cache already warm
+#
+#   python benchmarks/bench_weather_page.py --latency-ms 150
+
+import argparse
+import glob
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+from utils import weather
+from mock_open_meteo import start_server
+
+PAGE = glob.glob(os.path.join(ROOT, 'pages', '2_*.py'))[0]
+
+def per_block(run_calls):
+    # A get_weather stand-in making one request per block
+    def get_weather(lat, lon, blocks=('current', 'hourly', 'daily')):
+        cell = weather.grid_cell(lat, lon)
+        calls = [(weather.FORECAST_URL, {'latitude': cell[0], 'longitude': cell[1], 'timezone': 'auto',
+                                         block: ','.join(weather.BLOCKS[block][0])}) for block in blocks]
+        result = {block: data[block] for block, data in zip(blocks, run_calls(calls))}
+        return result | {'fetched_at': dict.fromkeys(blocks, time.time()), 'offline': None}
+    return get_weather
+
+def render_ms():
+    start = time.perf_counter()
+    at = AppTest.from_file(PAGE, default_timeout=60).run()
+    elapsed = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=150, help="stand-in server response time")
+    parser.add_argument("--repeat", type=int, default=5, help="renders per mode (median reported)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # deprecation notices from every render would bury the table
+
+    server, handler = start_server(args.latency_ms / 1000)
+    weather.FORECAST_URL = f"http://127.0.0.1:{server.server_port}/v1/forecast"
+    tmp = tempfile.TemporaryDirectory()
+    weather.WEATHER_DB_PATH = os.path.join(tmp.name, "weather.db")
+    combined = weather.get_weather
+    # (label, get_weather, what to clear before each render)
+    modes = [
+        ("sequential", per_block(lambda calls: [weather.get_json(url, params) for url, params in calls]), 'all'),
+        ("parallel", per_block(weather.get_json_many), 'all'),
+        ("combined", combined, 'all'),
+        ("restart", combined, 'memory'),
+        ("cached", combined, None),
+    ]
+    render_ms()  # warm-up: imports, plotly, folium
+    print(f"stand-in latency {args.latency_ms:.0f} ms")
+    print(f"{'mode':<12}{'render ms':>11}{'requests':>10}")
+    for label, get_weather, clear in modes:
+        weather.get_weather = get_weather
+        samples, requests_before = [], handler.requests
+        for _ in range(args.repeat):
+            if clear:
+                weather.clear_weather_cache(stored=clear == 'all')
+            samples.append(render_ms())
+        weather.get_weather = combined
+        print(f"{label:<12}{statistics.median(samples):>11.0f}{(handler.requests - requests_before) / args.repeat:>10.1f}")
+    server.shutdown()
+    tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Local stand-in for the Open-Meteo forecast API: answers every request
+# with the requested blocks and variables (one object, or a list for
+# several comma-separated coordinates) after --latency-ms. Used by
+# bench_weather_page.py, and on its own to try the weather cache, the
+# on-disk store and offline mode without network access:
+#
+#   python benchmarks/mock_open_meteo.py --port 8765
+#   python -m utils.weather --url http://127.0.0.1:8765/v1/forecast get -6.82 107.62
+#   (stop the server, run the same command again: served offline from weather.db)
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def fake_forecast(query):
+    """An Open-Meteo-shaped answer with the requested blocks and variables (a list for several locations)."""
+    lats, lons = query['latitude'][0].split(','), query['longitude'][0].split(',')
+    if len(lats) > 1:
+        return [fake_location(query, lat, lon) for lat, lon in zip(lats, lons)]
+    return fake_location(query, lats[0], lons[0])
+
+def fake_location(query, lat, lon):
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    body = {'latitude': float(lat), 'longitude': float(lon)}
+    if 'current' in query:
+        body['current'] = {'time': now.strftime('%Y-%m-%dT%H:%M'), 'interval': 900}
+        body['current'].update({v: 20.0 for v in query['current'][0].split(',')})
+    if 'hourly' in query:
+        body['hourly'] = {'time': [(now + timedelta(hours=h)).strftime('%Y-%m-%dT%H:%M') for h in range(168)]}
+        body['hourly'].update({v: [20.0 + h % 24 / 4 for h in range(168)] for v in query['hourly'][0].split(',')})
+    if 'daily' in query:
+        body['daily'] = {'time': [str(now.date() + timedelta(days=d)) for d in range(7)]}
+        body['daily'].update({v: [20.0 + d for d in range(7)] for v in query['daily'][0].split(',')})
+    return body
+
+def start_server(latency, port=0):
+    """Serve on 127.0.0.1:port (0 = any free port) from a daemon thread; returns (server, handler class)."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        requests = 0
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            Handler.requests += 1
+            time.sleep(latency)
+            body = json.dumps(fake_forecast(parse_qs(urlparse(self.path).query))).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, Handler
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="response time")
+    args = parser.parse_args()
+
+    server, handler = start_server(args.latency_ms / 1000, args.port)
+    print(f"stand-in Open-Meteo on http://127.0.0.1:{server.server_port}/v1/forecast (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"{handler.requests} requests served")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Synthetic krisan.db generator shared by the benchmark scripts.
+
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import db_manager
+
+VARIETIES = ["Putih", "Pink", "Kuning"]
+GRADES = [
+    ("Super", "Normal"), ("Grade A", "Normal"), ("Grade B", "Normal"), ("Grade C", "Normal"),
+    ("BS Bengkok", "BS/Reject"),
+]
+HOUSES = [f"House {i}" for i in range(1, 7)]
+
+def seed_harvest_db(path, n_details, details_per_summary=15, start=date(2023, 1, 1), schema_version=None):
+    """Create krisan.db at `path` with ~n_details grading rows, one report per house per day.
+
+    schema_version stops the migrations early (e.g. 6 for the plain-text
+    harvest_details table that predates the compact layout).
+    """
+    db_manager.DB_PATH = path
+    version = db_manager.migrate(schema_version)
+
+    n_summary = max(1, n_details // details_per_summary)
+    summaries, details = [], []
+    for s in range(n_summary):
+        tanggal = str(start + timedelta(days=s // len(HOUSES)))
+        house = HOUSES[s % len(HOUSES)]
+        summaries.append((s + 1, tanggal, house, 1500, 62.5, 3_000_000, 500, 500, 500))
+        for d in range(details_per_summary):
+            grade, tipe = GRADES[d % len(GRADES)]
+            details.append((
+                s + 1, tanggal, house, VARIETIES[d % len(VARIETIES)], grade, tipe, "10 bt/ikat",
+                10, 10, 100, 15000, 1500.0, 150000,
+            ))
+
+    with db_manager.transaction() as conn:
+        conn.executemany("INSERT INTO harvest_summary VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", summaries)
+        if version >= 7:
+            db_manager._insert_details(conn.cursor(), details)
+        else:
+            columns = ', '.join(['summary_id', *db_manager.DETAIL_COLUMNS.values()])
+            conn.executemany(
+                f"INSERT INTO harvest_details ({columns}) VALUES ({', '.join('?' * len(details[0]))})", details
+            )
+    db_manager.rebuild_rollups()
+    return n_summary
@@ -0,0 +1,267 @@
+# 🩺 Diagnostik Database
+# Latency, row counts and slow queries of the db_manager entry points,
+# plus online snapshots and maintenance runs of the database and the
+# Open-Meteo client counters
+
+import os
+import sqlite3
+import sys
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+
+# Ensure project root is in path for utils import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import db_manager
+from utils.db_manager import (
+    init_db, get_db_stats, get_rerun_stats, get_slow_queries, get_slow_query_threshold,
+    set_slow_query_log, reset_db_stats, get_cache_stats, get_schema_version, get_generation,
+    get_harvest_changes, list_archives
+)
+from utils.harvest_writer import get_writer_stats
+from utils.weather import (
+    get_weather_stats, reset_weather_stats, get_stored_weather, set_offline_mode, get_offline_mode, format_age,
+)
+from utils.db_backup import create_snapshot, list_snapshots, restore_snapshot, prune_snapshots, start_backup_scheduler
+from utils.db_maintenance import (
+    run_maintenance, maintenance_history, maintenance_due, file_stats, start_maintenance_scheduler,
+    IDLE_MINUTES
+)
+
+st.set_page_config(page_title="Diagnostik Database", page_icon="🩺", layout="wide")
+
+init_db()
+scheduler = start_backup_scheduler()
+maintenance_scheduler = start_maintenance_scheduler()
+
+st.markdown("## 🩺 Diagnostik Database")
+st.info("Statistik dikumpulkan per proses sejak server dijalankan (atau sejak di-reset), dari semua sesi.")
+
+# ========== OVERVIEW ==========
+db_size = sum(
+    os.path.getsize(db_manager.DB_PATH + suffix)
+    for suffix in ('', '-wal')
+    if os.path.exists(db_manager.DB_PATH + suffix)
+)
+reruns = get_rerun_stats()
+cache = get_cache_stats()
+
+c1, c2, c3, c4 = st.columns(4)
+with c1:
+    st.metric("🗄️ Ukuran DB (+WAL)", f"{db_size / 1024 / 1024:.1f} MB", help=f"Skema versi {get_schema_version()}")
+with c2:
+    st.metric("🔁 Panggilan DB per Rerun", f"{reruns['p50']:.0f}", f"p95 {reruns['p95']:.0f}", delta_color="off",
+              help=f"Dari {reruns['reruns']} rerun terakhir")
+with c3:
+    st.metric("⚡ Cache Hit Ratio", f"{cache['hit_ratio']:.0%}", f"{cache['entries']} entri", delta_color="off")
+with c4:
+    changes = get_harvest_changes() or {'version': 0}
+    st.metric("🧬 Generasi DB", get_generation() or 0, f"panen v{changes['version']}", delta_color="off")
+
+archives = list_archives()
+if archives:
+    st.caption("Arsip terpasang: " + ", ".join(archives))
+
+# ========== PER-FUNCTION LATENCY ==========
+st.markdown("### ⏱️ Latensi per Fungsi")
+stats_df = get_db_stats()
+if stats_df.empty:
+    st.info("Belum ada panggilan database yang tercatat.")
+else:
+    st.dataframe(
+        stats_df,
+        column_config={
+            'p50 (ms)': st.column_config.NumberColumn(format="%.2f"),
+            'p95 (ms)': st.column_config.NumberColumn(format="%.2f"),
+            'Maks (ms)': st.column_config.NumberColumn(format="%.2f"),
+            'Total (ms)': st.column_config.NumberColumn(format="%.0f"),
+            'Baris/Panggilan': st.column_config.NumberColumn(format="%.1f"),
+        },
+        use_container_width=True, hide_index=True
+    )
+    top_df = stats_df.nlargest(15, 'p95 (ms)')
+    fig = px.bar(top_df, x='p95 (ms)', y='Fungsi', orientation='h', title="p95 Latensi (15 fungsi paling lambat)",
+                 color_discrete_sequence=['#10b981'])
+    fig.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
+    st.plotly_chart(fig, use_container_width=True)
+
+# ========== SLOW-QUERY LOG ==========
+st.markdown("### 🐢 Slow-Query Log")
+def apply_slow_log():
+    set_slow_query_log(st.session_state.slow_log_ms if st.session_state.slow_log_on else None)
+
+# The log is process-wide: show its current state, change it only when a widget changes
+threshold = get_slow_query_threshold()
+st.session_state.slow_log_on = threshold is not None
+if threshold is not None:
+    st.session_state.slow_log_ms = float(threshold)
+elif 'slow_log_ms' not in st.session_state:
+    st.session_state.slow_log_ms = 100.0
+s1, s2 = st.columns(2)
+with s1:
+    st.checkbox("Aktifkan slow-query log", key="slow_log_on", on_change=apply_slow_log)
+with s2:
+    st.number_input("Ambang (ms)", 1.0, 60000.0, step=10.0, key="slow_log_ms", on_change=apply_slow_log)
+
+slow_queries = get_slow_queries()
+if not slow_queries:
+    st.caption("Belum ada panggilan yang melewati ambang.")
+for entry in slow_queries:
+    with st.expander(f"{entry['time']} · {entry['function']} · {entry['ms']:.1f} ms"):
+        for statement in entry['statements']:
+            st.code(statement['sql'], language='sql')
+            if statement['plan']:
+                st.text(statement['plan'])
+
+# ========== BACKGROUND WRITER ==========
+writer_stats = get_writer_stats()
+if writer_stats:
+    st.markdown("### ✍️ Background Writer")
+    for path, w in writer_stats.items():
+        w1, w2, w3, w4 = st.columns(4)
+        w1.metric("Antrean", w['queued'], "aktif" if w['alive'] else "berhenti", delta_color="off")
+        w2.metric("Tersimpan", w['committed'], f"{w['failed']} gagal", delta_color="off")
+        w3.metric("Batch", w['batches'], f"terakhir {w['last_batch_size']} laporan", delta_color="off")
+        w4.metric("Commit Terakhir", f"{w['last_commit_ms']:.1f} ms")
+        st.caption(path)
+
+# ========== BACKUP & SNAPSHOT ==========
+st.markdown("### 💾 Backup & Snapshot")
+st.caption(
+    f"Snapshot otomatis tiap {scheduler.interval.total_seconds() / 3600:.0f} jam "
+    f"(berikutnya {scheduler.next_due():%Y-%m-%d %H:%M}), disalin online tanpa menghentikan penyimpanan."
+)
+if scheduler.last_error:
+    st.error(f"Snapshot terjadwal gagal: {scheduler.last_error}")
+
+if st.button("📸 Buat Snapshot Sekarang", key="create_snapshot"):
+    with st.spinner("Menyalin database..."):
+        meta = create_snapshot()
+        prune_snapshots()
+    st.success(f"✅ Snapshot {meta['name']} ({meta['size_bytes'] / 1024 / 1024:.1f} MB, {meta['duration_ms']:.0f} ms)")
+
+snapshots = list_snapshots()
+if snapshots:
+    st.dataframe(
+        pd.DataFrame([{
+            'Snapshot': s['name'],
+            'Alasan': s['reason'],
+            'Ukuran (MB)': s['size_bytes'] / 1024 / 1024,
+            'Durasi (ms)': s['duration_ms'],
+            'Mode': s['mode'],
+            'Skema': s['schema_version'],
+            'Arsip': ", ".join(s['archives']) or "-",
+        } for s in snapshots]),
+        column_config={'Ukuran (MB)': st.column_config.NumberColumn(format="%.1f")},
+        use_container_width=True, hide_index=True
+    )
+    r1, r2 = st.columns([2, 1])
+    with r1:
+        restore_name = st.selectbox("Pulihkan dari snapshot", [s['name'] for s in snapshots], key="restore_name")
+    with r2:
+        confirm_restore = st.checkbox("Saya yakin, timpa data sekarang", key="confirm_restore")
+    if st.button("♻️ Pulihkan Snapshot", type="primary", key="restore_snapshot", disabled=not confirm_restore):
+        try:
+            with st.spinner("Memulihkan database..."):
+                safety = restore_snapshot(restore_name)
+            st.success(f"✅ Dipulihkan dari {restore_name}. Data sebelumnya disimpan sebagai snapshot {safety['name']}.")
+        except sqlite3.OperationalError as e:
+            st.error(f"❌ Database sedang dipakai, coba lagi sebentar lagi ({e})")
+else:
+    st.caption("Belum ada snapshot.")
+
+# ========== MAINTENANCE ==========
+st.markdown("### 🧹 Maintenance")
+stats = file_stats()
+due = maintenance_due()
+m1, m2, m3 = st.columns(3)
+m1.metric("Halaman Kosong", f"{stats['freelist_pages']:,}", f"dari {stats['page_count']:,}", delta_color="off")
+m2.metric("WAL", f"{stats['wal_bytes'] / 1024 / 1024:.1f} MB")
+m3.metric("Auto-vacuum", stats['auto_vacuum'])
+idle_note = (
+    f"Berjalan otomatis setelah {IDLE_MINUTES} menit tanpa aktivitas bila perlu"
+    if maintenance_scheduler else "Pemicu saat idle dimatikan"
+)
+st.caption(f"{idle_note} · status: {f'perlu ({due})' if due else 'tidak perlu'}.")
+if stats['auto_vacuum'] != 'incremental':
+    st.caption("File lama: jalankan sekali `python -m utils.db_maintenance run --convert` agar VACUUM inkremental aktif.")
+if maintenance_scheduler and maintenance_scheduler.last_error:
+    st.error(f"Maintenance otomatis gagal: {maintenance_scheduler.last_error}")
+
+if st.button("🧹 Jalankan Maintenance Sekarang", key="run_maintenance"):
+    with st.spinner("VACUUM, ANALYZE, checkpoint..."):
+        run_maintenance()
+
+history = maintenance_history()
+if history:
+    last = history[0]
+    mb = 1024 * 1024
+    size_before = (last['before']['db_bytes'] + last['before']['wal_bytes']) / mb
+    size_after = (last['after']['db_bytes'] + last['after']['wal_bytes']) / mb
+    st.markdown(
+        f"**Terakhir:** {last['started_at']} ({last['trigger']}) · {last['duration_ms']:.0f} ms · "
+        f"{size_before:.1f} MB → {size_after:.1f} MB"
+    )
+    st.dataframe(
+        pd.DataFrame([
+            {'Query': label, 'Sebelum (ms)': t['before'], 'Sesudah (ms)': t['after']}
+            for label, t in last['queries'].items()
+        ]),
+        use_container_width=True, hide_index=True
+    )
+    st.dataframe(
+        pd.DataFrame([{
+            'Waktu': r['started_at'],
+            'Pemicu': r['trigger'],
+            'Durasi (ms)': r['duration_ms'],
+            'Sebelum (MB)': (r['before']['db_bytes'] + r['before']['wal_bytes']) / mb,
+            'Sesudah (MB)': (r['after']['db_bytes'] + r['after']['wal_bytes']) / mb,
+        } for r in history]),
+        column_config={
+            'Sebelum (MB)': st.column_config.NumberColumn(format="%.1f"),
+            'Sesudah (MB)': st.column_config.NumberColumn(format="%.1f"),
+        },
+        use_container_width=True, hide_index=True
+    )
+
+# ========== OPEN-METEO ==========
+st.markdown("### 🌤️ Open-Meteo")
+weather = get_weather_stats()
+o1, o2, o3, o4 = st.columns(4)
+o1.metric("Panggilan", weather['calls'], f"{weather['errors']} gagal", delta_color="off")
+o2.metric("Latensi p50", f"{weather['p50_ms']:.0f} ms", f"p95 {weather['p95_ms']:.0f} ms", delta_color="off")
+o3.metric("Retry", weather['retries'], f"{weather['timeouts']} timeout", delta_color="off")
+breaker_note = f"buka lagi {weather['breaker_retry_in']:.0f} dtk" if weather['breaker'] == 'open' else None
+o4.metric("Circuit Breaker", weather['breaker'], breaker_note, delta_color="off",
+          help=f"{weather['rejected']} panggilan ditolak saat terbuka")
+k1, k2, k3, k4 = st.columns(4)
+k1.metric("Cache Hit Ratio", f"{weather['hit_ratio']:.0%}", f"{weather['cache_entries']} sel", delta_color="off")
+k2.metric("Hit Segar", weather['hits'])
+k3.metric("Hit Basi", weather['stale_hits'], f"{weather['refreshes']} diperbarui", delta_color="off",
+          help="Data kedaluwarsa yang disajikan sambil diperbarui di latar belakang")
+k4.metric("Miss", weather['misses'])
+stored = get_stored_weather()
+d1, d2, d3, d4 = st.columns(4)
+d1.metric("Tersimpan di Disk", f"{len({(e['lat'], e['lon']) for e in stored})} sel",
+          f"{sum(e['rows'] for e in stored)} baris", delta_color="off",
+          help="weather.db: data cuaca terakhir per sel, dipakai saat restart dan saat offline")
+d2.metric("Dimuat dari Disk", weather['disk_loads'])
+d3.metric("Disajikan Offline", weather['offline_hits'], f"{weather['store_errors']} error disk", delta_color="off")
+def apply_offline_mode():
+    set_offline_mode(st.session_state.weather_offline)
+
+# Process-wide like the slow-query log: seeded from it, changed only by the checkbox
+st.session_state.weather_offline = get_offline_mode()
+with d4:
+    st.checkbox("📴 Mode offline", key="weather_offline", on_change=apply_offline_mode,
+                help="Jangan hubungi Open-Meteo; semua halaman memakai data tersimpan")
+if stored:
+    st.caption(f"Pengambilan terakhir: {format_age(stored[0]['fetched_at'])}")
+if weather['last_error']:
+    st.caption(f"Error terakhir: {weather['last_error']}")
+
+st.markdown("---")
+if st.button("🔄 Reset Statistik", key="reset_db_stats"):
+    reset_db_stats()
+    reset_weather_stats()
+    st.rerun()
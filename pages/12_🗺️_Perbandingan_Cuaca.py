@@ -0,0 +1,139 @@
+# 🗺️ Perbandingan Cuaca Antar Lokasi
+# Cuaca terkini dan prakiraan 7 hari semua lokasi kebun dalam satu tampilan
+
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import folium
+from streamlit_folium import st_folium
+import sys
+import os
+
+# Ensure project root is in path for utils import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.house_config import load_house_config, house_locations
+from utils.weather import get_weather_many, WeatherError, format_age
+
+st.set_page_config(page_title="Perbandingan Cuaca", page_icon="🗺️", layout="wide")
+
+st.title("🗺️ Perbandingan Cuaca Antar Lokasi")
+st.info("Semua lokasi kebun diambil sekaligus dalam satu permintaan ke Open-Meteo.")
+
+# Locations come from the house configuration (📍 Lokasi Kebun per house)
+house_db = st.session_state.get('house_database') or load_house_config()
+sites = house_locations(house_db)
+if not sites:
+    st.warning("Belum ada house dengan lokasi. Atur 📍 Lokasi Kebun dan koordinat tiap house di halaman 📊 Kalkulator Produksi.")
+    st.stop()
+
+try:
+    with st.spinner(f"Mengambil data cuaca {len(sites)} lokasi..."):
+        weather = get_weather_many({site: (loc['lat'], loc['lon']) for site, loc in sites.items()}, ('current', 'daily'))
+except WeatherError as e:
+    st.error(f"Gagal mengambil data cuaca ({e}). Periksa koneksi internet atau coba lagi nanti.")
+    st.stop()
+
+# Offline, a site whose blocks were never fetched has nothing to compare
+incomplete = [site for site in sites if weather[site]['missing']]
+sites = {site: loc for site, loc in sites.items() if site not in incomplete}
+if not sites:
+    st.error("Belum ada data cuaca tersimpan untuk lokasi mana pun. Periksa koneksi internet atau coba lagi nanti.")
+    st.stop()
+
+oldest = format_age(min(min(weather[site]['fetched_at'].values()) for site in sites))
+offline = next((w['offline'] for w in weather.values() if w['offline']), None)
+if offline:
+    st.warning(f"📴 Offline ({offline}). Menampilkan data cuaca terakhir yang tersimpan, yang tertua diambil {oldest}.")
+if incomplete:
+    st.warning(f"Belum ada data cuaca tersimpan untuk {', '.join(incomplete)}; lokasi ini tidak ditampilkan.")
+
+def site_status(temp, hum):
+    # Same thresholds as the alerts on the Cuaca & Lingkungan page
+    status = []
+    if temp > 28:
+        status.append("🔥 Panas")
+    elif temp < 15:
+        status.append("❄️ Dingin")
+    if hum > 90:
+        status.append("🍄 Risiko Jamur")
+    elif hum < 50:
+        status.append("🕷️ Kering")
+    return ", ".join(status) or "✅ Ideal"
+
+# ========== RINGKASAN ==========
+rows, daily_rows = [], []
+for site, loc in sites.items():
+    current, daily = weather[site]['current'], weather[site]['daily']
+    rows.append({
+        'Lokasi': site,
+        'Diambil': format_age(weather[site]['fetched_at']['current']),
+        'House': ", ".join(loc['houses']),
+        'Suhu (°C)': current['temperature_2m'],
+        'Kelembaban (%)': current['relative_humidity_2m'],
+        'Hujan (mm)': current['rain'],
+        'Angin (km/h)': current['wind_speed_10m'],
+        'Peluang Hujan Hari Ini (%)': daily['precipitation_probability_max'][0],
+        'Hujan 7 Hari (mm)': sum(v or 0 for v in daily['rain_sum']),
+        'Status': site_status(current['temperature_2m'], current['relative_humidity_2m']),
+    })
+    for i, day in enumerate(daily['time']):
+        daily_rows.append({
+            'Tanggal': pd.to_datetime(day),
+            'Lokasi': site,
+            'Suhu Max': daily['temperature_2m_max'][i],
+            'Suhu Min': daily['temperature_2m_min'][i],
+            'Hujan (mm)': daily['rain_sum'][i],
+            'Peluang Hujan (%)': daily['precipitation_probability_max'][i],
+        })
+df_sites = pd.DataFrame(rows)
+df_daily = pd.DataFrame(daily_rows)
+
+hottest = df_sites.loc[df_sites['Suhu (°C)'].idxmax()]
+wettest = df_sites.loc[df_sites['Hujan 7 Hari (mm)'].idxmax()]
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("📍 Lokasi", len(df_sites), f"{sum(len(loc['houses']) for loc in sites.values())} house", delta_color="off")
+with col2:
+    st.metric("🔥 Terpanas", hottest['Lokasi'], f"{hottest['Suhu (°C)']}°C", delta_color="off")
+with col3:
+    st.metric("🌧️ Terbasah (7 hari)", wettest['Lokasi'], f"{wettest['Hujan 7 Hari (mm)']:.1f} mm", delta_color="off")
+
+st.dataframe(
+    df_sites,
+    column_config={
+        'Suhu (°C)': st.column_config.NumberColumn(format="%.1f°C"),
+        'Peluang Hujan Hari Ini (%)': st.column_config.ProgressColumn(
+            "Peluang Hujan Hari Ini", format="%d%%", min_value=0, max_value=100
+        ),
+        'Hujan 7 Hari (mm)': st.column_config.NumberColumn(format="%.1f mm"),
+    },
+    use_container_width=True, hide_index=True
+)
+
+# ========== PETA ==========
+st.markdown("### 🗺️ Peta Lokasi")
+center = [sum(loc['lat'] for loc in sites.values()) / len(sites), sum(loc['lon'] for loc in sites.values()) / len(sites)]
+m = folium.Map(location=center, zoom_start=11)
+for row in rows:
+    loc = sites[row['Lokasi']]
+    color = "green" if row['Status'] == "✅ Ideal" else "orange"
+    folium.Marker(
+        [loc['lat'], loc['lon']],
+        popup=f"{row['Lokasi']}: {row['Suhu (°C)']}°C, RH {row['Kelembaban (%)']}% ({row['Status']})",
+        tooltip=row['Lokasi'],
+        icon=folium.Icon(color=color, icon="cloud")
+    ).add_to(m)
+if len(sites) > 1:
+    m.fit_bounds([[loc['lat'], loc['lon']] for loc in sites.values()])
+st_folium(m, height=350, use_container_width=True, returned_objects=[])
+
+# ========== PRAKIRAAN 7 HARI ==========
+st.markdown("### 📅 Prakiraan 7 Hari per Lokasi")
+c1, c2 = st.columns(2)
+with c1:
+    fig_temp = px.line(df_daily, x='Tanggal', y='Suhu Max', color='Lokasi', markers=True, title="Suhu Maksimum (°C)")
+    fig_temp.add_hrect(y0=15, y1=28, fillcolor="#86efac", opacity=0.15, line_width=0)
+    st.plotly_chart(fig_temp, use_container_width=True)
+with c2:
+    fig_rain = px.bar(df_daily, x='Tanggal', y='Hujan (mm)', color='Lokasi', barmode='group', title="Curah Hujan Harian (mm)")
+    st.plotly_chart(fig_rain, use_container_width=True)
@@ -3,12 +3,17 @@
 
 import streamlit as st
 import pandas as pd
-import requests
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 import folium
 from streamlit_folium import st_folium
+import sys
+import os
+
+# Ensure project root is in path for utils import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.weather import get_weather, WeatherError, format_age
 
 st.set_page_config(page_title="Analisis Cuaca", page_icon="🌤️", layout="wide")
 
@@ -98,30 +103,29 @@ with st.sidebar:
         st.session_state.map_lon = lon
         st.rerun()
 
-# --- WEATHER API FUNCTIONS ---
-def get_current_weather(lat, lon):
-    try:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m,relative_humidity_2m,rain,surface_pressure,wind_speed_10m&timezone=auto"
-        response = requests.get(url)
-        return response.json()['current']
-    except Exception: return None
-
-def get_forecast_weather(lat, lon):
-    try:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&daily=temperature_2m_max,temperature_2m_min,rain_sum,precipitation_probability_max,wind_speed_10m_max&timezone=auto"
-        response = requests.get(url)
-        return response.json()['daily']
-    except Exception: return None
-
 # --- MAIN CONTENT ---
 
-# 1. Fetch Data
+# 1. Fetch Data (utils.weather: one request for current, hourly and daily,
+# cached per grid cell and shared by all sessions; the last-known data is
+# kept in weather.db for when Open-Meteo is unreachable)
+current = hourly = forecast = weather_error = None
 with st.spinner("Mengambil data cuaca..."):
-    current = get_current_weather(st.session_state.map_lat, st.session_state.map_lon)
-    forecast = get_forecast_weather(st.session_state.map_lat, st.session_state.map_lon)
+    try:
+        weather = get_weather(st.session_state.map_lat, st.session_state.map_lon)
+        # Offline, a block never fetched for this cell is missing
+        current, hourly, forecast = weather.get('current'), weather.get('hourly'), weather.get('daily')
+        if not (current and forecast):
+            weather_error = f"{weather['offline']}; data {', '.join(weather['missing'])} belum tersimpan"
+    except WeatherError as e:
+        weather_error = e
 
 if current and forecast:
-    
+    age = format_age(min(weather['fetched_at'].values()))
+    if weather['offline']:
+        st.warning(f"📴 Offline ({weather['offline']}). Menampilkan data cuaca terakhir yang tersimpan, diambil {age}.")
+    else:
+        st.caption(f"🕒 Data cuaca diambil {age}")
+
     # --- DASHBOARD SUMMARY ---
     col1, col2, col3, col4 = st.columns(4)
     
@@ -392,5 +396,39 @@ if current and forecast:
             st.plotly_chart(fig_hum, use_container_width=True)
             st.info("✅ Ideal: 50-90%")
 
+        # Next 24 hours (hourly block of the same request)
+        if hourly:
+            df_hourly = pd.DataFrame({
+                'Waktu': pd.to_datetime(hourly['time']),
+                'Suhu (°C)': hourly['temperature_2m'],
+                'Kelembaban (%)': hourly['relative_humidity_2m'],
+                'Peluang Hujan (%)': hourly['precipitation_probability'],
+            })
+            df_hourly = df_hourly[df_hourly['Waktu'] >= pd.to_datetime(current['time']).floor('h')].head(24)
+
+            fig_hourly = go.Figure()
+            fig_hourly.add_trace(go.Bar(
+                x=df_hourly['Waktu'], y=df_hourly['Peluang Hujan (%)'],
+                name='Peluang Hujan (%)', marker_color='#3b82f6', yaxis='y2', opacity=0.3
+            ))
+            fig_hourly.add_trace(go.Scatter(
+                x=df_hourly['Waktu'], y=df_hourly['Suhu (°C)'],
+                name='Suhu (°C)', line=dict(color='#ef4444')
+            ))
+            fig_hourly.add_trace(go.Scatter(
+                x=df_hourly['Waktu'], y=df_hourly['Kelembaban (%)'],
+                name='Kelembaban (%)', line=dict(color='#10b981'), yaxis='y2'
+            ))
+            fig_hourly.add_hrect(y0=15, y1=28, fillcolor="#86efac", opacity=0.15, line_width=0)
+            fig_hourly.update_layout(
+                title="Suhu & Kelembaban 24 Jam ke Depan",
+                yaxis=dict(title="Suhu (°C)", side="left"),
+                yaxis2=dict(title="%", side="right", overlaying="y", showgrid=False, range=[0, 100]),
+                legend=dict(orientation="h", y=1.1)
+            )
+            st.plotly_chart(fig_hourly, use_container_width=True)
+        else:
+            st.caption("📴 Prakiraan per jam belum tersimpan untuk lokasi ini.")
+
 else:
-    st.error("Gagal mengambil data cuaca. Periksa koneksi internet atau coba lagi nanti.")
+    st.error(f"Gagal mengambil data cuaca ({weather_error}). Periksa koneksi internet atau coba lagi nanti.")
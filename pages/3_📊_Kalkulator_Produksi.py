@@ -5,25 +5,12 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import json
 import os
+import sys
 
-# --- PERSISTENCE LOGIC ---
-CONFIG_FILE = "data/krisan_house_config.json"
-
-def load_house_config():
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            return {}
-    return {}
-
-def save_house_config(config):
-    os.makedirs("data", exist_ok=True)
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f)
+# Ensure project root is in path for utils import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.house_config import load_house_config, save_house_config
 
 st.set_page_config(page_title="Kalkulator Budidaya", page_icon="📊", layout="wide")
 
@@ -233,6 +220,35 @@ with tab1:
             with row2[3]:
                 st.metric("🌱 Total Tanaman", f"{total_plants_house:,}")
             
+            # Row 3: Lokasi kebun (for weather per site)
+            row3 = st.columns([1.5, 1, 1])
+            
+            with row3[0]:
+                h_site = st.text_input(
+                    "📍 Lokasi Kebun",
+                    value=existing.get('site', "Kebun Utama"),
+                    key=f"h_site_{i+1}",
+                    help="House dengan lokasi yang sama memakai data cuaca yang sama"
+                )
+            
+            with row3[1]:
+                h_lat = st.number_input(
+                    "Latitude",
+                    min_value=-90.0, max_value=90.0,
+                    value=float(existing.get('lat', -6.80)),
+                    format="%.4f",
+                    key=f"h_lat_{i+1}"
+                )
+            
+            with row3[2]:
+                h_lon = st.number_input(
+                    "Longitude",
+                    min_value=-180.0, max_value=180.0,
+                    value=float(existing.get('lon', 107.60)),
+                    format="%.4f",
+                    key=f"h_lon_{i+1}"
+                )
+            
             # Validate total
             total_var = h_putih + h_pink + h_kuning
             if total_var != h_beds:
@@ -249,6 +265,9 @@ with tab1:
                 'beds_putih': h_putih,
                 'beds_pink': h_pink,
                 'beds_kuning': h_kuning,
+                'site': h_site,
+                'lat': h_lat,
+                'lon': h_lon,
                 'id': i + 1
             }
             
@@ -294,7 +313,8 @@ with tab1:
                 "🌱Tanaman": f"{plants_count:,}",
                 "🤍": data.get('beds_putih', 0),
                 "💗": data.get('beds_pink', 0),
-                "💛": data.get('beds_kuning', 0)
+                "💛": data.get('beds_kuning', 0),
+                "📍": data.get('site', '-')
             })
         if house_list:
             st.dataframe(pd.DataFrame(house_list), use_container_width=True, hide_index=True)
@@ -3,6 +3,15 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
+import sys
+import os
+
+# Ensure project root is in path for utils import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.db_manager import (
+    init_db, add_planting_entries, clear_planting_schedule, query_planting_schedule, planting_status_counts,
+    add_harvest_session, query_harvest_sessions, harvest_session_totals
+)
 
 st.set_page_config(page_title="Manajemen Tanam", page_icon="📅", layout="wide")
 
@@ -22,12 +31,10 @@ st.markdown("""
 st.markdown("## 📅 Manajemen Tanam & Panen Mingguan")
 st.info("Sistem rotasi tanam mingguan dengan panen bertahap dan persiapan lahan terjadwal")
 
-# Initialize session state
-if 'planting_schedule' not in st.session_state:
-    st.session_state.planting_schedule = []
-
-if 'harvest_sessions' not in st.session_state:
-    st.session_state.harvest_sessions = []
+# Schedule and harvest sessions live in the database; status is derived in SQL
+init_db()
+schedule_counts = planting_status_counts(by_house=True)
+has_schedule = not schedule_counts.empty
 
 # Tabs
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -108,6 +115,7 @@ with tab1:
         if st.button("✅ Tambah ke Jadwal", type="primary", use_container_width=True):
             if bed_ids:
                 beds = [b.strip() for b in bed_ids.split(",")]
+                new_entries = []
                 
                 for bed in beds:
                     # Calculate dates
@@ -127,50 +135,23 @@ with tab1:
                         "days_vegetatif": days_vegetatif,
                         "days_generatif": days_generatif,
                         "days_harvest": days_harvest,
-                        "days_jeda": days_jeda,
-                        "status": "vegetatif"
+                        "days_jeda": days_jeda
                     }
-                    st.session_state.planting_schedule.append(schedule_entry)
+                    new_entries.append(schedule_entry)
                 
+                add_planting_entries(new_entries)
                 st.success(f"✅ {len(beds)} bedengan ditambahkan ke jadwal!")
                 st.rerun()
     
     with col_timeline:
         st.markdown("### 📋 Jadwal Aktif")
         
-        if st.session_state.planting_schedule:
-            # Update status based on current date
-            today = datetime.now().date()
-            
-            for entry in st.session_state.planting_schedule:
-                plant_date = datetime.strptime(entry['planting_date'], "%Y-%m-%d").date()
-                harvest_start = datetime.strptime(entry['harvest_start'], "%Y-%m-%d").date()
-                harvest_end = datetime.strptime(entry['harvest_end'], "%Y-%m-%d").date()
-                clearing_start = datetime.strptime(entry['clearing_start'], "%Y-%m-%d").date()
-                next_planting = datetime.strptime(entry['next_planting'], "%Y-%m-%d").date()
-                
-                veg_end = plant_date + timedelta(days=entry['days_vegetatif'])
-                
-                if today < plant_date:
-                    entry['status'] = "belum tanam"
-                elif today < veg_end:
-                    entry['status'] = "vegetatif"
-                elif today < harvest_start:
-                    entry['status'] = "generatif"
-                elif today <= harvest_end:
-                    entry['status'] = "panen"
-                elif today < next_planting:
-                    entry['status'] = "jeda"
-                else:
-                    entry['status'] = "selesai"
-            
-            df_schedule = pd.DataFrame(st.session_state.planting_schedule)
-            
+        if has_schedule:
             # Filter by house
-            filter_house = st.selectbox("Filter House:", ["Semua"] + list(df_schedule['house'].unique()))
+            filter_house = st.selectbox("Filter House:", ["Semua"] + list(schedule_counts['house'].unique()))
+            house_filter = None if filter_house == "Semua" else filter_house
             
-            if filter_house != "Semua":
-                df_schedule = df_schedule[df_schedule['house'] == filter_house]
+            df_schedule = query_planting_schedule(house=house_filter)
             
             # Display table
             display_df = df_schedule[['house', 'bed_id', 'planting_date', 'harvest_start', 'harvest_end', 'status']].copy()
@@ -180,7 +161,8 @@ with tab1:
             
             # Status summary
             st.markdown("#### 📊 Status Summary")
-            status_counts = df_schedule['status'].value_counts()
+            house_counts = schedule_counts if house_filter is None else schedule_counts[schedule_counts['house'] == house_filter]
+            status_counts = house_counts.groupby('status')['beds'].sum().sort_values(ascending=False)
             
             status_cols = st.columns(5)
             status_colors = {
@@ -199,7 +181,7 @@ with tab1:
             
             # Clear button
             if st.button("🗑️ Hapus Semua Jadwal"):
-                st.session_state.planting_schedule = []
+                clear_planting_schedule()
                 st.rerun()
         else:
             st.info("📝 Belum ada jadwal tanam. Tambahkan di panel kiri.")
@@ -208,12 +190,13 @@ with tab1:
 with tab2:
     st.subheader("🌾 Jadwal Panen Bertahap")
     
-    if st.session_state.planting_schedule:
+    if has_schedule:
         today = datetime.now().date()
         
-        # Filter beds ready for harvest or in harvest period
+        # Beds in their harvest period or starting within a week (indexed range query)
         harvest_beds = []
-        for entry in st.session_state.planting_schedule:
+        harvest_window = query_planting_schedule(harvest_from=today, harvest_to=today + timedelta(days=7))
+        for entry in harvest_window.to_dict('records'):
             harvest_start = datetime.strptime(entry['harvest_start'], "%Y-%m-%d").date()
             harvest_end = datetime.strptime(entry['harvest_end'], "%Y-%m-%d").date()
             
@@ -259,18 +242,18 @@ with tab2:
                         "stems": stems_per_session,
                         "time": datetime.now().strftime("%H:%M")
                     }
-                    st.session_state.harvest_sessions.append(session)
+                    add_harvest_session(session)
                     st.success("✅ Sesi panen dicatat!")
         else:
             # Show upcoming harvests
             st.info("📅 Tidak ada bedengan dalam periode panen saat ini.")
             
             upcoming = []
-            for entry in st.session_state.planting_schedule:
+            not_harvested = query_planting_schedule(status=['belum tanam', 'vegetatif', 'generatif'])
+            for entry in not_harvested.to_dict('records'):
                 harvest_start = datetime.strptime(entry['harvest_start'], "%Y-%m-%d").date()
-                if harvest_start > today:
-                    days_until = (harvest_start - today).days
-                    upcoming.append({**entry, 'days_until': days_until})
+                days_until = (harvest_start - today).days
+                upcoming.append({**entry, 'days_until': days_until})
             
             if upcoming:
                 upcoming_sorted = sorted(upcoming, key=lambda x: x['days_until'])[:5]
@@ -283,11 +266,11 @@ with tab2:
         st.markdown("---")
         st.markdown("### 📋 Riwayat Panen")
         
-        if st.session_state.harvest_sessions:
-            df_sessions = pd.DataFrame(st.session_state.harvest_sessions)
+        df_sessions = query_harvest_sessions()
+        if not df_sessions.empty:
             st.dataframe(df_sessions, use_container_width=True, hide_index=True)
             
-            total_harvested = sum(s['stems'] for s in st.session_state.harvest_sessions)
+            total_harvested = harvest_session_totals()['stems']
             st.metric("🌸 Total Panen", f"{total_harvested:,} batang")
         else:
             st.info("📝 Belum ada riwayat panen.")
@@ -298,12 +281,12 @@ with tab2:
 with tab3:
     st.subheader("🚜 Persiapan Lahan & Rotasi")
     
-    if st.session_state.planting_schedule:
+    if has_schedule:
         today = datetime.now().date()
         
         # Find beds in jeda period
         jeda_beds = []
-        for entry in st.session_state.planting_schedule:
+        for entry in query_planting_schedule(status='jeda').to_dict('records'):
             clearing_start = datetime.strptime(entry['clearing_start'], "%Y-%m-%d").date()
             next_planting = datetime.strptime(entry['next_planting'], "%Y-%m-%d").date()
             
@@ -363,13 +346,13 @@ with tab3:
 with tab4:
     st.subheader("📊 Overview Dashboard")
     
-    if st.session_state.planting_schedule:
+    if has_schedule:
         # Gantt chart
         st.markdown("### 📊 Timeline Gantt Chart")
         
         gantt_data = []
         
-        for entry in st.session_state.planting_schedule:
+        for entry in query_planting_schedule().to_dict('records'):
             plant_date = datetime.strptime(entry['planting_date'], "%Y-%m-%d")
             veg_end = plant_date + timedelta(days=entry['days_vegetatif'])
             gen_end = veg_end + timedelta(days=entry['days_generatif'])
@@ -434,13 +417,9 @@ with tab4:
         # Monthly calendar summary
         st.markdown("### 📅 Ringkasan per House")
         
-        df_schedule = pd.DataFrame(st.session_state.planting_schedule)
-        
-        for house in df_schedule['house'].unique():
-            house_data = df_schedule[df_schedule['house'] == house]
-            
-            with st.expander(f"🏠 {house} ({len(house_data)} bedengan)"):
-                status_summary = house_data['status'].value_counts()
+        for house, house_data in schedule_counts.groupby('house', sort=False):
+            with st.expander(f"🏠 {house} ({house_data['beds'].sum()} bedengan)"):
+                status_summary = house_data.set_index('status')['beds'].sort_values(ascending=False)
                 
                 cols = st.columns(len(status_summary))
                 for i, (status, count) in enumerate(status_summary.items()):
@@ -451,20 +430,21 @@ with tab4:
         st.markdown("### 📊 Statistik")
         
         stat1, stat2, stat3, stat4 = st.columns(4)
+        beds_by_status = schedule_counts.groupby('status')['beds'].sum()
         
         with stat1:
-            st.metric("📦 Total Bedengan", len(st.session_state.planting_schedule))
+            st.metric("📦 Total Bedengan", int(beds_by_status.sum()))
         
         with stat2:
-            panen_count = len([e for e in st.session_state.planting_schedule if e['status'] == 'panen'])
+            panen_count = int(beds_by_status.get('panen', 0))
             st.metric("🌾 Sedang Panen", panen_count)
         
         with stat3:
-            jeda_count = len([e for e in st.session_state.planting_schedule if e['status'] == 'jeda'])
+            jeda_count = int(beds_by_status.get('jeda', 0))
             st.metric("🚜 Dalam Jeda", jeda_count)
         
         with stat4:
-            total_harvested = sum(s['stems'] for s in st.session_state.harvest_sessions)
+            total_harvested = harvest_session_totals()['stems']
             st.metric("🌸 Total Panen", f"{total_harvested:,}")
     else:
         st.info("📝 Tambahkan jadwal tanam untuk melihat overview.")
@@ -473,6 +453,7 @@ with tab4:
         if st.button("📋 Load Demo Data"):
             demo_beds = ['B01', 'B02', 'B03', 'B04', 'B05', 'B06']
             base_date = datetime.now().date() - timedelta(days=60)
+            demo_entries = []
             
             for i, bed in enumerate(demo_beds):
                 plant_date = base_date + timedelta(weeks=i)
@@ -488,11 +469,11 @@ with tab4:
                     "days_vegetatif": 35,
                     "days_generatif": 56,
                     "days_harvest": 10,
-                    "days_jeda": 14,
-                    "status": "vegetatif"
+                    "days_jeda": 14
                 }
-                st.session_state.planting_schedule.append(entry)
+                demo_entries.append(entry)
             
+            add_planting_entries(demo_entries)
             st.rerun()
 
 # ==================== TAB 5: KALKULATOR HOUSE ====================
@@ -4,9 +4,15 @@ import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 import random
-import requests
 import folium
 from streamlit_folium import st_folium
+import sys
+import os
+
+# Ensure project root is in path for utils import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.db_manager import init_db, add_growth_record, query_growth_data, latest_growth_record
+from utils.weather import get_current_weather, WeatherError
 
 st.set_page_config(page_title="Pantau Pertumbuhan", page_icon="📈", layout="wide")
 
@@ -66,18 +72,14 @@ st.markdown("""
 st.title("📈 Pantau Pertumbuhan & AI Analysis")
 st.info("Monitor perkembangan tanaman mingguan dan dapatkan rekomendasi budidaya cerdas berbasis AI.")
 
-# Initialize session state for growth data
-if 'growth_data' not in st.session_state:
-    st.session_state.growth_data = []
+# Growth records are stored in the database
+init_db()
 
 # Fetch Weather Function
 def get_open_meteo_weather(lat, lon):
     try:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m,relative_humidity_2m,rain,surface_pressure,wind_speed_10m&timezone=auto"
-        response = requests.get(url)
-        data = response.json()
-        return data['current']
-    except Exception as e:
+        return get_current_weather(lat, lon)
+    except WeatherError as e:
         st.error(f"Gagal mengambil data cuaca: {e}")
         return None
 
@@ -185,7 +187,7 @@ with st.sidebar:
             "temp": in_temp,
             "humidity": in_humidity
         }
-        st.session_state.growth_data.append(new_record)
+        add_growth_record(new_record)
         st.success("Data berhasil disimpan!")
 
 # ==================== MAIN CONTENT ====================
@@ -225,10 +227,9 @@ with col_main:
         """, unsafe_allow_html=True)
     
     # Filter data for selected house
-    house_data = [d for d in st.session_state.growth_data if d['house'] == input_house]
+    df_house = query_growth_data(input_house)
     
-    if house_data:
-        df_house = pd.DataFrame(house_data).sort_values('week')
+    if not df_house.empty:
         
         # Prepare comparison data
         weeks = list(range(1, 13))
@@ -349,72 +350,66 @@ with col_ai:
             
         return status, color, advice
 
-    # Display Analysis
-    if st.session_state.growth_data:
-        # Get latest data for selected house
-        latest = [d for d in st.session_state.growth_data if d['house'] == input_house]
-        if latest:
-            last_record = sorted(latest, key=lambda x: x['week'])[-1]
-            
-            w_curr = last_record['week']
-            h_curr = last_record['height']
-            l_curr = last_record['leaves']
-            d_curr = last_record['diameter']
-            temp_curr = last_record.get('temp', 24)
-            humid_curr = last_record.get('humidity', 75)
-            
-            # Run "AI"
-            status, color_css, ai_advice = analyze_plant_health(w_curr, h_curr, l_curr, d_curr)
-            
-            st.markdown(f"""
-            <div class="growth-card">
-                <div class="metric-label">Status {input_house} (Minggu {w_curr})</div>
-                <div class="{color_css}" style="display:inline-block; margin: 0.5rem 0;">{status}</div>
-                <div style="font-size: 2.5rem; margin: 0.5rem 0;">{h_curr} cm</div>
-                <div class="metric-label">Target: {standards.get(w_curr, {}).get('h', '-')} cm</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.markdown("#### 🤖 Rekomendasi AI:")
-            for tip in ai_advice:
-                st.markdown(f"- {tip}")
-            
-            st.markdown("---")
-            st.markdown("#### 🌡️ Analisis Lingkungan")
-            
-            # Agro-climate analysis
-            env_status = []
-            
-            # Temp Analysis
-            if temp_curr > 28:
-                env_status.append(f"⚠️ **Suhu Panas ({temp_curr}°C):** Risiko bunga kecil/pudar. Nyalakan misting siang hari.")
-            elif temp_curr < 15:
-                env_status.append(f"❄️ **Suhu Dingin ({temp_curr}°C):** Pertumbuhan melambat. Tutup screen malam hari.")
-            else:
-                env_status.append(f"✅ **Suhu Ideal ({temp_curr}°C)**")
-                
-            # Humidity Analysis
-            if humid_curr > 90:
-                env_status.append(f"💦 **Lembab ({humid_curr}%):** Risiko jamur karat putih! Tingkatkan sirkulasi udara.")
-            elif humid_curr < 60:
-                env_status.append(f"🌵 **Kering ({humid_curr}%):** Risiko layu. Lakukan penyiraman lantai.")
-            else:
-                env_status.append(f"✅ **Kelembaban Ideal ({humid_curr}%)**")
+    # Display Analysis (latest record for the selected house)
+    last_record = latest_growth_record(input_house)
+    if last_record:
+        w_curr = last_record['week']
+        h_curr = last_record['height']
+        l_curr = last_record['leaves']
+        d_curr = last_record['diameter']
+        temp_curr = last_record.get('temp', 24)
+        humid_curr = last_record.get('humidity', 75)
+        
+        # Run "AI"
+        status, color_css, ai_advice = analyze_plant_health(w_curr, h_curr, l_curr, d_curr)
+        
+        st.markdown(f"""
+        <div class="growth-card">
+            <div class="metric-label">Status {input_house} (Minggu {w_curr})</div>
+            <div class="{color_css}" style="display:inline-block; margin: 0.5rem 0;">{status}</div>
+            <div style="font-size: 2.5rem; margin: 0.5rem 0;">{h_curr} cm</div>
+            <div class="metric-label">Target: {standards.get(w_curr, {}).get('h', '-')} cm</div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("#### 🤖 Rekomendasi AI:")
+        for tip in ai_advice:
+            st.markdown(f"- {tip}")
+        
+        st.markdown("---")
+        st.markdown("#### 🌡️ Analisis Lingkungan")
+        
+        # Agro-climate analysis
+        env_status = []
+        
+        # Temp Analysis
+        if temp_curr > 28:
+            env_status.append(f"⚠️ **Suhu Panas ({temp_curr}°C):** Risiko bunga kecil/pudar. Nyalakan misting siang hari.")
+        elif temp_curr < 15:
+            env_status.append(f"❄️ **Suhu Dingin ({temp_curr}°C):** Pertumbuhan melambat. Tutup screen malam hari.")
+        else:
+            env_status.append(f"✅ **Suhu Ideal ({temp_curr}°C)**")
             
-            for status in env_status:
-                st.markdown(f"{status}")
+        # Humidity Analysis
+        if humid_curr > 90:
+            env_status.append(f"💦 **Lembab ({humid_curr}%):** Risiko jamur karat putih! Tingkatkan sirkulasi udara.")
+        elif humid_curr < 60:
+            env_status.append(f"🌵 **Kering ({humid_curr}%):** Risiko layu. Lakukan penyiraman lantai.")
+        else:
+            env_status.append(f"✅ **Kelembaban Ideal ({humid_curr}%)**")
+        
+        for status in env_status:
+            st.markdown(f"{status}")
 
-            st.markdown("---")
-            st.markdown(f"**Diameter Batang:** {d_curr} mm")
-            if d_curr < 3.0 and w_curr > 4:
-                st.warning("⚠️ Batang terlalu kecil! Risiko patah saat berbunga.")
-            else:
-                st.success("✅ Diameter batang kokoh.")
-                
+        st.markdown("---")
+        st.markdown(f"**Diameter Batang:** {d_curr} mm")
+        if d_curr < 3.0 and w_curr > 4:
+            st.warning("⚠️ Batang terlalu kecil! Risiko patah saat berbunga.")
         else:
-            st.info("Pilih house lain atau input data.")
+            st.success("✅ Diameter batang kokoh.")
+            
     else:
-        st.info("Input data mingguan pertama Anda untuk melihat analisis AI.")
+        st.info("Input data mingguan pertama Anda (atau pilih house lain) untuk melihat analisis AI.")
 
 # Footer
 st.markdown("---")
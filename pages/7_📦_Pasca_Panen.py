@@ -7,18 +7,52 @@ from datetime import datetime, timedelta
 import plotly.graph_objects as go
 import sys
 import os
+import concurrent.futures
 
 # Ensure project root is in path for utils import
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.db_manager import init_db, save_harvest_record, get_harvest_summary, get_harvest_details, clear_database
+from utils.parquet_export import export_harvest_parquet, zip_parquet_export
+from utils.harvest_import import import_grading_file
+from utils.harvest_writer import get_harvest_writer
+from utils.db_backup import start_backup_scheduler
+from utils.db_maintenance import start_maintenance_scheduler
+from utils.db_manager import (
+    init_db, save_harvest_record, clear_database, archive_harvest_before, list_archives, get_harvest_houses,
+    sync_harvest_view, count_harvest_summary, count_harvest_details,
+    get_harvest_totals, harvest_trend, harvest_totals_by_variety, harvest_csv_export_file,
+    add_cost_entry, clear_cost_journal, query_cost_journal, cost_totals_by_category
+)
 
 st.set_page_config(page_title="Pasca Panen", page_icon="📦", layout="wide")
 
-# Initialize DB and Load Data
+# Initialize DB (history is queried per tab, filtered in SQL)
 init_db()
-# Load latest data from DB to ensure session state is in sync
-st.session_state.harvest_history = get_harvest_summary()
-st.session_state.harvest_details = get_harvest_details()
+start_backup_scheduler()
+start_maintenance_scheduler()
+
+# Saves queued on the background writer: report the ones that finished
+if 'pending_saves' not in st.session_state:
+    st.session_state.pending_saves = []
+
+def queue_harvest_save(label, summary_entry, details_df, wait=2.0):
+    # Usually done within `wait` seconds: the caller reports it right away,
+    # anything slower is reported by a toast on a later rerun
+    future = get_harvest_writer().submit(summary_entry, details_df)
+    try:
+        future.exception(timeout=wait)
+    except concurrent.futures.TimeoutError:
+        st.session_state.pending_saves.append((label, future))
+    return future
+
+still_pending = []
+for label, future in st.session_state.pending_saves:
+    if not future.done():
+        still_pending.append((label, future))
+    elif future.exception() is not None:
+        st.toast(f"❌ Gagal menyimpan {label}: {future.exception()}")
+    else:
+        st.toast(f"✅ {label} tersimpan ke Database")
+st.session_state.pending_saves = still_pending
 
 # CSS
 st.markdown("""
@@ -538,6 +572,11 @@ with tab2:
         grade_a_stems = totals_putih['normal'] + totals_pink['normal'] + totals_kuning['normal']
         grade_a_pct = (grade_a_stems / grand_total_stems * 100) if grand_total_stems > 0 else 0
         
+        background_save = st.checkbox(
+            "⚡ Simpan di latar belakang", value=False, key="background_save",
+            help="Simpan lewat antrian penulis tunggal agar halaman tidak tertahan saat banyak staf menyimpan bersamaan"
+        )
+        
         if st.button("💾 Simpan ke Riwayat Panen", type="primary", use_container_width=True, key="save_grading_to_history"):
             # Prepare Summary Data
             summary_entry = {
@@ -651,11 +690,16 @@ with tab2:
             df_details_save = pd.DataFrame(details_rows)
             
             # Save to Database
-            if save_harvest_record(summary_entry, df_details_save):
+            if background_save:
+                future = queue_harvest_save(f"Laporan {house_name} {current_date}", summary_entry, df_details_save)
+                if not future.done():
+                    st.info("⏳ Laporan masuk antrian simpan. Status akan muncul setelah tersimpan.")
+                elif future.exception() is not None:
+                    st.error(f"❌ Gagal menyimpan data: {future.exception()}")
+                else:
+                    st.success("✅ Data berhasil disimpan ke Database!")
+            elif save_harvest_record(summary_entry, df_details_save):
                 st.success("✅ Data berhasil disimpan ke Database!")
-                # Refresh session state
-                st.session_state.harvest_history = get_harvest_summary()
-                st.session_state.harvest_details = get_harvest_details()
                 st.balloons()
             else:
                 st.error("❌ Gagal menyimpan data.")
@@ -971,10 +1015,6 @@ with tab3:
     st.subheader("📔 Jurnal Biaya Harian")
     st.info("Catat biaya aktual harian untuk dibandingkan dengan estimasi RAB")
     
-    # Initialize journal session state
-    if 'cost_journal' not in st.session_state:
-        st.session_state.cost_journal = []
-    
     # Sync RAB data
     rab_data = st.session_state.get('krisan_data', {})
     has_rab = rab_data.get('rab_total_operational', 0) > 0
@@ -1023,7 +1063,7 @@ with tab3:
                     "description": journal_desc,
                     "amount": journal_amount
                 }
-                st.session_state.cost_journal.append(entry)
+                add_cost_entry(entry)
                 st.success(f"✅ Biaya Rp {journal_amount:,} tersimpan!")
                 st.rerun()
             else:
@@ -1034,8 +1074,8 @@ with tab3:
     # Journal history
     st.markdown("### 📋 Riwayat Transaksi")
     
-    if st.session_state.cost_journal:
-        df_journal = pd.DataFrame(st.session_state.cost_journal)
+    df_journal = query_cost_journal()
+    if not df_journal.empty:
         df_journal['amount_formatted'] = df_journal['amount'].apply(lambda x: f"Rp {x:,}")
         
         st.dataframe(
@@ -1049,10 +1089,8 @@ with tab3:
         # Summary by category
         st.markdown("### 📊 Ringkasan per Kategori")
         
-        # Calculate actual totals per category
-        actual_totals = {}
-        for cat in category_options:
-            actual_totals[cat] = sum(e['amount'] for e in st.session_state.cost_journal if e['category'] == cat)
+        # Actual totals per category (aggregated in SQL)
+        actual_totals = cost_totals_by_category().set_index('category')['amount'].to_dict()
         
         total_actual = sum(actual_totals.values())
         
@@ -1115,7 +1153,7 @@ with tab3:
         # Clear button
         st.markdown("---")
         if st.button("🗑️ Hapus Semua Data Jurnal", type="secondary"):
-            st.session_state.cost_journal = []
+            clear_cost_journal()
             st.rerun()
     else:
         st.info("📝 Belum ada data jurnal. Mulai input biaya di atas.")
@@ -1227,10 +1265,6 @@ with tab7:
     with col_export:
         st.markdown("### 📥 Export Laporan")
         
-        # Initialize harvest history if not exists
-        if 'harvest_history' not in st.session_state:
-            st.session_state.harvest_history = []
-        
         # Export grading data
         if 'grading_data' in st.session_state and st.session_state.grading_data:
             grading_df = pd.DataFrame(st.session_state.grading_data)
@@ -1249,10 +1283,9 @@ with tab7:
         st.markdown("---")
         
         # Export journal data
-        if 'cost_journal' in st.session_state and st.session_state.cost_journal:
-            journal_df = pd.DataFrame(st.session_state.cost_journal)
-            
-            csv_journal = journal_df.to_csv(index=False).encode('utf-8')
+        journal_df = query_cost_journal()
+        if not journal_df.empty:
+            csv_journal = journal_df.drop(columns='id').to_csv(index=False).encode('utf-8')
             st.download_button(
                 "📔 Download Jurnal Biaya (CSV)",
                 data=csv_journal,
@@ -1265,33 +1298,96 @@ with tab7:
         
         st.markdown("---")
         
-        # Export harvest history
-        if st.session_state.harvest_history:
-            history_df = pd.DataFrame(st.session_state.harvest_history)
-            
-            csv_history = history_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                "🌾 Download Riwayat Panen (Summary CSV)",
-                data=csv_history,
-                file_name=f"riwayat_panen_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv",
-                use_container_width=True
+        # Export harvest history (streamed from the DB into a file on disk)
+        export_all = st.checkbox("Export semua tanggal", value=False, key="export_all")
+        if export_all:
+            export_start, export_end = None, None
+        else:
+            export_range = st.date_input(
+                "📅 Rentang Tanggal Export",
+                value=(datetime.now().date() - timedelta(days=90), datetime.now().date()),
+                key="export_range"
             )
+            export_start, export_end = export_range if len(export_range) == 2 else (export_range[0], export_range[0])
+        
+        if count_harvest_summary(export_start, export_end):
+            with open(harvest_csv_export_file('summary', export_start, export_end), 'rb') as csv_history:
+                st.download_button(
+                    "🌾 Download Riwayat Panen (Summary CSV)",
+                    data=csv_history,
+                    file_name=f"riwayat_panen_{datetime.now().strftime('%Y%m%d')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+        else:
+            st.info("Belum ada riwayat panen pada rentang ini")
         
         # Export granular details
-        if 'harvest_details' in st.session_state and st.session_state.harvest_details:
-            details_df = pd.DataFrame(st.session_state.harvest_details)
-            
-            csv_details = details_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                "📈 Download Dataset Detail (Granular CSV)",
-                data=csv_details,
-                file_name=f"dataset_panen_lengkap_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv",
-                use_container_width=True,
-                type="primary",
-                help="Download data rinci: Tanggal, House, Varietas, Grade, Ukuran, Jumlah, Harga"
+        if count_harvest_details(export_start, export_end):
+            with open(harvest_csv_export_file('details', export_start, export_end), 'rb') as csv_details:
+                st.download_button(
+                    "📈 Download Dataset Detail (Granular CSV)",
+                    data=csv_details,
+                    file_name=f"dataset_panen_lengkap_{datetime.now().strftime('%Y%m%d')}.csv",
+                    mime="text/csv",
+                    use_container_width=True,
+                    type="primary",
+                    help="Download data rinci: Tanggal, House, Varietas, Grade, Ukuran, Jumlah, Harga"
+                )
+        
+        # Columnar export for analysis outside the app (only new/changed months are rewritten)
+        if st.button("🗂️ Export Parquet (Partisi per Bulan)", use_container_width=True, key="export_parquet"):
+            try:
+                parquet_report = export_harvest_parquet()
+                st.session_state.parquet_zip = zip_parquet_export()
+                detail_report = parquet_report['harvest_details']
+                st.success(
+                    f"✅ {len(detail_report['written'])} partisi baru/berubah ditulis, "
+                    f"{detail_report['skipped']} partisi tidak berubah"
+                )
+            except ImportError as e:
+                st.error(f"❌ {e}")
+        
+        if st.session_state.get('parquet_zip') and os.path.exists(st.session_state.parquet_zip):
+            with open(st.session_state.parquet_zip, 'rb') as parquet_zip:
+                st.download_button(
+                    "⬇️ Download Dataset Parquet (ZIP)",
+                    data=parquet_zip,
+                    file_name=f"dataset_panen_parquet_{datetime.now().strftime('%Y%m%d')}.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+    
+        st.markdown("---")
+        
+        # Import historical grading books
+        with st.expander("📂 Import Buku Grading (Excel/CSV)", expanded=False):
+            st.caption("Kolom minimal: Tanggal, House, Varietas, Grade, Jml_Ikat (atau Total_Batang). "
+                       "Jika hanya salah satunya, isi per ikat diambil dari Isi_per_Ikat, Ukuran (\"80 bt/ikat\") "
+                       "atau angka di Grade (\"Grade 80\"); baris tanpa keterangan itu ditolak. "
+                       "Import ulang file yang sama tidak membuat data ganda.")
+            import_files = st.file_uploader(
+                "Pilih file", type=["xlsx", "csv"], accept_multiple_files=True, key="import_files"
             )
+            if import_files and st.button("📥 Import ke Database", type="primary", key="btn_import"):
+                import_progress = st.progress(0.0, text="Membaca file...")
+                
+                def report_progress(stage, done, total):
+                    if stage == 'staging':
+                        import_progress.progress(0.0, text=f"Membaca {done:,} baris...")
+                    else:
+                        import_progress.progress(done / total, text=f"Menyimpan {done:,}/{total:,} laporan...")
+                
+                for uploaded in import_files:
+                    try:
+                        result = import_grading_file(uploaded, uploaded.name, progress=report_progress)
+                        st.success(
+                            f"✅ {uploaded.name}: {result['rows']:,} baris "
+                            f"({result['rejected']:,} ditolak) → {result['inserted']:,} laporan baru, "
+                            f"{result['replaced']:,} diperbarui, {result['unchanged']:,} sudah ada"
+                        )
+                    except ValueError as e:
+                        st.error(f"❌ {uploaded.name}: {e}")
     
     with col_history:
         st.markdown("### 🌾 Riwayat Panen")
@@ -1329,21 +1425,51 @@ with tab7:
                 # Save with empty details
                 if save_harvest_record(summary_entry, pd.DataFrame()):
                     st.success("✅ Data panen tersimpan ke Database!")
-                    st.session_state.harvest_history = get_harvest_summary()
                     st.rerun()
                 else:
                     st.error("❌ Gagal menyimpan data.")
         
-        # Show history
-        if st.session_state.harvest_history:
+        # History filters (pushed down into SQL)
+        f_cols = st.columns([1.5, 1.5])
+        with f_cols[0]:
+            history_range = st.date_input(
+                "📅 Rentang Tanggal",
+                value=(datetime.now().date() - timedelta(days=30), datetime.now().date()),
+                key="history_range"
+            )
+        with f_cols[1]:
+            history_houses = st.multiselect("🏠 Filter House", get_harvest_houses(), key="history_houses")
+        h_start, h_end = history_range if len(history_range) == 2 else (history_range[0], history_range[0])
+        
+        # Show history: the session keeps the filtered rows and only pulls
+        # reports saved since its last read
+        st.session_state.harvest_history = sync_harvest_view(
+            st.session_state.get('harvest_history'), 'summary', h_start, h_end, history_houses
+        )
+        history_df = st.session_state.harvest_history['df']
+        n_history = len(history_df)
+        if n_history:
             st.markdown("#### 📋 Data Panen")
-            history_df = pd.DataFrame(st.session_state.harvest_history)
-            st.dataframe(history_df, use_container_width=True, hide_index=True)
             
-            # Summary metrics
-            total_stems = history_df['Tangkai'].sum()
-            total_revenue = history_df['Pendapatan'].sum()
-            avg_grade = history_df['Grade A %'].mean()
+            p_cols = st.columns(2)
+            with p_cols[0]:
+                page_size = st.selectbox("Baris per halaman", [25, 50, 100], key="history_page_size")
+            n_pages = (n_history - 1) // page_size + 1
+            with p_cols[1]:
+                page = st.number_input(f"Halaman (dari {n_pages})", 1, n_pages, 1, key="history_page")
+            
+            page_df = history_df.iloc[(page - 1) * page_size:page * page_size]
+            st.dataframe(
+                page_df.drop(columns=['id']),
+                column_config={'Tanggal': st.column_config.DateColumn(format="YYYY-MM-DD")},
+                use_container_width=True, hide_index=True
+            )
+            
+            # Summary metrics (aggregated in SQLite)
+            totals = get_harvest_totals(h_start, h_end, history_houses)
+            total_stems = int(totals['Tangkai'])
+            total_revenue = int(totals['Pendapatan'])
+            avg_grade = totals['Grade A %']
             
             m1, m2, m3 = st.columns(3)
             with m1:
@@ -1351,7 +1477,7 @@ with tab7:
             with m2:
                 st.metric("💵 Total Pendapatan", f"Rp {total_revenue:,}")
             with m3:
-                st.metric("📊 Rata-rata Grade A", f"{avg_grade:.1f}%")
+                st.metric("📊 Rata-rata Grade A", f"{avg_grade:.1f}%", help="Dibobot jumlah tangkai")
             
             st.markdown("---")
             
@@ -1360,12 +1486,16 @@ with tab7:
             
             import plotly.express as px
             
+            period_labels = {"Harian": "day", "Mingguan": "week", "Bulanan": "month"}
+            period_label = st.radio("Periode", list(period_labels), horizontal=True, key="history_period")
+            trend_house_df = harvest_trend(period_labels[period_label], h_start, h_end, history_houses, by_house=True)
+            
             fig = px.bar(
-                history_df, 
-                x='Tanggal', 
+                trend_house_df, 
+                x='Periode', 
                 y='Tangkai',
                 color='House',
-                title="Produksi per Tanggal",
+                title=f"Produksi per Periode ({period_label})",
                 color_discrete_sequence=px.colors.qualitative.Set2
             )
             fig.update_layout(height=300)
@@ -1373,9 +1503,10 @@ with tab7:
             
             # Revenue trend
             if total_revenue > 0:
+                trend_df = harvest_trend(period_labels[period_label], h_start, h_end, history_houses)
                 fig2 = px.line(
-                    history_df,
-                    x='Tanggal',
+                    trend_df,
+                    x='Periode',
                     y='Pendapatan',
                     markers=True,
                     title="Tren Pendapatan"
@@ -1383,14 +1514,36 @@ with tab7:
                 fig2.update_layout(height=250)
                 st.plotly_chart(fig2, use_container_width=True)
             
-            # Clear button
-            if st.button("🗑️ Hapus Semua Riwayat", type="primary", key="clear_history"):
-                clear_database()
-                st.session_state.harvest_history = []
-                st.session_state.harvest_details = []
-                st.rerun()
+            # Variety breakdown from granular details
+            variety_df = harvest_totals_by_variety(h_start, h_end, history_houses)
+            if not variety_df.empty:
+                st.dataframe(variety_df, use_container_width=True, hide_index=True)
+            
+            # Archive / purge
+            with st.expander("🗄️ Arsip & Hapus Riwayat"):
+                a_cols = st.columns(2)
+                with a_cols[0]:
+                    archive_cutoff = st.date_input(
+                        "Arsipkan laporan sebelum",
+                        value=datetime(datetime.now().year, 1, 1).date(),
+                        key="archive_cutoff"
+                    )
+                    if st.button("📦 Pindahkan ke Arsip Tahunan", key="archive_history"):
+                        moved = archive_harvest_before(archive_cutoff)
+                        st.success(f"✅ {sum(moved.values())} laporan dipindahkan ke arsip" if moved else "Tidak ada laporan untuk diarsipkan.")
+                    archives = list_archives()
+                    if archives:
+                        st.caption("Arsip: " + ", ".join(archives))
+                with a_cols[1]:
+                    house_label = ", ".join(history_houses) if history_houses else "semua house"
+                    st.caption(f"Hapus laporan {h_start} s/d {h_end} ({house_label}), termasuk yang sudah diarsipkan.")
+                    confirm_purge = st.checkbox("Saya yakin", key="confirm_purge")
+                    if st.button("🗑️ Hapus Riwayat Rentang Ini", type="primary", key="clear_history", disabled=not confirm_purge):
+                        deleted = clear_database(h_start, h_end, history_houses)
+                        st.toast(f"🗑️ {deleted} laporan dihapus")
+                        st.rerun()
         else:
-            st.info("📊 Belum ada riwayat panen. Tambahkan data melalui form di atas.")
+            st.info("📊 Belum ada riwayat panen pada rentang ini. Tambahkan data melalui form di atas.")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Ensure project root is in path for utils import
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import db_manager
+
+@pytest.fixture
+def krisan_db(tmp_path, monkeypatch):
+    """A fresh krisan.db in tmp_path, migrated and set as db_manager.DB_PATH."""
+    monkeypatch.setattr(db_manager, 'DB_PATH', str(tmp_path / 'krisan.db'))
+    monkeypatch.chdir(tmp_path)
+    db_manager.init_db()
+    yield db_manager.DB_PATH
+    db_manager.clear_read_cache()
+    db_manager.close_all_connections()
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from utils import db_backup, db_manager
+
+from test_db_manager import _save
+
+def _reports():
+    summary = db_manager.query_harvest_summary()
+    return sorted(zip(summary['Tanggal'].astype(str), summary['House'].astype(str), summary['Tangkai']))
+
+def test_snapshot_restore_round_trip(krisan_db, tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    _save('2024-05-01', 'H1', 100)
+    _save('2024-05-02', 'H2', 200)
+    before, totals = _reports(), db_manager.get_harvest_totals()
+    meta = db_backup.create_snapshot(backup_dir=backup_dir)
+    assert meta['archives'] == {}
+
+    _save('2024-05-01', 'H1', 999)
+    _save('2025-01-01', 'H1', 300)
+    db_manager.archive_harvest_before('2025-01-01')
+    archive = db_manager.archive_path('2024')
+    assert os.path.exists(archive)
+    generation = db_manager.get_generation()
+
+    safety = db_backup.restore_snapshot(meta['name'], backup_dir=backup_dir)
+    assert safety['reason'] == 'pre-restore' and safety['archives'] == {'2024': os.path.basename(archive)}
+    assert _reports() == before
+    assert db_manager.get_harvest_totals() == totals
+    # The archive created after the snapshot is gone, not just emptied
+    assert not os.path.exists(archive) and db_manager.list_archives() == {}
+    assert db_manager.get_generation() > generation
+
+    # ...and restoring the safety snapshot brings the archived state back
+    db_backup.restore_snapshot(safety['name'], backup_dir=backup_dir)
+    assert db_manager.list_archives() == {'2024': archive}
+    assert _reports() == [('2024-05-01', 'H1', 999), ('2024-05-02', 'H2', 200), ('2025-01-01', 'H1', 300)]
+
+def test_exclusive_access_waits_for_checked_out_connections(krisan_db):
+    borrowed, release = threading.Event(), threading.Event()
+
+    def hold():
+        with db_manager.get_connection():
+            borrowed.set()
+            release.wait(10)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    borrowed.wait(10)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="still in use"):
+            with db_manager.exclusive_access(timeout=0.1):
+                pass
+    finally:
+        release.set()
+        thread.join(10)
+    with db_manager.exclusive_access(timeout=1):
+        assert db_manager.get_schema_version() == db_manager.SCHEMA_VERSION
@@ -0,0 +1,15 @@
+from utils import db_manager
+from utils.db_maintenance import maintenance_due, maintenance_history, run_maintenance
+
+def test_maintenance_runs_on_the_given_database(krisan_db, tmp_path):
+    other = str(tmp_path / 'other.db')
+    db_manager.migrate(path=other)
+
+    report = run_maintenance(trigger='test', path=other)
+    assert report['queries'] == {}  # the page queries read DB_PATH, not `other`
+    assert [r['trigger'] for r in maintenance_history(path=other)] == ['test']
+    assert maintenance_due(path=other) is None
+    assert maintenance_history() == [] and maintenance_due() == 'first run'
+
+    assert run_maintenance(trigger='test')['queries']
+    assert len(maintenance_history()) == 1
@@ -0,0 +1,117 @@
+import pandas as pd
+
+from utils import db_manager
+
+ROLLUP_TABLES = ('harvest_rollup_daily', 'harvest_rollup_monthly', 'harvest_rollup_daily_grade')
+
+def _report(tanggal, house, batang, grades=('A',)):
+    summary = {
+        'Tanggal': tanggal, 'House': house, 'Tangkai': batang * len(grades), 'Grade A %': 100.0 / len(grades),
+        'Pendapatan': batang * len(grades) * 1000, 'Putih': batang * len(grades), 'Pink': 0, 'Kuning': 0,
+    }
+    details = pd.DataFrame([{
+        'Tanggal': tanggal, 'House': house, 'Varietas': 'Putih', 'Grade': grade, 'Tipe': 'Normal',
+        'Ukuran': '10 bt/ikat', 'Jml_Ikat': batang // 10, 'Isi_per_Ikat': 10, 'Total_Batang': batang,
+        'Harga_per_Ikat': 10000, 'Harga_per_Batang': 1000.0, 'Total_Pendapatan': batang * 1000,
+    } for grade in grades])
+    return summary, details
+
+def _save(tanggal, house, batang, grades=('A',)):
+    assert db_manager.save_harvest_record(*_report(tanggal, house, batang, grades))
+
+def _rollups():
+    with db_manager.get_connection() as conn:
+        return {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall()) for table in ROLLUP_TABLES}
+
+def test_incremental_rollups_match_a_rebuild(krisan_db):
+    _save('2024-05-01', 'H1', 100, grades=('A', 'B'))
+    _save('2024-05-01', 'H2', 200)
+    _save('2024-05-02', 'H1', 300)
+    assert db_manager.save_harvest_records_bulk([
+        _report('2024-06-01', 'H1', 400), _report('2024-06-01', 'H2', 500, grades=('B',)),
+    ])
+    _save('2024-05-01', 'H1', 150, grades=('A',))  # upsert: replaces the two-grade report
+    assert db_manager.clear_database('2024-05-02', '2024-05-02') == 1
+
+    incremental = _rollups()
+    assert sorted(row[:4] for row in incremental['harvest_rollup_daily']) == [
+        ('2024-05-01', 'H1', 1, 150), ('2024-05-01', 'H2', 1, 200),
+        ('2024-06-01', 'H1', 1, 400), ('2024-06-01', 'H2', 1, 500),
+    ]
+    db_manager.rebuild_rollups()
+    assert _rollups() == incremental
+
+def test_write_bumps_generation_and_invalidates_cached_reads(krisan_db):
+    _save('2024-05-01', 'H1', 100)
+    assert len(db_manager.get_harvest_summary()) == 1
+    assert len(db_manager.get_harvest_summary()) == 1
+    assert db_manager.get_cache_stats()['hits'] == 1
+
+    generation = db_manager.get_generation()
+    _save('2024-05-02', 'H1', 200)
+    assert db_manager.get_generation() == generation + 1
+
+    summary = db_manager.get_harvest_summary()
+    assert sorted(summary['tangkai']) == [100, 200]
+    assert db_manager.get_cache_stats()['hits'] == 1
+
+def test_archived_reports_are_read_and_replaced_through_attach_archives(krisan_db):
+    _save('2023-05-01', 'H1', 100)
+    _save('2023-06-01', 'H1', 200)
+    _save('2024-05-01', 'H1', 300)
+    totals = db_manager.get_harvest_totals()
+    assert db_manager.archive_harvest_before('2024-01-01') == {'2023': 2}
+    assert list(db_manager.list_archives()) == ['2023']
+
+    with db_manager.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM harvest_summary").fetchone()[0] == 1
+        assert db_manager.attach_archives(conn, '2023-01-01', '2023-12-31') == ['archive_2023']
+        assert db_manager.attach_archives(conn, '2024-01-01', '2024-12-31') == []
+    summary = db_manager.query_harvest_summary('2023-05-01', '2023-05-31')
+    assert list(summary['Tangkai']) == [100]
+    assert sorted(db_manager.get_harvest_details()['total_batang']) == [100, 200, 300]
+    assert db_manager.get_harvest_totals() == totals
+
+    # Same (tanggal, house) as an archived report: it moves back into main
+    _save('2023-05-01', 'H1', 150)
+    summary = db_manager.query_harvest_summary()
+    assert sorted(zip(summary['Tanggal'].astype(str), summary['Tangkai'])) == [
+        ('2023-05-01', 150), ('2023-06-01', 200), ('2024-05-01', 300),
+    ]
+    with db_manager.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM archive_2023.harvest_summary").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM archive_2023.harvest_details").fetchone()[0] == 1
+    incremental = _rollups()
+    db_manager.rebuild_rollups()
+    assert _rollups() == incremental
+
+def test_sync_harvest_view_appends_new_reports_and_reloads_after_a_rewrite(krisan_db):
+    _save('2024-05-01', 'H1', 100)
+    _save('2024-05-02', 'H1', 200)
+    view = db_manager.sync_harvest_view(None)
+    assert view['appended'] is None and len(view['df']) == 2
+    assert db_manager.sync_harvest_view(view)['appended'] == 0
+
+    # Back-dated new report: appended, and sorted into place
+    _save('2024-04-30', 'H2', 300)
+    view = db_manager.sync_harvest_view(view)
+    assert view['appended'] == 1
+    assert list(view['df']['Tangkai']) == [200, 100, 300]
+
+    # Replaced in place: the view must reload rather than append
+    _save('2024-05-01', 'H1', 150)
+    view = db_manager.sync_harvest_view(view)
+    assert view['appended'] is None
+    assert list(view['df']['Tangkai']) == [200, 150, 300]
+
+    db_manager.clear_database(house='H2')
+    view = db_manager.sync_harvest_view(view)
+    assert view['appended'] is None
+    assert list(view['df']['Tangkai']) == [200, 150]
+
+def test_full_reads_log_database_errors_and_return_empty_frames(krisan_db, caplog):
+    with db_manager.transaction() as conn:
+        conn.execute("DROP VIEW harvest_details")
+    db_manager.clear_read_cache()
+    assert db_manager.get_harvest_details().empty
+    assert "get_harvest_details failed" in caplog.text
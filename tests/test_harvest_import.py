@@ -0,0 +1,48 @@
+import io
+
+from utils import db_manager
+from utils.harvest_import import import_grading_file, iter_raw_chunks, normalize_grading_frame
+
+def _frame(csv):
+    return next(iter_raw_chunks(io.StringIO(csv), 'buku.csv'))
+
+def test_total_batang_only_derives_ikat_from_bunch_size():
+    clean, rejected = normalize_grading_frame(_frame(
+        "Tanggal,House,Varietas,Grade,Total_Batang\n"
+        "2024-05-01,H1,Putih,Grade 80,160\n"
+        "2024-05-01,H1,Putih,A,200\n"
+    ))
+    assert rejected == 1
+    assert clean[['Grade', 'Jml_Ikat', 'Isi_per_Ikat', 'Total_Batang']].to_dict('records') == [
+        {'Grade': 'Grade 80', 'Jml_Ikat': 2, 'Isi_per_Ikat': 80, 'Total_Batang': 160},
+    ]
+
+def test_jml_ikat_only_derives_batang_and_counts_unknown_rows_as_rejected():
+    clean, rejected = normalize_grading_frame(_frame(
+        "Tanggal,House,Varietas,Grade,Ukuran,Jml_Ikat\n"
+        "2024-05-01,H1,Pink,A,50 bt/ikat,3\n"
+        "2024-05-01,H1,Pink,B,,4\n"
+    ))
+    assert rejected == 1
+    assert clean[['Grade', 'Jml_Ikat', 'Isi_per_Ikat', 'Total_Batang']].to_dict('records') == [
+        {'Grade': 'A', 'Jml_Ikat': 3, 'Isi_per_Ikat': 50, 'Total_Batang': 150},
+    ]
+
+def test_both_counts_give_the_bunch_size():
+    clean, rejected = normalize_grading_frame(_frame(
+        "Tanggal,House,Varietas,Grade,Jml_Ikat,Total_Batang\n"
+        "2024-05-01,H1,Kuning,A,4,40\n"
+    ))
+    assert rejected == 0
+    assert clean.loc[clean.index[0], 'Isi_per_Ikat'] == 10
+
+def test_import_total_batang_only_file(krisan_db):
+    book = io.StringIO(
+        "Tanggal,House,Varietas,Grade,Total_Batang\n"
+        "2024-05-01,H1,Putih,Grade 80,160\n"
+        "2024-05-01,H1,Putih,A,200\n"
+    )
+    result = import_grading_file(book, name='buku.csv')
+    assert (result['rows'], result['rejected'], result['inserted']) == (1, 1, 1)
+    summary = db_manager.get_harvest_summary()
+    assert summary['tangkai'].tolist() == [160]
@@ -0,0 +1,20 @@
+from utils import db_manager
+from utils.harvest_writer import HarvestWriter
+
+from test_db_manager import _report
+
+def test_writer_replaces_an_archived_report(krisan_db):
+    db_manager.write_reports([_report('2023-05-01', 'H1', 100), _report('2024-05-01', 'H1', 200)])
+    assert db_manager.archive_harvest_before('2024-01-01') == {'2023': 1}
+
+    writer = HarvestWriter(krisan_db, max_wait=0)
+    try:
+        summary_id = writer.submit(*_report('2023-05-01', 'H1', 150)).result(timeout=10)
+    finally:
+        writer.stop(timeout=10)
+
+    summary = db_manager.query_harvest_summary()
+    assert sorted(zip(summary['Tanggal'].astype(str), summary['Tangkai'])) == [('2023-05-01', 150), ('2024-05-01', 200)]
+    with db_manager.get_connection() as conn:
+        assert conn.execute("SELECT tanggal FROM harvest_summary WHERE id = ?", (summary_id,)).fetchone() == ('2023-05-01',)
+    assert writer.stats()['committed'] == 1
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from utils import db_manager
+from utils.parquet_export import export_harvest_parquet
+
+pytest.importorskip('pyarrow')
+
+def _save(tanggal, house, batang):
+    summary = {
+        'Tanggal': tanggal, 'House': house, 'Tangkai': batang, 'Grade A %': 100.0,
+        'Pendapatan': batang * 1000, 'Putih': batang, 'Pink': 0, 'Kuning': 0,
+    }
+    details = pd.DataFrame([{
+        'Tanggal': tanggal, 'House': house, 'Varietas': 'Putih', 'Grade': 'A', 'Tipe': 'Normal',
+        'Ukuran': '10 bt/ikat', 'Jml_Ikat': batang // 10, 'Isi_per_Ikat': 10, 'Total_Batang': batang,
+        'Harga_per_Ikat': 10000, 'Harga_per_Batang': 1000.0, 'Total_Pendapatan': batang * 1000,
+    }])
+    assert db_manager.save_harvest_record(summary, details)
+
+def _exported(out_dir, table, month):
+    return pd.read_parquet(out_dir / table / 'year=2024' / f'month={month}' / 'part-0.parquet')
+
+def test_edited_report_is_re_exported(krisan_db, tmp_path):
+    out_dir = tmp_path / 'parquet'
+    _save('2024-05-01', 'H1', 100)
+    _save('2024-05-02', 'H1', 300)  # holds the month's max id in both tables
+    _save('2024-06-01', 'H1', 500)
+    export_harvest_parquet(str(out_dir))
+
+    # Same (tanggal, house): replaced in place, the summary keeps its id
+    _save('2024-05-01', 'H1', 999)
+    report = export_harvest_parquet(str(out_dir))
+
+    assert report['harvest_summary']['written'] == ['2024-05']
+    assert report['harvest_details']['written'] == ['2024-05']
+    assert report['harvest_summary']['skipped'] == 1
+    summary = _exported(out_dir, 'harvest_summary', '05')
+    assert summary.set_index('tanggal').loc['2024-05-01', 'tangkai'] == 999
+    details = _exported(out_dir, 'harvest_details', '05')
+    assert sorted(details['total_batang']) == [300, 999]
+
+def test_unchanged_months_are_skipped(krisan_db, tmp_path):
+    out_dir = tmp_path / 'parquet'
+    _save('2024-05-01', 'H1', 100)
+    export_harvest_parquet(str(out_dir))
+    report = export_harvest_parquet(str(out_dir))
+    assert report['harvest_summary']['written'] == [] and report['harvest_details']['written'] == []
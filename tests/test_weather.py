@@ -0,0 +1,107 @@
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+from utils import weather
+
+# Ensure benchmarks/ is in path for the stand-in Open-Meteo server
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+from mock_open_meteo import start_server
+
+@pytest.fixture
+def open_meteo(monkeypatch):
+    """The stand-in Open-Meteo server (no latency) as FORECAST_URL, with fresh breaker and stats."""
+    server, handler = start_server(0)
+    monkeypatch.setattr(weather, 'FORECAST_URL', f"http://127.0.0.1:{server.server_port}/v1/forecast")
+    monkeypatch.setattr(weather, 'BACKOFF_BASE_SECONDS', 0.001)
+    monkeypatch.setattr(weather, '_breaker', weather.CircuitBreaker(failures=2, cooldown=0.2))
+    weather.reset_weather_stats()
+    yield handler
+    server.shutdown()
+    server.server_close()
+    weather.get_session().close()
+
+def _closed_port_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1/forecast"
+
+def _current():
+    return weather.forecast(-6.82, 107.62, current=['temperature_2m'])
+
+def test_timeouts_are_retried_then_reported(open_meteo, monkeypatch):
+    assert _current()['current']['temperature_2m'] == 20.0
+    assert open_meteo.requests == 1
+
+    slow, slow_handler = start_server(0.5)
+    slow.handle_error = lambda request, client_address: None  # answers to clients that gave up
+    try:
+        monkeypatch.setattr(weather, 'FORECAST_URL', f"http://127.0.0.1:{slow.server_port}/v1/forecast")
+        monkeypatch.setattr(weather, 'READ_TIMEOUT', 0.1)
+        with pytest.raises(weather.WeatherError, match="timeout"):
+            _current()
+        assert slow_handler.requests == weather.MAX_RETRIES + 1
+    finally:
+        slow.shutdown()
+        slow.server_close()
+    stats = weather.get_weather_stats()
+    assert stats['retries'] == weather.MAX_RETRIES
+    assert stats['timeouts'] == weather.MAX_RETRIES + 1
+    assert stats['calls'] == 2 and stats['errors'] == 1
+
+def test_breaker_opens_then_lets_one_trial_call_through(open_meteo, monkeypatch):
+    url = weather.FORECAST_URL
+    monkeypatch.setattr(weather, 'FORECAST_URL', _closed_port_url())
+    for _ in range(2):
+        with pytest.raises(weather.WeatherError) as failure:
+            _current()
+        assert not isinstance(failure.value, weather.CircuitOpen)
+    assert weather._breaker.state == 'open'
+    with pytest.raises(weather.CircuitOpen):
+        _current()
+    assert weather.get_weather_stats()['rejected'] == 1
+
+    # Half-open: a failed trial call opens it again for another cooldown
+    time.sleep(0.25)
+    assert weather._breaker.state == 'half-open'
+    with pytest.raises(weather.WeatherError):
+        _current()
+    assert weather._breaker.state == 'open'
+
+    # A successful trial call closes it
+    time.sleep(0.25)
+    monkeypatch.setattr(weather, 'FORECAST_URL', url)
+    assert _current()['current']['temperature_2m'] == 20.0
+    assert weather._breaker.state == 'closed'
+    assert open_meteo.requests == 1
+
+@pytest.mark.parametrize('answer', [
+    {'latitude': -6.82, 'longitude': 107.62},  # no current block
+    {'latitude': -6.82, 'longitude': 107.62, 'current': None},
+    [],  # no locations at all
+])
+def test_incomplete_answers_raise_weather_error(monkeypatch, answer):
+    monkeypatch.setattr(weather, 'forecast', lambda *args, **kwargs: answer)
+    with pytest.raises(weather.WeatherError):
+        weather._fetch_cells([weather.grid_cell(-6.82, 107.62)], ('current',))
+
+def test_offline_lookup_serves_the_blocks_it_has(open_meteo, monkeypatch, tmp_path):
+    monkeypatch.setattr(weather, 'WEATHER_DB_PATH', str(tmp_path / 'weather.db'))
+    weather.clear_weather_cache()
+    try:
+        assert weather.get_weather(-6.82, 107.62, ('current',))['missing'] == []
+
+        monkeypatch.setattr(weather, '_offline_mode', True)
+        served = weather.get_weather(-6.82, 107.62, ('current', 'daily'))
+        assert served['offline'] and served['missing'] == ['daily']
+        assert served['current']['temperature_2m'] == 20.0
+        assert 'daily' not in served and list(served['fetched_at']) == ['current']
+        with pytest.raises(weather.WeatherError):
+            weather.get_weather(-6.82, 107.62, ('daily',))
+    finally:
+        weather.clear_weather_cache()
+    assert open_meteo.requests == 1
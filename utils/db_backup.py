@@ -0,0 +1,256 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from utils import db_manager
+
+# Online snapshots of krisan.db (and its yearly archives) with the sqlite3
+# backup API. The copy runs PAGES_PER_STEP pages at a time with a short
+# pause after each step, so the read lock is only held briefly and grading
+# saves keep going while a snapshot is taken. A write from another
+# connection restarts the copy; after MAX_RESTARTS the snapshot is finished
+# in a single step instead (one WAL read transaction, which does not block
+# writers either).
+#
+#   backups/<YYYYmmdd-HHMMSS>/krisan.db
+#   backups/<YYYYmmdd-HHMMSS>/krisan_archive_2023.db
+#   backups/<YYYYmmdd-HHMMSS>/snapshot.json
+#
+# Snapshots are written into a .part directory and renamed when complete.
+BACKUP_DIR = 'backups'
+SNAPSHOT_META = 'snapshot.json'
+PAGES_PER_STEP = 256  # 1 MB per step at the default 4 KiB page size
+STEP_PAUSE_SECONDS = 0.002
+MAX_RESTARTS = 2
+
+# Retention: the newest KEEP_LAST snapshots, plus the newest one of each of
+# the last KEEP_DAILY days
+SNAPSHOT_INTERVAL_HOURS = 6
+KEEP_LAST = 4
+KEEP_DAILY = 14
+
+class _TooManyRestarts(Exception):
+    pass
+
+def _copy_database(src_path, dst_path, pages=PAGES_PER_STEP):
+    """Online-copy src_path to dst_path; returns steps, restarts and the mode used."""
+    progress = {'steps': 0, 'restarts': 0, 'remaining': None}
+
+    def on_step(status, remaining, total):
+        if progress['remaining'] is not None and remaining > progress['remaining']:
+            # Another connection wrote to the source: the copy started over
+            progress['restarts'] += 1
+            if progress['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        progress['steps'] += 1
+        progress['remaining'] = remaining
+        if remaining:
+            time.sleep(STEP_PAUSE_SECONDS)
+
+    src = sqlite3.connect(src_path, timeout=db_manager.BUSY_TIMEOUT_MS / 1000)
+    dst = sqlite3.connect(dst_path)
+    try:
+        mode = 'stepped' if pages > 0 else 'single-step'
+        try:
+            src.backup(dst, pages=pages, progress=on_step)
+        except _TooManyRestarts:
+            mode = 'single-step'
+            src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return {'steps': progress['steps'], 'restarts': progress['restarts'], 'mode': mode}
+
+def list_snapshots(backup_dir=BACKUP_DIR):
+    """Metadata of every complete snapshot, newest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    snapshots = []
+    for name in os.listdir(backup_dir):
+        meta_path = os.path.join(backup_dir, name, SNAPSHOT_META)
+        if name.endswith('.part') or not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            snapshots.append(json.load(f))
+    return sorted(snapshots, key=lambda s: s['name'], reverse=True)
+
+def create_snapshot(reason='manual', backup_dir=BACKUP_DIR, pages=PAGES_PER_STEP, path=None):
+    """Snapshot `path` (default DB_PATH) and its archives; returns the snapshot metadata."""
+    path = path or db_manager.DB_PATH
+    name = datetime.now().strftime('%Y%m%d-%H%M%S')
+    snap_dir = os.path.join(backup_dir, name)
+    if os.path.exists(snap_dir):
+        name += datetime.now().strftime('-%f')
+        snap_dir = os.path.join(backup_dir, name)
+    part_dir = snap_dir + '.part'
+    shutil.rmtree(part_dir, ignore_errors=True)
+    os.makedirs(part_dir)
+
+    start = time.perf_counter()
+    main_file = os.path.basename(path)
+    result = _copy_database(path, os.path.join(part_dir, main_file), pages)
+    archives = {}
+    for year, archive in db_manager.list_archives(path).items():
+        archives[year] = os.path.basename(archive)
+        _copy_database(archive, os.path.join(part_dir, archives[year]), pages)
+    duration_ms = (time.perf_counter() - start) * 1000
+
+    size = sum(os.path.getsize(os.path.join(part_dir, f)) for f in os.listdir(part_dir))
+    meta = {
+        'name': name,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'reason': reason,
+        'database': main_file,
+        'archives': archives,
+        'schema_version': db_manager.get_schema_version(path),
+        'size_bytes': size,
+        'duration_ms': round(duration_ms, 1),
+        **result,
+    }
+    with open(os.path.join(part_dir, SNAPSHOT_META), 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(part_dir, snap_dir)
+    return meta
+
+def prune_snapshots(keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, backup_dir=BACKUP_DIR):
+    """Delete snapshots outside the retention policy; returns the deleted names."""
+    snapshots = list_snapshots(backup_dir)
+    keep = {s['name'] for s in snapshots[:keep_last]}
+    oldest_day = (datetime.now() - timedelta(days=keep_daily)).date()
+    days_kept = set()
+    for s in snapshots:
+        day = datetime.fromisoformat(s['created']).date()
+        if day >= oldest_day and day not in days_kept:
+            days_kept.add(day)
+            keep.add(s['name'])
+    deleted = [s['name'] for s in snapshots if s['name'] not in keep]
+    for name in deleted:
+        shutil.rmtree(os.path.join(backup_dir, name), ignore_errors=True)
+    return deleted
+
+def restore_snapshot(name, backup_dir=BACKUP_DIR, path=None):
+    """Replace the live database `path` (default DB_PATH) and its archives with snapshot `name`.
+
+    The current state is snapshotted first ('pre-restore'), so a restore
+    can itself be undone. Raises sqlite3.OperationalError if other threads
+    keep connections to the database checked out (db_manager.exclusive_access).
+    Returns the metadata of that safety snapshot.
+    """
+    path = path or db_manager.DB_PATH
+    snap_dir = os.path.join(backup_dir, name)
+    with open(os.path.join(snap_dir, SNAPSHOT_META)) as f:
+        meta = json.load(f)
+    safety = create_snapshot(reason='pre-restore', backup_dir=backup_dir, path=path)
+    generation = db_manager.get_generation(path) or 0
+    changes = db_manager.get_harvest_changes(path) or {'version': 0, 'rewrite_version': 0}
+
+    # No other session may hold a connection while the files are replaced;
+    # they wait for the restore to finish instead
+    with db_manager.exclusive_access(path):
+        _copy_database(os.path.join(snap_dir, meta['database']), path, pages=-1)
+        for year, archive in db_manager.list_archives(path).items():
+            if year not in meta['archives']:
+                # Newer than the snapshot: its rows are back in main
+                for file_path in (archive, archive + '-wal', archive + '-shm'):
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+        for year, file_name in meta['archives'].items():
+            _copy_database(os.path.join(snap_dir, file_name), db_manager.archive_path(year, path), pages=-1)
+        db_manager.invalidate_archive_list(path)
+
+        # The snapshot may predate later migrations, and its counters must not
+        # look older than what sessions and the read cache have already seen
+        db_manager.migrate(path=path)
+        with db_manager.transaction(path) as conn:
+            conn.execute("UPDATE db_generation SET generation = MAX(generation, ?) + 1 WHERE id = 1", (generation,))
+            conn.execute('''
+                UPDATE harvest_changes
+                SET version = MAX(version, ?) + 1, rewrite_version = MAX(rewrite_version, ?) + 1
+                WHERE id = 1
+            ''', (changes['version'], changes['rewrite_version']))
+    db_manager.clear_read_cache()
+    return safety
+
+# ========== SCHEDULE ==========
+class BackupScheduler:
+    """Daemon thread taking a snapshot every interval and pruning old ones."""
+
+    def __init__(self, interval_hours=SNAPSHOT_INTERVAL_HOURS, backup_dir=BACKUP_DIR, db_path=None):
+        self.interval = timedelta(hours=interval_hours)
+        self.backup_dir = backup_dir
+        self.db_path = db_path or db_manager.DB_PATH
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"backup-scheduler:{self.db_path}", daemon=True)
+        self._thread.start()
+
+    def next_due(self):
+        snapshots = list_snapshots(self.backup_dir)
+        if not snapshots:
+            return datetime.now()
+        return datetime.fromisoformat(snapshots[0]['created']) + self.interval
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = (self.next_due() - datetime.now()).total_seconds()
+            if wait > 0:
+                self._stop.wait(min(wait, 3600))
+                continue
+            try:
+                create_snapshot('scheduled', self.backup_dir, path=self.db_path)
+                prune_snapshots(backup_dir=self.backup_dir)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                self._stop.wait(600)  # try again later
+
+_scheduler_lock = threading.Lock()
+_schedulers = {}
+
+def start_backup_scheduler():
+    """Start (once per process) the scheduled snapshots of db_manager.DB_PATH."""
+    path = db_manager.DB_PATH
+    with _scheduler_lock:
+        scheduler = _schedulers.get(path)
+        if scheduler is None or not scheduler._thread.is_alive():
+            scheduler = _schedulers[path] = BackupScheduler(db_path=path)
+        return scheduler
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Online snapshots of the krisan database")
+    parser.add_argument('--db', default=db_manager.DB_PATH, help="path to the SQLite file (default: %(default)s)")
+    parser.add_argument('--dir', default=BACKUP_DIR, help="snapshot directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    snapshot_cmd = commands.add_parser('snapshot', help="take a snapshot now")
+    snapshot_cmd.add_argument('--pages', type=int, default=PAGES_PER_STEP, help="pages copied per step (-1: all at once)")
+    commands.add_parser('list', help="list snapshots, newest first")
+    restore_cmd = commands.add_parser('restore', help="restore a snapshot (the current state is snapshotted first)")
+    restore_cmd.add_argument('name')
+    commands.add_parser('prune', help=f"apply retention (newest {KEEP_LAST} + one per day for {KEEP_DAILY} days)")
+    args = parser.parse_args()
+
+    db_manager.DB_PATH = args.db
+    if args.command == 'snapshot':
+        meta = create_snapshot(backup_dir=args.dir, pages=args.pages)
+        print(f"{meta['name']}: {meta['size_bytes'] / 1024 / 1024:.1f} MB in {meta['duration_ms']:.0f} ms "
+              f"({meta['mode']}, {meta['steps']} steps, {meta['restarts']} restarts)")
+    elif args.command == 'list':
+        for meta in list_snapshots(args.dir):
+            print(f"{meta['name']}  {meta['reason']:<12} {meta['size_bytes'] / 1024 / 1024:8.1f} MB  "
+                  f"schema {meta['schema_version']}  archives: {', '.join(meta['archives']) or '-'}")
+    elif args.command == 'restore':
+        safety = restore_snapshot(args.name, args.dir)
+        print(f"{db_manager.DB_PATH}: restored {args.name} (previous state saved as {safety['name']})")
+    elif args.command == 'prune':
+        deleted = prune_snapshots(backup_dir=args.dir)
+        print(f"{len(deleted)} snapshots deleted" + (f": {', '.join(deleted)}" if deleted else ""))
@@ -0,0 +1,261 @@
+import inspect
+import json
+import os
+import statistics
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from utils import db_manager
+
+# Maintenance of krisan.db after large imports and range deletes:
+#
+# 1. incremental VACUUM: hand the free pages back to the file system
+#    (or, with convert=True, one full VACUUM that switches an older file to
+#    auto_vacuum=INCREMENTAL; it blocks writes while it runs)
+# 2. ANALYZE (bounded by ANALYSIS_LIMIT rows per index) and PRAGMA optimize,
+#    so the planner has statistics, archives included
+# 3. WAL checkpoint (TRUNCATE)
+#
+# Each run times COMMON_QUERIES before and after and is logged in
+# maintenance_log. The optional idle trigger runs it when the app has been
+# quiet for IDLE_MINUTES and a run is due (see maintenance_due).
+ANALYSIS_LIMIT = 1000
+QUERY_REPEAT = 5
+
+IDLE_MAINTENANCE = True
+IDLE_MINUTES = 10
+CHECK_SECONDS = 60
+MAX_AGE_HOURS = 24  # due at least once a day...
+CHANGE_THRESHOLD = 500  # ...or after this many reports written...
+FREELIST_RATIO = 0.10  # ...or when this share of the file is free pages
+
+def _raw(name):
+    # Bypass the read cache and the call stats: timings must hit SQLite,
+    # and the idle trigger must not count its own calls as activity
+    return inspect.unwrap(getattr(db_manager, name))
+
+def _common_queries():
+    today = date.today()
+    last_90 = (today - timedelta(days=90), today)
+    return [
+        ("query_harvest_summary(limit=50)", lambda: _raw('query_harvest_summary')(limit=50)),
+        ("query_harvest_details(90 hari, limit=50)", lambda: _raw('query_harvest_details')(*last_90, limit=50)),
+        ("count_harvest_details(90 hari)", lambda: _raw('count_harvest_details')(*last_90)),
+        ("harvest_trend('day', 90 hari, by_house)", lambda: _raw('harvest_trend')('day', *last_90, by_house=True)),
+        ("harvest_totals_by_variety()", lambda: _raw('harvest_totals_by_variety')()),
+        ("get_harvest_totals()", lambda: _raw('get_harvest_totals')()),
+        ("planting_status_counts(by_house)", lambda: _raw('_planting_status_counts')(str(today), True)),
+    ]
+
+def time_common_queries(repeat=QUERY_REPEAT):
+    """{query: median ms} for the queries the pages run most."""
+    timings = {}
+    for label, query in _common_queries():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[label] = round(statistics.median(samples), 3)
+    return timings
+
+def file_stats(path=None):
+    path = path or db_manager.DB_PATH
+    with db_manager.get_connection(path) as conn:
+        page_size, page_count, freelist, auto_vacuum = (
+            conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum')
+        )
+    wal = path + '-wal'
+    return {
+        'db_bytes': os.path.getsize(path),
+        'wal_bytes': os.path.getsize(wal) if os.path.exists(wal) else 0,
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_pages': freelist,
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}[auto_vacuum],
+    }
+
+def _timed(steps, name, fn):
+    start = time.perf_counter()
+    result = fn()
+    steps[name] = {'ms': round((time.perf_counter() - start) * 1000, 1)}
+    return result
+
+def run_maintenance(trigger='manual', convert=False, analysis_limit=ANALYSIS_LIMIT, path=None):
+    """Vacuum, analyze/optimize and checkpoint `path` (default DB_PATH); returns the report that was logged.
+
+    COMMON_QUERIES run through the db_manager entry points, so they are
+    only timed when `path` is the DB_PATH those read.
+    """
+    path = path or db_manager.DB_PATH
+    timed_queries = path == db_manager.DB_PATH
+    started = datetime.now()
+    start = time.perf_counter()
+    before, queries_before = file_stats(path), time_common_queries() if timed_queries else {}
+    steps = {}
+
+    with db_manager.get_connection(path) as conn:
+        if convert and before['auto_vacuum'] != 'incremental':
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            _timed(steps, 'vacuum', lambda: conn.execute("VACUUM"))
+        elif before['auto_vacuum'] == 'incremental':
+            # execute() steps the pragma once, freeing a single page;
+            # executescript() runs it to completion
+            _timed(steps, 'incremental_vacuum', lambda: conn.executescript("PRAGMA incremental_vacuum"))
+            steps['incremental_vacuum']['pages'] = before['freelist_pages']
+
+        # ANALYZE and optimize cover every attached schema
+        db_manager.attach_archives(conn, path=path)
+        conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        _timed(steps, 'analyze', lambda: conn.execute("ANALYZE"))
+        _timed(steps, 'optimize', lambda: conn.execute("PRAGMA optimize"))
+        busy, wal_pages, checkpointed = _timed(
+            steps, 'checkpoint', lambda: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        )
+        steps['checkpoint'].update(busy=bool(busy), wal_pages=wal_pages, checkpointed=checkpointed)
+
+    after, queries_after = file_stats(path), time_common_queries() if timed_queries else {}
+    changes = _raw('get_harvest_changes')(path) or {'version': 0}
+    report = {
+        'started_at': started.isoformat(timespec='seconds'),
+        'trigger': trigger,
+        'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+        'before': before,
+        'after': after,
+        'steps': steps,
+        'queries': {label: {'before': queries_before[label], 'after': queries_after[label]} for label in queries_before},
+        'harvest_version': changes['version'],
+    }
+    with db_manager.transaction(path) as conn:
+        conn.execute('''
+            INSERT INTO maintenance_log (started_at, trigger, duration_ms, size_before, size_after, harvest_version, report)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            report['started_at'], trigger, report['duration_ms'],
+            before['db_bytes'] + before['wal_bytes'], after['db_bytes'] + after['wal_bytes'],
+            report['harvest_version'], json.dumps(report)
+        ))
+    return report
+
+def maintenance_history(limit=10, path=None):
+    """Reports of the latest runs, newest first."""
+    with db_manager.get_connection(path) as conn:
+        rows = conn.execute("SELECT report FROM maintenance_log ORDER BY id DESC LIMIT ?", (int(limit),)).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+def maintenance_due(path=None):
+    """Why a run is due ('first run', 'interval', 'changes', 'fragmentation'), or None."""
+    history = maintenance_history(limit=1, path=path)
+    if not history:
+        return 'first run'
+    last = history[0]
+    if datetime.now() - datetime.fromisoformat(last['started_at']) >= timedelta(hours=MAX_AGE_HOURS):
+        return 'interval'
+    changes = _raw('get_harvest_changes')(path)
+    if changes and changes['version'] - last['harvest_version'] >= CHANGE_THRESHOLD:
+        return 'changes'
+    stats = file_stats(path)
+    if stats['freelist_pages'] >= FREELIST_RATIO * stats['page_count']:
+        return 'fragmentation'
+    return None
+
+# ========== IDLE TRIGGER ==========
+class MaintenanceScheduler:
+    """Daemon thread running maintenance once the app is idle and a run is due."""
+
+    def __init__(self, idle_minutes=IDLE_MINUTES, check_seconds=CHECK_SECONDS, db_path=None):
+        self.idle = timedelta(minutes=idle_minutes)
+        self.check_seconds = check_seconds
+        self.db_path = db_path or db_manager.DB_PATH
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"db-maintenance:{self.db_path}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _activity(self):
+        # Any write moves the generation; any page read moves the call count
+        return db_manager.get_generation(self.db_path), db_manager.get_db_stats()['Panggilan'].sum()
+
+    def _run(self):
+        activity, quiet_since = self._activity(), datetime.now()
+        while not self._stop.wait(self.check_seconds):
+            current = self._activity()
+            if current != activity:
+                activity, quiet_since = current, datetime.now()
+                continue
+            if datetime.now() - quiet_since < self.idle:
+                continue
+            try:
+                reason = maintenance_due(self.db_path)
+                if reason:
+                    run_maintenance(trigger=f"idle ({reason})", path=self.db_path)
+                    activity = self._activity()  # our own log entry is not activity
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            quiet_since = datetime.now()
+
+_scheduler_lock = threading.Lock()
+_schedulers = {}
+
+def start_maintenance_scheduler():
+    """Start (once per process) the idle trigger for DB_PATH; None when IDLE_MAINTENANCE is off."""
+    if not IDLE_MAINTENANCE:
+        return None
+    path = db_manager.DB_PATH
+    with _scheduler_lock:
+        scheduler = _schedulers.get(path)
+        if scheduler is None or not scheduler._thread.is_alive():
+            scheduler = _schedulers[path] = MaintenanceScheduler(db_path=path)
+        return scheduler
+
+def format_report(report):
+    mb = 1024 * 1024
+    before, after = report['before'], report['after']
+    lines = [
+        f"{report['started_at']} ({report['trigger']}): {report['duration_ms']:.0f} ms",
+        f"  file   {(before['db_bytes'] + before['wal_bytes']) / mb:8.1f} MB -> "
+        f"{(after['db_bytes'] + after['wal_bytes']) / mb:8.1f} MB  (WAL {before['wal_bytes'] / mb:.1f} -> "
+        f"{after['wal_bytes'] / mb:.1f} MB, free pages {before['freelist_pages']} -> {after['freelist_pages']}, "
+        f"auto_vacuum {after['auto_vacuum']})",
+    ]
+    lines += [f"  {name:<20} {step['ms']:8.1f} ms" for name, step in report['steps'].items()]
+    lines.append(f"  {'query':<42} {'before':>10} {'after':>10}")
+    lines += [
+        f"  {label:<42} {t['before']:>7.2f} ms {t['after']:>7.2f} ms"
+        for label, t in report['queries'].items()
+    ]
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vacuum, analyze and checkpoint the krisan database")
+    parser.add_argument('--db', default=db_manager.DB_PATH, help="path to the SQLite file (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_cmd = commands.add_parser('run', help="run maintenance now")
+    run_cmd.add_argument('--convert', action='store_true',
+                         help="switch to auto_vacuum=INCREMENTAL with one full VACUUM (blocks writes while it runs)")
+    run_cmd.add_argument('--analysis-limit', type=int, default=ANALYSIS_LIMIT, help="rows ANALYZE samples per index")
+    commands.add_parser('status', help="file stats and whether a run is due")
+    history_cmd = commands.add_parser('history', help="reports of the latest runs")
+    history_cmd.add_argument('--limit', type=int, default=5)
+    args = parser.parse_args()
+
+    db_manager.DB_PATH = args.db
+    db_manager.init_db()
+    if args.command == 'run':
+        print(format_report(run_maintenance(convert=args.convert, analysis_limit=args.analysis_limit)))
+    elif args.command == 'status':
+        for key, value in file_stats().items():
+            print(f"{key:<16} {value}")
+        print(f"{'due':<16} {maintenance_due() or 'no'}")
+    elif args.command == 'history':
+        for report in maintenance_history(args.limit):
+            print(format_report(report))
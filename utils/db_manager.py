@@ -1,14 +1,186 @@
+import csv
+import hashlib
+import io
+import logging
+import os
+import re
 import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from itertools import repeat
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = 'krisan.db'
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
+# ========== CONNECTION POOL ==========
+# Streamlit runs every rerun on a script thread, so each call borrows a
+# connection from a small per-file pool instead of paying connect/close
+# (and a journal fsync) every time. A connection is only ever used by the
+# thread that borrowed it; nested calls on the same thread reuse it.
+# exclusive_access() drains the pool for a file that is about to be
+# replaced (db_backup.restore_snapshot).
+BUSY_TIMEOUT_MS = 5000
+POOL_SIZE = 8
+
+CONNECTION_PRAGMAS = (
+    # Must precede WAL to apply to a new file; existing files switch on
+    # their next VACUUM (see utils/db_maintenance.py)
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous = NORMAL",  # safe with WAL, fsync only at checkpoint
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",  # ~16 MB page cache per connection
+    "PRAGMA mmap_size = 134217728",
+)
+
+_pool_lock = threading.Lock()
+_pool_changed = threading.Condition(_pool_lock)
+_idle_connections = {}  # db path -> list of idle connections
+_checked_out = {}  # db path -> connections currently borrowed
+_exclusive = {}  # db path -> thread inside exclusive_access()
+_local = threading.local()
+
+class _Connection(sqlite3.Connection):
+    # Archive schemas ATTACHed on this connection, once looked up (see YEARLY ARCHIVES)
+    archive_schemas = None
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, factory=_Connection)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _held_connections():
+    if not hasattr(_local, 'held'):
+        _local.held = {}
+    return _local.held
+
+@contextmanager
+def get_connection(path=None):
+    """Borrow a pooled connection to `path` (default DB_PATH) for the current thread."""
+    path = path or DB_PATH
+    held = _held_connections()
+    if path in held:
+        # Nested call on the same thread: share the outer connection
+        yield held[path]
+        return
+
+    me = threading.get_ident()
+    with _pool_changed:
+        # While another thread replaces the file (exclusive_access), wait
+        _pool_changed.wait_for(lambda: _exclusive.get(path, me) == me)
+        _checked_out[path] = _checked_out.get(path, 0) + 1
+        idle = _idle_connections.get(path)
+        conn = idle.pop() if idle else None
+    if conn is None:
+        try:
+            conn = _open_connection(path)
+        except Exception:
+            with _pool_changed:
+                _checked_out[path] -= 1
+                _pool_changed.notify_all()
+            raise
+    # Feeds the slow-query log (see INSTRUMENTATION) while it is on
+    conn.set_trace_callback(_trace_statement if _slow_query_ms is not None else None)
+
+    held[path] = conn
+    try:
+        yield conn
+    finally:
+        del held[path]
+        if conn.in_transaction:
+            conn.rollback()
+        with _pool_changed:
+            _checked_out[path] -= 1
+            idle = _idle_connections.setdefault(path, [])
+            if len(idle) < POOL_SIZE:
+                idle.append(conn)
+                conn = None
+            _pool_changed.notify_all()
+        if conn is not None:
+            conn.close()
+
+@contextmanager
+def transaction(path=None):
+    """Pooled connection wrapped in a commit/rollback block (nest-safe)."""
+    path = path or DB_PATH
+    if not hasattr(_local, 'tx_depth'):
+        _local.tx_depth = {}
+    with get_connection(path) as conn:
+        outermost = path not in _local.tx_depth
+        _local.tx_depth[path] = _local.tx_depth.get(path, 0) + 1
+        changes_before = conn.total_changes
+        try:
+            yield conn
+            if outermost:
+                # Any write invalidates cached reads (see READ CACHE)
+                if conn.total_changes != changes_before:
+                    _bump_generation(conn)
+                conn.commit()
+        except Exception:
+            if outermost:
+                conn.rollback()
+            raise
+        finally:
+            _local.tx_depth[path] -= 1
+            if outermost:
+                del _local.tx_depth[path]
+
+def close_all_connections():
+    """Close every idle pooled connection; borrowed ones are closed or pooled when returned."""
+    with _pool_lock:
+        pools = list(_idle_connections.values())
+        _idle_connections.clear()
+    for idle in pools:
+        for conn in idle:
+            conn.close()
+
+@contextmanager
+def exclusive_access(path=None, timeout=BUSY_TIMEOUT_MS / 1000):
+    """Keep other threads off `path` (default DB_PATH), e.g. while its file is replaced.
+
+    Waits up to `timeout` seconds for borrowed connections to come back,
+    raising sqlite3.OperationalError if they do not, then closes the idle
+    ones. Until the block ends, get_connection(path) on other threads
+    waits; the calling thread can keep using it.
+    """
+    path = path or DB_PATH
+    if path in _held_connections():
+        raise sqlite3.OperationalError(f"{path}: this thread still holds a connection")
+    with _pool_changed:
+        if not _pool_changed.wait_for(lambda: path not in _exclusive, timeout):
+            raise sqlite3.OperationalError(f"{path}: already in exclusive use")
+        _exclusive[path] = threading.get_ident()
+        if not _pool_changed.wait_for(lambda: not _checked_out.get(path), timeout):
+            del _exclusive[path]
+            _pool_changed.notify_all()
+            raise sqlite3.OperationalError(f"{path}: {_checked_out[path]} connection(s) still in use")
+        idle = _idle_connections.pop(path, [])
+    for conn in idle:
+        conn.close()
+    try:
+        yield
+    finally:
+        with _pool_changed:
+            del _exclusive[path]
+            _pool_changed.notify_all()
+
+# ========== SCHEMA MIGRATIONS ==========
+# The schema version lives in PRAGMA user_version. Each migration runs once,
+# in order, in its own transaction. Append new migrations to MIGRATIONS;
+# never edit or reorder ones that have already shipped.
+
+def _migration_1_base_tables(c):
     # Table Harvest Summary
     c.execute('''
         CREATE TABLE IF NOT EXISTS harvest_summary (
@@ -23,7 +195,7 @@ def init_db():
             kuning INTEGER
         )
     ''')
-    
+
     # Table Harvest Details
     c.execute('''
         CREATE TABLE IF NOT EXISTS harvest_details (
@@ -44,92 +216,1694 @@ def init_db():
             FOREIGN KEY (summary_id) REFERENCES harvest_summary(id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
 
-def save_harvest_record(summary_data, details_df):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
+def _migration_2_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_summary_tanggal_house ON harvest_summary (tanggal, house)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_details_summary_id ON harvest_details (summary_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_details_tanggal_house ON harvest_details (tanggal, house)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_details_tanggal_varietas_grade ON harvest_details (tanggal, varietas, grade)")
+
+def _migration_3_rollups(c):
+    # Pre-aggregated per-day (and per-month) totals, kept in step with
+    # harvest_summary/harvest_details by _update_rollups
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_rollup_daily (
+            tanggal TEXT NOT NULL,
+            house TEXT NOT NULL,
+            laporan INTEGER NOT NULL DEFAULT 0,
+            tangkai INTEGER NOT NULL DEFAULT 0,
+            pendapatan INTEGER NOT NULL DEFAULT 0,
+            grade_a_weight REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (tanggal, house)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_rollup_monthly (
+            bulan TEXT NOT NULL,
+            house TEXT NOT NULL,
+            laporan INTEGER NOT NULL DEFAULT 0,
+            tangkai INTEGER NOT NULL DEFAULT 0,
+            pendapatan INTEGER NOT NULL DEFAULT 0,
+            grade_a_weight REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (bulan, house)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_rollup_daily_grade (
+            tanggal TEXT NOT NULL,
+            house TEXT NOT NULL,
+            varietas TEXT NOT NULL,
+            tipe TEXT NOT NULL,
+            grade TEXT NOT NULL,
+            baris INTEGER NOT NULL DEFAULT 0,
+            jml_ikat INTEGER NOT NULL DEFAULT 0,
+            total_batang INTEGER NOT NULL DEFAULT 0,
+            total_pendapatan INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tanggal, house, varietas, tipe, grade)
+        ) WITHOUT ROWID
+    ''')
+    _rebuild_rollups(c)
+
+def _migration_4_generation(c):
+    # Single-row write counter used to invalidate cached reads
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS db_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        )
+    ''')
+    c.execute("INSERT OR IGNORE INTO db_generation (id, generation) VALUES (1, 0)")
+
+def _migration_5_import_log(c):
+    # One row per report created by utils.harvest_import, so re-importing
+    # the same grading book is a no-op and a corrected one replaces it
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_import_log (
+            tanggal TEXT NOT NULL,
+            house TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            summary_id INTEGER NOT NULL,
+            source TEXT,
+            imported_at TEXT,
+            PRIMARY KEY (tanggal, house)
+        )
+    ''')
+
+def _migration_6_ledgers(c):
+    # Farm ledgers that used to live only in st.session_state
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS cost_journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            day TEXT,
+            category TEXT NOT NULL,
+            description TEXT,
+            amount INTEGER NOT NULL
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cost_journal_date ON cost_journal (date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cost_journal_category_date ON cost_journal (category, date)")
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS planting_schedule (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            house TEXT NOT NULL,
+            bed_id TEXT NOT NULL,
+            planting_date TEXT NOT NULL,
+            harvest_start TEXT NOT NULL,
+            harvest_end TEXT NOT NULL,
+            clearing_start TEXT NOT NULL,
+            next_planting TEXT NOT NULL,
+            days_vegetatif INTEGER NOT NULL,
+            days_generatif INTEGER NOT NULL,
+            days_harvest INTEGER NOT NULL,
+            days_jeda INTEGER NOT NULL
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_planting_house_date ON planting_schedule (house, planting_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_planting_bed_id ON planting_schedule (bed_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_planting_harvest ON planting_schedule (harvest_start, harvest_end)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_planting_clearing ON planting_schedule (clearing_start, next_planting)")
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            time TEXT,
+            beds TEXT,
+            stems INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_harvest_sessions_date ON harvest_sessions (date)")
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS growth_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            house TEXT NOT NULL,
+            date TEXT NOT NULL,
+            week INTEGER NOT NULL,
+            height REAL,
+            leaves INTEGER,
+            diameter REAL,
+            temp REAL,
+            humidity REAL
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_growth_house_week ON growth_data (house, week)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_growth_date ON growth_data (date)")
+
+def _migration_7_compact_details(c):
+    # harvest_details becomes a view over harvest_details_data, which keeps
+    # day numbers (days since 1970-01-01) and lookup ids instead of repeating
+    # the date/house/variety/grade strings on every row
+    c.execute("CREATE TABLE IF NOT EXISTS harvest_houses (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    c.execute("CREATE TABLE IF NOT EXISTS harvest_varieties (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_grades (
+            id INTEGER PRIMARY KEY,
+            grade TEXT,
+            tipe TEXT,
+            ukuran TEXT,
+            UNIQUE (grade, tipe, ukuran)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_details_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            summary_id INTEGER,
+            day INTEGER,
+            house_id INTEGER,
+            variety_id INTEGER,
+            grade_id INTEGER,
+            jml_ikat INTEGER,
+            isi_per_ikat INTEGER,
+            total_batang INTEGER,
+            harga_per_ikat INTEGER,
+            harga_per_batang REAL,
+            total_pendapatan INTEGER,
+            FOREIGN KEY (summary_id) REFERENCES harvest_summary(id),
+            FOREIGN KEY (house_id) REFERENCES harvest_houses(id),
+            FOREIGN KEY (variety_id) REFERENCES harvest_varieties(id),
+            FOREIGN KEY (grade_id) REFERENCES harvest_grades(id)
+        )
+    ''')
+
+    # Existing rows
+    c.execute("INSERT INTO harvest_houses (name) SELECT DISTINCT house FROM harvest_details WHERE house IS NOT NULL")
+    c.execute("INSERT INTO harvest_varieties (name) SELECT DISTINCT varietas FROM harvest_details WHERE varietas IS NOT NULL")
+    c.execute('''
+        INSERT INTO harvest_grades (grade, tipe, ukuran)
+        SELECT DISTINCT grade, tipe, ukuran FROM harvest_details
+        WHERE grade IS NOT NULL OR tipe IS NOT NULL OR ukuran IS NOT NULL
+    ''')
+    c.execute('''
+        INSERT INTO harvest_details_data (
+            id, summary_id, day, house_id, variety_id, grade_id,
+            jml_ikat, isi_per_ikat, total_batang, harga_per_ikat, harga_per_batang, total_pendapatan
+        )
+        SELECT d.id, d.summary_id, CAST(strftime('%s', d.tanggal) AS INTEGER) / 86400, h.id, v.id, g.id,
+               d.jml_ikat, d.isi_per_ikat, d.total_batang, d.harga_per_ikat, d.harga_per_batang, d.total_pendapatan
+        FROM harvest_details d
+        LEFT JOIN harvest_houses h ON h.name = d.house
+        LEFT JOIN harvest_varieties v ON v.name = d.varietas
+        LEFT JOIN harvest_grades g ON g.grade IS d.grade AND g.tipe IS d.tipe AND g.ukuran IS d.ukuran
+        ORDER BY d.id
+    ''')
+    # Never hand out an id used before (archived rows keep theirs)
+    c.execute("DELETE FROM sqlite_sequence WHERE name = 'harvest_details_data'")
+    c.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'harvest_details_data', MAX(seq) FROM (
+            SELECT seq FROM sqlite_sequence WHERE name = 'harvest_details'
+            UNION ALL SELECT MAX(id) FROM harvest_details_data
+        ) HAVING MAX(seq) IS NOT NULL
+    ''')
+    c.execute("DROP TABLE harvest_details")
+
+    c.execute('''
+        CREATE VIEW harvest_details AS
+        SELECT d.id, d.summary_id, date(d.day * 86400, 'unixepoch') AS tanggal,
+               h.name AS house, v.name AS varietas, g.grade, g.tipe, g.ukuran,
+               d.jml_ikat, d.isi_per_ikat, d.total_batang, d.harga_per_ikat, d.harga_per_batang, d.total_pendapatan
+        FROM harvest_details_data d
+        LEFT JOIN harvest_houses h ON h.id = d.house_id
+        LEFT JOIN harvest_varieties v ON v.id = d.variety_id
+        LEFT JOIN harvest_grades g ON g.id = d.grade_id
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_details_data_summary_id ON harvest_details_data (summary_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_details_data_day_house ON harvest_details_data (day, house_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_details_data_day_variety_grade ON harvest_details_data (day, variety_id, grade_id)")
+
+def _migration_8_report_key(c):
+    # One report per (tanggal, house): keep the latest save of any duplicates
+    duplicates = [row[0] for row in c.execute('''
+        SELECT id FROM harvest_summary s
+        WHERE EXISTS (
+            SELECT 1 FROM harvest_summary t
+            WHERE t.tanggal = s.tanggal AND t.house = s.house AND t.id > s.id
+        )
+    ''')]
+    _delete_summaries(c, duplicates)
+    c.execute("DROP INDEX IF EXISTS idx_summary_tanggal_house")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_summary_report_key ON harvest_summary (tanggal, house)")
+
+def _migration_9_harvest_changes(c):
+    # Change counters for session-held harvest views (see INCREMENTAL SYNC).
+    # version moves on every report written; rewrite_version only when an
+    # existing report is changed or removed, i.e. when appending no longer
+    # brings a held view up to date.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_changes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            rewrite_version INTEGER NOT NULL
+        )
+    ''')
+    c.execute("INSERT OR IGNORE INTO harvest_changes (id, version, rewrite_version) VALUES (1, 0, 0)")
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_summary_insert_changes AFTER INSERT ON harvest_summary
+        BEGIN
+            UPDATE harvest_changes SET version = version + 1 WHERE id = 1;
+        END
+    ''')
+    for event in ('UPDATE', 'DELETE'):
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_summary_{event.lower()}_changes AFTER {event} ON harvest_summary
+            BEGIN
+                UPDATE harvest_changes SET version = version + 1, rewrite_version = rewrite_version + 1 WHERE id = 1;
+            END
+        ''')
+
+def _migration_10_maintenance_log(c):
+    # One row per run of utils/db_maintenance.run_maintenance
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            trigger TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            size_before INTEGER,
+            size_after INTEGER,
+            harvest_version INTEGER,
+            report TEXT
+        )
+    ''')
+
+def _migration_11_month_versions(c):
+    # Per-month write counter for incremental exports (see utils/parquet_export).
+    # Every report insert, in-place replace or delete bumps its month; details
+    # are only ever written together with their summary row.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS harvest_month_versions (
+            bulan TEXT PRIMARY KEY,  -- 'YYYY-MM'
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_summary_{event.lower()}_month_version AFTER {event} ON harvest_summary
+            BEGIN
+                INSERT INTO harvest_month_versions (bulan, version) VALUES (substr({row}.tanggal, 1, 7), 1)
+                ON CONFLICT (bulan) DO UPDATE SET version = version + 1;
+            END
+        ''')
+
+MIGRATIONS = [
+    _migration_1_base_tables,
+    _migration_2_indexes,
+    _migration_3_rollups,
+    _migration_4_generation,
+    _migration_5_import_log,
+    _migration_6_ledgers,
+    _migration_7_compact_details,
+    _migration_8_report_key,
+    _migration_9_harvest_changes,
+    _migration_10_maintenance_log,
+    _migration_11_month_versions,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+_migrate_lock = threading.Lock()
+_migrated_paths = set()
+
+def get_schema_version(path=None):
+    with get_connection(path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(target=None, path=None):
+    """Apply pending migrations (up to `target`, default all) to `path` (default DB_PATH); returns the version."""
+    target = SCHEMA_VERSION if target is None else min(target, SCHEMA_VERSION)
+    with get_connection(path) as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        while version < target:
+            # IMMEDIATE takes the write lock up front, so concurrent
+            # processes migrate one at a time; re-read the version under it
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version < target:
+                    MIGRATIONS[version](conn.cursor())
+                    version += 1
+                    conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    return version
+
+def init_db():
+    _mark_rerun()
+    # Migrations only need to run once per database per process; later
+    # reruns of the pages return here without touching the schema
+    if DB_PATH in _migrated_paths:
+        return
+    with _migrate_lock:
+        if DB_PATH not in _migrated_paths:
+            migrate()
+            _migrated_paths.add(DB_PATH)
+
+# ========== READ CACHE ==========
+# Reads decorated with @cached_read are served from a process-wide cache
+# (shared by every Streamlit session, like st.cache_resource) until the
+# database generation changes. transaction() bumps the generation whenever
+# a write commits, so cached results are never older than the last save.
+CACHE_MAX_ENTRIES = 256
+
+_cache_lock = threading.Lock()
+_read_cache = {}  # db path -> {'generation': int, 'entries': {key: value}}
+_cache_stats = {'hits': 0, 'misses': 0}
+
+def _bump_generation(conn):
+    conn.execute("UPDATE db_generation SET generation = generation + 1 WHERE id = 1")
+
+def get_generation(path=None):
     try:
-        # 1. Insert Summary
+        with get_connection(path) as conn:
+            row = conn.execute("SELECT generation FROM db_generation WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None  # not migrated yet
+    return row[0] if row else None
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+def _copy_cached(value):
+    # Hand out copies, as st.cache_data does, so callers can mutate freely
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return [dict(v) if isinstance(v, dict) else v for v in value]
+    return value
+
+def cached_read(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        path = DB_PATH
+        generation = get_generation()
+        if generation is None:
+            return fn(*args, **kwargs)
+
+        key = (fn.__name__, _freeze(args), _freeze(kwargs))
+        with _cache_lock:
+            cache = _read_cache.get(path)
+            if cache is None or cache['generation'] != generation:
+                cache = _read_cache[path] = {'generation': generation, 'entries': {}}
+            if key in cache['entries']:
+                _cache_stats['hits'] += 1
+                return _copy_cached(cache['entries'][key])
+            _cache_stats['misses'] += 1
+
+        value = fn(*args, **kwargs)
+        with _cache_lock:
+            cache = _read_cache.get(path)
+            # Only keep it if no write landed while we were reading
+            if cache is not None and cache['generation'] == generation:
+                entries = cache['entries']
+                if len(entries) >= CACHE_MAX_ENTRIES:
+                    entries.pop(next(iter(entries)))
+                entries[key] = value
+        return _copy_cached(value)
+    return wrapper
+
+def get_cache_stats():
+    with _cache_lock:
+        hits, misses = _cache_stats['hits'], _cache_stats['misses']
+        entries = sum(len(c['entries']) for c in _read_cache.values())
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'entries': entries,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+def clear_read_cache():
+    with _cache_lock:
+        _read_cache.clear()
+        _cache_stats['hits'] = _cache_stats['misses'] = 0
+
+# ========== INSTRUMENTATION ==========
+# Public entry points are wrapped with @instrumented: each call records its
+# latency and the rows it returned, and every rerun (init_db marks the start
+# of one) counts the calls it made. With the slow-query log on, a call
+# slower than the threshold keeps the SQL it ran and the EXPLAIN QUERY PLAN
+# of each SELECT. Stats live in process memory (see the Diagnostik page).
+STATS_WINDOW = 500  # latency samples kept per function / per-rerun counts kept
+SLOW_LOG_SIZE = 50
+SLOW_LOG_MAX_STATEMENTS = 20
+
+_stats_lock = threading.Lock()
+_call_stats = {}  # function name -> {'calls', 'errors', 'rows', 'samples'}
+_session_calls = {}  # session id (or thread id) -> calls in its current rerun
+_rerun_calls = deque(maxlen=STATS_WINDOW)
+_slow_log = deque(maxlen=SLOW_LOG_SIZE)
+_slow_query_ms = None  # None: slow-query log off
+
+def _session_key():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else threading.get_ident()
+
+def _trace_statement(sql):
+    statements = getattr(_local, 'statements', None)
+    if statements is not None and len(statements) < SLOW_LOG_MAX_STATEMENTS:
+        statements.append(sql)
+
+def _row_count(result):
+    return len(result) if isinstance(result, (pd.DataFrame, list)) else None
+
+def percentile(samples, q):
+    """Nearest-rank q-quantile (0..1) of `samples`; 0.0 when empty."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def _record_call(name, elapsed_ms, rows, failed):
+    with _stats_lock:
+        stats = _call_stats.get(name)
+        if stats is None:
+            stats = _call_stats[name] = {'calls': 0, 'errors': 0, 'rows': 0, 'samples': deque(maxlen=STATS_WINDOW)}
+        stats['calls'] += 1
+        stats['errors'] += failed
+        stats['rows'] += rows or 0
+        stats['samples'].append(elapsed_ms)
+
+def _log_slow_call(name, elapsed_ms, statements):
+    plans = []
+    with get_connection() as conn:
+        # Statements may read yearly archives
+        attach_archives(conn)
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                plans.append(None)
+                continue
+            try:
+                plans.append('\n'.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")))
+            except sqlite3.Error as e:
+                plans.append(f"EXPLAIN gagal: {e}")
+    with _stats_lock:
+        _slow_log.appendleft({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'function': name,
+            'ms': elapsed_ms,
+            'statements': [{'sql': sql, 'plan': plan} for sql, plan in zip(statements, plans)],
+        })
+
+def instrumented(fn):
+    name = fn.__name__
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_local, 'call_depth', 0)
+        outermost = depth == 0
+        _local.call_depth = depth + 1
+        if outermost:
+            key = _session_key()
+            with _stats_lock:
+                _session_calls[key] = _session_calls.get(key, 0) + 1
+            if _slow_query_ms is not None:
+                _local.statements = []
+
+        start = time.perf_counter()
+        result, failed = None, True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _local.call_depth = depth
+            statements = _local.__dict__.pop('statements', None) if outermost else None
+            _record_call(name, elapsed_ms, None if failed else _row_count(result), failed)
+            if statements and not failed and _slow_query_ms is not None and elapsed_ms >= _slow_query_ms:
+                _log_slow_call(name, elapsed_ms, statements)
+    return wrapper
+
+def _mark_rerun():
+    # Called from init_db at the top of every page run
+    key = _session_key()
+    with _stats_lock:
+        calls = _session_calls.pop(key, None)
+        if calls is not None:
+            _rerun_calls.append(calls)
+        _session_calls[key] = 0
+
+def set_slow_query_log(threshold_ms):
+    """Log calls slower than threshold_ms with their SQL and plans; None turns it off."""
+    global _slow_query_ms
+    _slow_query_ms = None if threshold_ms is None else float(threshold_ms)
+
+def get_slow_query_threshold():
+    return _slow_query_ms
+
+def get_slow_queries():
+    """Slow-query log entries, newest first."""
+    with _stats_lock:
+        return list(_slow_log)
+
+def get_db_stats():
+    """Per-function latency (p50/p95/max over the last STATS_WINDOW calls), calls and rows."""
+    with _stats_lock:
+        rows = [{
+            'Fungsi': name,
+            'Panggilan': s['calls'],
+            'Error': s['errors'],
+            'p50 (ms)': percentile(s['samples'], 0.5),
+            'p95 (ms)': percentile(s['samples'], 0.95),
+            'Maks (ms)': max(s['samples']),
+            'Total (ms)': sum(s['samples']),
+            'Baris': s['rows'],
+            'Baris/Panggilan': s['rows'] / s['calls'],
+        } for name, s in _call_stats.items()]
+    columns = ['Fungsi', 'Panggilan', 'Error', 'p50 (ms)', 'p95 (ms)', 'Maks (ms)', 'Total (ms)', 'Baris', 'Baris/Panggilan']
+    return pd.DataFrame(rows, columns=columns).sort_values('Total (ms)', ascending=False, ignore_index=True)
+
+def get_rerun_stats():
+    """DB entry-point calls per page rerun."""
+    with _stats_lock:
+        counts = list(_rerun_calls)
+    return {
+        'reruns': len(counts),
+        'p50': percentile(counts, 0.5),
+        'p95': percentile(counts, 0.95),
+        'last': counts[-1] if counts else 0,
+    }
+
+def reset_db_stats():
+    with _stats_lock:
+        _call_stats.clear()
+        _rerun_calls.clear()
+        _slow_log.clear()
+
+# DataFrame column -> harvest_details column, in INSERT order
+DETAIL_COLUMNS = {
+    'Tanggal': 'tanggal',
+    'House': 'house',
+    'Varietas': 'varietas',
+    'Grade': 'grade',
+    'Tipe': 'tipe',
+    'Ukuran': 'ukuran',
+    'Jml_Ikat': 'jml_ikat',
+    'Isi_per_Ikat': 'isi_per_ikat',
+    'Total_Batang': 'total_batang',
+    'Harga_per_Ikat': 'harga_per_ikat',
+    'Harga_per_Batang': 'harga_per_batang',
+    'Total_Pendapatan': 'total_pendapatan',
+}
+
+# harvest_details is a view (migration 7): rows are stored in
+# harvest_details_data with the text columns dictionary-encoded
+EPOCH_DAY = date(1970, 1, 1)
+
+INSERT_DETAIL_DATA_SQL = '''
+    INSERT INTO harvest_details_data (
+        summary_id, day, house_id, variety_id, grade_id,
+        jml_ikat, isi_per_ikat, total_batang, harga_per_ikat, harga_per_batang, total_pendapatan
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def day_number(value):
+    """Days since 1970-01-01 for a 'YYYY-MM-DD' string, date or timestamp."""
+    if value is None or value == '':
+        return None
+    return (date.fromisoformat(str(value)[:10]) - EPOCH_DAY).days
+
+def _lookup_ids(c, table, columns, keys):
+    # Lookup tables hold a few dozen rows: read them whole, add what is missing
+    cols = ', '.join(columns)
+    ids = {tuple(row[1:]): row[0] for row in c.execute(f"SELECT id, {cols} FROM {table}")}
+    for key in keys:
+        if key not in ids and any(v is not None for v in key):
+            c.execute(f"INSERT INTO {table} ({cols}) VALUES ({', '.join('?' * len(columns))})", key)
+            ids[key] = c.lastrowid
+    return ids
+
+def _insert_details(c, rows):
+    """Insert (summary_id, *DETAIL_COLUMNS values) tuples into harvest_details_data."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    houses = _lookup_ids(c, 'harvest_houses', ['name'], {(r[2],) for r in rows})
+    varieties = _lookup_ids(c, 'harvest_varieties', ['name'], {(r[3],) for r in rows})
+    grades = _lookup_ids(c, 'harvest_grades', ['grade', 'tipe', 'ukuran'], {r[4:7] for r in rows})
+    days = {t: day_number(t) for t in {r[1] for r in rows}}
+    c.executemany(INSERT_DETAIL_DATA_SQL, (
+        (r[0], days[r[1]], houses.get((r[2],)), varieties.get((r[3],)), grades.get(r[4:7]), *r[7:])
+        for r in rows
+    ))
+    return len(rows)
+
+def _insert_summary(c, summary_data):
+    c.execute('''
+        INSERT INTO harvest_summary (tanggal, house, tangkai, grade_a_pct, pendapatan, putih, pink, kuning)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        summary_data['Tanggal'],
+        summary_data['House'],
+        summary_data['Tangkai'],
+        summary_data['Grade A %'],
+        summary_data['Pendapatan'],
+        summary_data['Putih'],
+        summary_data['Pink'],
+        summary_data['Kuning']
+    ))
+    return c.lastrowid
+
+def _detail_rows(summary_id, details_df):
+    # Column-wise .tolist() gives native Python values sqlite3 can bind,
+    # without materializing a dict per row
+    if details_df is None or details_df.empty:
+        return iter(())
+    columns = [details_df[col].tolist() for col in DETAIL_COLUMNS]
+    return zip(repeat(summary_id, len(details_df)), *columns)
+
+def upsert_report(c, summary_data, details_df):
+    """Insert the (tanggal, house) report, or replace it in place if it exists.
+
+    c is a cursor inside the caller's transaction; summary_data uses the
+    page keys ('Tanggal', 'House', 'Tangkai', 'Grade A %', ...) and
+    details_df the DETAIL_COLUMNS. A report sitting in a yearly archive is
+    only found if that archive is attached (attach_archives, before the
+    transaction), and is then moved back into main under a new id.
+
+    Returns (summary_id, replaced). Rollups get the old report's totals
+    subtracted and the new ones added; nothing is recomputed.
+    """
+    key = (summary_data['Tanggal'], summary_data['House'])
+    row = c.execute("SELECT id FROM harvest_summary WHERE tanggal = ? AND house = ?", key).fetchone()
+    if row:
+        summary_id = row[0]
+        _update_rollups(c, [summary_id], sign=-1)
+        c.execute("DELETE FROM harvest_details_data WHERE summary_id = ?", (summary_id,))
         c.execute('''
-            INSERT INTO harvest_summary (tanggal, house, tangkai, grade_a_pct, pendapatan, putih, pink, kuning)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            UPDATE harvest_summary
+            SET tangkai = ?, grade_a_pct = ?, pendapatan = ?, putih = ?, pink = ?, kuning = ?
+            WHERE id = ?
         ''', (
-            summary_data['Tanggal'],
-            summary_data['House'],
             summary_data['Tangkai'],
             summary_data['Grade A %'],
             summary_data['Pendapatan'],
             summary_data['Putih'],
             summary_data['Pink'],
-            summary_data['Kuning']
+            summary_data['Kuning'],
+            summary_id
         ))
-        
-        summary_id = c.lastrowid
-        
-        # 2. Insert Details
-        if not details_df.empty:
-            # Add summary_id to details
-            details_records = details_df.to_dict('records')
-            for record in details_records:
-                c.execute('''
-                    INSERT INTO harvest_details (
-                        summary_id, tanggal, house, varietas, grade, tipe, ukuran, 
-                        jml_ikat, isi_per_ikat, total_batang, harga_per_ikat, 
-                        harga_per_batang, total_pendapatan
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    summary_id,
-                    record['Tanggal'],
-                    record['House'],
-                    record['Varietas'],
-                    record['Grade'],
-                    record['Tipe'],
-                    record['Ukuran'],
-                    record['Jml_Ikat'],
-                    record['Isi_per_Ikat'],
-                    record['Total_Batang'],
-                    record['Harga_per_Ikat'],
-                    record['Harga_per_Batang'],
-                    record['Total_Pendapatan']
-                ))
-        
-        conn.commit()
+        # A hand-edited report no longer matches what the importer logged
+        c.execute("DELETE FROM harvest_import_log WHERE summary_id = ?", (summary_id,))
+        replaced = True
+    else:
+        # The same report may already sit in an attached yearly archive
+        archived = []
+        for schema in _attached_archives(c):
+            archived += [r[0] for r in c.execute(
+                f"SELECT id FROM {schema}.harvest_summary WHERE tanggal = ? AND house = ?", key
+            )]
+        if archived:
+            _delete_summaries(c, archived)
+        summary_id = _insert_summary(c, summary_data)
+        replaced = bool(archived)
+    _insert_details(c, _detail_rows(summary_id, details_df))
+    _update_rollups(c, [summary_id])
+    return summary_id, replaced
+
+@instrumented
+def save_harvest_record(summary_data, details_df):
+    """Save a grading report; saving the same date + house again replaces it."""
+    try:
+        with get_connection() as conn:
+            attach_archives(conn, summary_data['Tanggal'], summary_data['Tanggal'])
+            with transaction():
+                upsert_report(conn.cursor(), summary_data, details_df)
         return True
     except Exception as e:
         st.error(f"Database Error: {e}")
         return False
-    finally:
-        conn.close()
 
+def write_reports(records, path=None):
+    """Upsert (summary_data, details_df) pairs in one transaction; returns their summary ids.
+
+    Attaches the archives of `path` (default DB_PATH) first, then takes the
+    write lock up front with BEGIN IMMEDIATE, so a busy database waits on
+    busy_timeout instead of failing mid-batch. Errors are raised, not shown.
+    """
+    with get_connection(path) as conn:
+        attach_archives(conn, path=path)
+        with transaction(path):
+            conn.execute("BEGIN IMMEDIATE")
+            c = conn.cursor()
+            return [upsert_report(c, summary_data, details_df)[0] for summary_data, details_df in records]
+
+@instrumented
+def save_harvest_records_bulk(records):
+    """Save many (summary_data, details_df) pairs in a single transaction."""
+    try:
+        write_reports(records)
+        return True
+    except Exception as e:
+        st.error(f"Database Error: {e}")
+        return False
+
+# ========== ROLLUPS ==========
+# harvest_rollup_daily / _monthly hold per (day|month, house) summary totals
+# and harvest_rollup_daily_grade per (day, house, variety, type, grade)
+# detail totals. Writers call _update_rollups inside their own transaction
+# with sign=1 after inserting and sign=-1 before deleting summaries. Rows
+# moved into a yearly archive stay counted (see YEARLY ARCHIVES).
+ROLLUP_CHUNK = 500
+
+def _rollup_statements(sign, summary_where, details_where, schema='main'):
+    summary_measures = f'''
+        {sign} * COUNT(*), {sign} * IFNULL(SUM(tangkai), 0), {sign} * IFNULL(SUM(pendapatan), 0),
+        {sign} * IFNULL(SUM(tangkai * grade_a_pct), 0)
+    '''
+    summary_update = '''
+        laporan = laporan + excluded.laporan,
+        tangkai = tangkai + excluded.tangkai,
+        pendapatan = pendapatan + excluded.pendapatan,
+        grade_a_weight = grade_a_weight + excluded.grade_a_weight
+    '''
+    return (
+        f'''
+        INSERT INTO harvest_rollup_daily (tanggal, house, laporan, tangkai, pendapatan, grade_a_weight)
+        SELECT IFNULL(tanggal, ''), IFNULL(house, ''), {summary_measures}
+        FROM {schema}.harvest_summary WHERE {summary_where} GROUP BY 1, 2
+        ON CONFLICT (tanggal, house) DO UPDATE SET {summary_update}
+        ''',
+        f'''
+        INSERT INTO harvest_rollup_monthly (bulan, house, laporan, tangkai, pendapatan, grade_a_weight)
+        SELECT substr(IFNULL(tanggal, ''), 1, 7), IFNULL(house, ''), {summary_measures}
+        FROM {schema}.harvest_summary WHERE {summary_where} GROUP BY 1, 2
+        ON CONFLICT (bulan, house) DO UPDATE SET {summary_update}
+        ''',
+        f'''
+        INSERT INTO harvest_rollup_daily_grade (
+            tanggal, house, varietas, tipe, grade, baris, jml_ikat, total_batang, total_pendapatan
+        )
+        SELECT IFNULL(tanggal, ''), IFNULL(house, ''), IFNULL(varietas, ''), IFNULL(tipe, ''), IFNULL(grade, ''),
+               {sign} * COUNT(*), {sign} * IFNULL(SUM(jml_ikat), 0),
+               {sign} * IFNULL(SUM(total_batang), 0), {sign} * IFNULL(SUM(total_pendapatan), 0)
+        FROM {schema}.harvest_details WHERE {details_where} GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (tanggal, house, varietas, tipe, grade) DO UPDATE SET
+            baris = baris + excluded.baris,
+            jml_ikat = jml_ikat + excluded.jml_ikat,
+            total_batang = total_batang + excluded.total_batang,
+            total_pendapatan = total_pendapatan + excluded.total_pendapatan
+        ''',
+    )
+
+def _update_rollups(c, summary_ids, sign=1, schema='main'):
+    summary_ids = list(summary_ids)
+    for i in range(0, len(summary_ids), ROLLUP_CHUNK):
+        chunk = summary_ids[i:i + ROLLUP_CHUNK]
+        marks = ', '.join('?' * len(chunk))
+        for sql in _rollup_statements(int(sign), f"id IN ({marks})", f"summary_id IN ({marks})", schema):
+            c.execute(sql, chunk)
+    if sign < 0:
+        c.execute("DELETE FROM harvest_rollup_daily WHERE laporan <= 0")
+        c.execute("DELETE FROM harvest_rollup_monthly WHERE laporan <= 0")
+        c.execute("DELETE FROM harvest_rollup_daily_grade WHERE baris <= 0")
+
+def _rebuild_rollups(c, schemas=('main',)):
+    for table in ('harvest_rollup_daily', 'harvest_rollup_monthly', 'harvest_rollup_daily_grade'):
+        c.execute(f"DELETE FROM {table}")
+    for schema in schemas:
+        for sql in _rollup_statements(1, "1", "1", schema):
+            c.execute(sql)
+
+def _delete_summaries(c, summary_ids):
+    # The reports may live in main or in any archive attached to this connection
+    summary_ids = list(summary_ids)
+    for schema in ['main'] + _attached_archives(c):
+        # Rollups first: the deltas are computed from the rows being removed
+        _update_rollups(c, summary_ids, sign=-1, schema=schema)
+        for i in range(0, len(summary_ids), ROLLUP_CHUNK):
+            chunk = summary_ids[i:i + ROLLUP_CHUNK]
+            marks = ', '.join('?' * len(chunk))
+            c.execute(f"DELETE FROM {_details_storage(schema)} WHERE summary_id IN ({marks})", chunk)
+            if c.execute(f"DELETE FROM {schema}.harvest_summary WHERE id IN ({marks})", chunk).rowcount and schema != 'main':
+                _mark_rewritten(c)
+    for i in range(0, len(summary_ids), ROLLUP_CHUNK):
+        chunk = summary_ids[i:i + ROLLUP_CHUNK]
+        c.execute(f"DELETE FROM harvest_import_log WHERE summary_id IN ({', '.join('?' * len(chunk))})", chunk)
+
+@instrumented
+def rebuild_rollups():
+    """Recompute every rollup table from harvest_summary/harvest_details and the archives."""
+    with get_connection() as conn:
+        schemas = ['main'] + attach_archives(conn)
+        with transaction():
+            _rebuild_rollups(conn.cursor(), schemas)
+
+@instrumented
+@cached_read
 def get_harvest_summary():
-    conn = sqlite3.connect(DB_PATH)
     try:
-        df = pd.read_sql_query("SELECT * FROM harvest_summary ORDER BY tanggal DESC, id DESC", conn)
-        return df.to_dict('records') # Convert to list of dicts to match session_state format
-    except:
-        return []
-    finally:
-        conn.close()
+        with get_connection() as conn:
+            source, source_params = harvest_source(conn, 'harvest_summary')
+            df = pd.read_sql_query(f"SELECT * FROM {source} ORDER BY tanggal DESC, id DESC", conn, params=source_params)
+        return _typed(df)
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        # read_sql_query re-raises SQLite errors as pandas' DatabaseError
+        logger.exception("get_harvest_summary failed")
+        return pd.DataFrame()
 
+@instrumented
+@cached_read
 def get_harvest_details():
-    conn = sqlite3.connect(DB_PATH)
     try:
-        df = pd.read_sql_query("SELECT * FROM harvest_details ORDER BY tanggal DESC", conn)
-        # Drop summary_id and id for display cleanliness if needed, or keep them
-        return df.to_dict('records')
-    except:
+        with get_connection() as conn:
+            source, source_params = harvest_source(conn, 'harvest_details')
+            df = pd.read_sql_query(f"SELECT * FROM {source} ORDER BY tanggal DESC, id", conn, params=source_params)
+        return _typed(df)
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        logger.exception("get_harvest_details failed")
+        return pd.DataFrame()
+
+# ========== FILTERED / PAGINATED QUERIES ==========
+# Results are ordered newest first (tanggal DESC, id DESC). Page either with
+# limit/offset, or with a keyset cursor: pass the (Tanggal, id) of the last
+# row already shown and only older rows are returned. since_id keeps only
+# rows added after that id (see INCREMENTAL SYNC).
+
+# DataFrame column -> harvest_summary column
+SUMMARY_COLUMNS = {
+    'Tanggal': 'tanggal',
+    'House': 'house',
+    'Tangkai': 'tangkai',
+    'Grade A %': 'grade_a_pct',
+    'Pendapatan': 'pendapatan',
+    'Putih': 'putih',
+    'Pink': 'pink',
+    'Kuning': 'kuning',
+}
+
+# Harvest reads come back typed: dates as datetime64, the repeated text
+# columns as categoricals (a few dozen distinct values over many rows), so
+# pages use the frame as is instead of converting it on every rerun
+DATE_COLUMNS = ('Tanggal', 'tanggal')
+CATEGORY_COLUMNS = ('House', 'Varietas', 'Grade', 'Tipe', 'Ukuran',
+                    'house', 'varietas', 'grade', 'tipe', 'ukuran')
+
+def _typed(df):
+    for column in df.columns.intersection(DATE_COLUMNS):
+        df[column] = pd.to_datetime(df[column], format='%Y-%m-%d', errors='coerce')
+    for column in df.columns.intersection(CATEGORY_COLUMNS):
+        df[column] = df[column].astype('category')
+    return df
+
+def _as_list(value):
+    if value is None or value == '':
         return []
-    finally:
-        conn.close()
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [value]
+
+def _harvest_filters(start_date=None, end_date=None, house=None, varietas=None):
+    clauses, params = [], []
+    if start_date:
+        clauses.append("tanggal >= ?")
+        params.append(str(start_date))
+    if end_date:
+        clauses.append("tanggal <= ?")
+        params.append(str(end_date))
+    for column, value in (('house', house), ('varietas', varietas)):
+        values = _as_list(value)
+        if values:
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    return clauses, params
+
+def _where(clauses):
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+def _query_window(table, columns, clauses, params, limit=None, offset=0, cursor=None, date_range=(None, None)):
+    select = ', '.join(['id'] + [f'{db} AS "{name}"' for name, db in columns.items()])
+    clauses, params = list(clauses), list(params)
+    # Details order on the stored day numbers (same order as tanggal, but indexed)
+    with_day = table == 'harvest_details'
+    order = 'day' if with_day else 'tanggal'
+    if cursor is not None:
+        clauses.append(f"({order}, id) < (?, ?)")
+        cursor_date = str(cursor[0])[:10]  # date, str or Timestamp
+        params.extend([day_number(cursor_date) if with_day else cursor_date, int(cursor[1])])
+    if limit is not None:
+        params.extend([int(limit), int(offset)])
+    with get_connection() as conn:
+        source, source_params = harvest_source(conn, table, *date_range, with_day=with_day)
+        sql = f"SELECT {select} FROM {source}{_where(clauses)} ORDER BY {order} DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+        return _typed(pd.read_sql_query(sql, conn, params=source_params + params))
+
+def _since(clauses, params, since_id):
+    if since_id is not None:
+        clauses.append("id > ?")
+        params.append(int(since_id))
+    return clauses, params
+
+@instrumented
+@cached_read
+def query_harvest_summary(start_date=None, end_date=None, house=None,
+                          limit=None, offset=0, cursor=None, since_id=None):
+    clauses, params = _since(*_harvest_filters(start_date, end_date, house), since_id)
+    return _query_window('harvest_summary', SUMMARY_COLUMNS, clauses, params, limit, offset, cursor,
+                         (start_date, end_date))
+
+@instrumented
+@cached_read
+def query_harvest_details(start_date=None, end_date=None, house=None, varietas=None,
+                          limit=None, offset=0, cursor=None, since_id=None):
+    clauses, params = _since(*_harvest_filters(start_date, end_date, house, varietas), since_id)
+    columns = {'summary_id': 'summary_id', **DETAIL_COLUMNS}
+    return _query_window('harvest_details', columns, clauses, params, limit, offset, cursor,
+                         (start_date, end_date))
+
+@instrumented
+@cached_read
+def count_harvest_summary(start_date=None, end_date=None, house=None):
+    clauses, params = _harvest_filters(start_date, end_date, house)
+    with get_connection() as conn:
+        source, source_params = harvest_source(conn, 'harvest_summary', start_date, end_date)
+        return conn.execute(f"SELECT COUNT(*) FROM {source}{_where(clauses)}", source_params + params).fetchone()[0]
+
+@instrumented
+@cached_read
+def count_harvest_details(start_date=None, end_date=None, house=None, varietas=None):
+    clauses, params = _harvest_filters(start_date, end_date, house, varietas)
+    with get_connection() as conn:
+        source, source_params = harvest_source(conn, 'harvest_details', start_date, end_date)
+        return conn.execute(f"SELECT COUNT(*) FROM {source}{_where(clauses)}", source_params + params).fetchone()[0]
+
+@instrumented
+@cached_read
+def get_harvest_houses():
+    with get_connection() as conn:
+        # The rollup covers archived years too and is far smaller than harvest_summary
+        rows = conn.execute("SELECT DISTINCT house FROM harvest_rollup_daily WHERE house != '' ORDER BY house").fetchall()
+    return [r[0] for r in rows]
+
+# ========== INCREMENTAL SYNC ==========
+# A session can hold a filtered harvest view and keep it current with
+# sync_harvest_view(): the one-row harvest_changes counters (maintained by
+# triggers, migration 9) say whether anything was written since the view
+# was read, and if only new reports were added the view just appends the
+# rows past its max id. Anything else (a report replaced, purged or
+# archived) reloads the view.
+
+@instrumented
+def get_harvest_changes(path=None):
+    """Current {'version', 'rewrite_version'} of the harvest tables, or None before migration 9."""
+    try:
+        with get_connection(path) as conn:
+            row = conn.execute("SELECT version, rewrite_version FROM harvest_changes WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return {'version': row[0], 'rewrite_version': row[1]} if row else None
+
+def _mark_rewritten(c):
+    # Archive tables have no triggers; deletes there are counted by hand
+    c.execute("UPDATE harvest_changes SET version = version + 1, rewrite_version = rewrite_version + 1 WHERE id = 1")
+
+def _sync_query(table, since_id, start_date, end_date, house, varietas):
+    if table == 'details':
+        return query_harvest_details(start_date, end_date, house, varietas, since_id=since_id)
+    return query_harvest_summary(start_date, end_date, house, since_id=since_id)
+
+@instrumented
+def sync_harvest_view(view, table='summary', start_date=None, end_date=None, house=None, varietas=None):
+    """Bring a session-held view up to date and return it.
+
+    view is None or what the previous call returned: a dict with the
+    DataFrame under 'df' (newest first), plus the filters, counters and max
+    id it was read at. 'appended' tells how many rows this call added
+    (None after a full load).
+    """
+    key = (table, _freeze((start_date and str(start_date), end_date and str(end_date),
+                           _as_list(house), _as_list(varietas))))
+    changes = get_harvest_changes()
+    if view is not None and changes is not None and view['key'] == key:
+        if view['changes'] == changes:
+            return dict(view, appended=0)
+        if view['changes']['rewrite_version'] == changes['rewrite_version']:
+            delta = _sync_query(table, view['max_id'], start_date, end_date, house, varietas)
+            if delta.empty:
+                return dict(view, changes=changes, appended=0)
+            # New reports can be back-dated, so re-sort rather than prepend;
+            # re-type, as categoricals with different categories concat to objects
+            df = _typed(pd.concat([delta, view['df']], ignore_index=True))
+            df = df.sort_values(['Tanggal', 'id'], ascending=False, ignore_index=True)
+            max_id = max(view['max_id'], int(delta['id'].max()))
+            return {'key': key, 'changes': changes, 'max_id': max_id, 'df': df, 'appended': len(delta)}
+
+    df = _sync_query(table, None, start_date, end_date, house, varietas)
+    max_id = int(df['id'].max()) if not df.empty else 0
+    return {'key': key, 'changes': changes, 'max_id': max_id, 'df': df, 'appended': None}
+
+# ========== AGGREGATES ==========
+# Served from the rollup tables, so cost scales with days x houses rather
+# than with the number of detail rows. Grade A % is weighted by stems:
+# SUM(tangkai * grade_a_pct) / SUM(tangkai).
+
+PERIOD_EXPRESSIONS = {
+    'day': "tanggal",
+    'week': "strftime('%Y-W%W', tanggal)",
+    'month': "substr(tanggal, 1, 7)",
+}
+
+_SUMMARY_MEASURES = '''
+    COALESCE(SUM(laporan), 0) AS "Laporan",
+    COALESCE(SUM(tangkai), 0) AS "Tangkai",
+    COALESCE(SUM(pendapatan), 0) AS "Pendapatan",
+    COALESCE(SUM(grade_a_weight) / NULLIF(SUM(tangkai), 0), 0) AS "Grade A %"
+'''
+
+_DETAIL_MEASURES = '''
+    COALESCE(SUM(jml_ikat), 0) AS "Jml_Ikat",
+    COALESCE(SUM(total_batang), 0) AS "Total_Batang",
+    COALESCE(SUM(total_pendapatan), 0) AS "Total_Pendapatan"
+'''
+
+def _aggregate(table, group_by, measures, clauses, params):
+    # group_by: list of (sql expression, output column)
+    select = ', '.join([f'{expr} AS "{name}"' for expr, name in group_by] + [measures])
+    sql = f"SELECT {select} FROM {table}{_where(clauses)}"
+    if group_by:
+        keys = ', '.join(expr for expr, _ in group_by)
+        sql += f" GROUP BY {keys} ORDER BY {keys}"
+    with get_connection() as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+@instrumented
+@cached_read
+def get_harvest_totals(start_date=None, end_date=None, house=None):
+    """Report count, stems, revenue and stem-weighted Grade A % as a dict."""
+    clauses, params = _harvest_filters(start_date, end_date, house)
+    return _aggregate('harvest_rollup_daily', [], _SUMMARY_MEASURES, clauses, params).to_dict('records')[0]
+
+@instrumented
+@cached_read
+def harvest_totals_by_house(start_date=None, end_date=None, house=None):
+    clauses, params = _harvest_filters(start_date, end_date, house)
+    return _aggregate('harvest_rollup_daily', [('house', 'House')], _SUMMARY_MEASURES, clauses, params)
+
+@instrumented
+@cached_read
+def harvest_trend(period='day', start_date=None, end_date=None, house=None, by_house=False):
+    """Totals per day/week/month (optionally split per house), oldest first."""
+    if period == 'month' and not start_date and not end_date:
+        # Unbounded monthly trend: one row per month x house
+        group_by = [('bulan', 'Periode')] + ([('house', 'House')] if by_house else [])
+        clauses, params = _harvest_filters(house=house)
+        return _aggregate('harvest_rollup_monthly', group_by, _SUMMARY_MEASURES, clauses, params)
+
+    group_by = [(PERIOD_EXPRESSIONS[period], 'Periode')]
+    if by_house:
+        group_by.append(('house', 'House'))
+    clauses, params = _harvest_filters(start_date, end_date, house)
+    return _aggregate('harvest_rollup_daily', group_by, _SUMMARY_MEASURES, clauses, params)
+
+@instrumented
+@cached_read
+def harvest_totals_by_variety(start_date=None, end_date=None, house=None, varietas=None):
+    clauses, params = _harvest_filters(start_date, end_date, house, varietas)
+    return _aggregate('harvest_rollup_daily_grade', [('varietas', 'Varietas')], _DETAIL_MEASURES, clauses, params)
+
+@instrumented
+@cached_read
+def harvest_totals_by_grade(start_date=None, end_date=None, house=None, varietas=None):
+    clauses, params = _harvest_filters(start_date, end_date, house, varietas)
+    group_by = [('varietas', 'Varietas'), ('tipe', 'Tipe'), ('grade', 'Grade')]
+    return _aggregate('harvest_rollup_daily_grade', group_by, _DETAIL_MEASURES, clauses, params)
+
+# ========== STREAMING CSV EXPORT ==========
+# Rows are pulled from the cursor EXPORT_CHUNK_ROWS at a time and written
+# straight out as CSV, so memory stays flat however large the table is.
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'krisan_exports')
+
+_EXPORT_TABLES = {
+    'summary': ('harvest_summary', SUMMARY_COLUMNS),
+    'details': ('harvest_details', DETAIL_COLUMNS),
+}
+
+def iter_harvest_csv(table='details', start_date=None, end_date=None, house=None, varietas=None,
+                     chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the filtered 'summary' or 'details' rows as UTF-8 CSV chunks."""
+    db_table, columns = _EXPORT_TABLES[table]
+    clauses, params = _harvest_filters(start_date, end_date, house, varietas if table == 'details' else None)
+    select = ', '.join(f'{db} AS "{name}"' for name, db in columns.items())
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    with get_connection() as conn:
+        source, source_params = harvest_source(conn, db_table, start_date, end_date)
+        sql = f"SELECT {select} FROM {source}{_where(clauses)} ORDER BY tanggal DESC, id DESC"
+        cursor = conn.execute(sql, source_params + params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            writer.writerows(rows)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            if not rows:
+                break
+
+@instrumented
+def write_harvest_csv(fileobj, table='details', start_date=None, end_date=None, house=None, varietas=None):
+    """Stream an export into a binary file object; returns bytes written."""
+    written = 0
+    for chunk in iter_harvest_csv(table, start_date, end_date, house, varietas):
+        fileobj.write(chunk)
+        written += len(chunk)
+    return written
+
+@instrumented
+def harvest_csv_export_file(table='details', start_date=None, end_date=None, house=None, varietas=None):
+    """Path to a CSV export on disk, regenerated only after the data changes."""
+    db_key = hashlib.sha1(os.path.abspath(DB_PATH).encode()).hexdigest()[:8]
+    filter_key = hashlib.sha1(repr(_freeze((start_date, end_date, house, varietas))).encode()).hexdigest()[:12]
+    prefix = f"{db_key}_{table}_"
+    current = f"{prefix}{get_generation()}_"
+    path = os.path.join(EXPORT_DIR, f"{current}{filter_key}.csv")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    # Exports from older generations are stale now
+    for name in os.listdir(EXPORT_DIR):
+        if name.startswith(prefix) and not name.startswith(current):
+            try:
+                os.remove(os.path.join(EXPORT_DIR, name))
+            except OSError:
+                pass
+
+    fd, tmp_path = tempfile.mkstemp(dir=EXPORT_DIR, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_harvest_csv(f, table, start_date, end_date, house, varietas)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return path
+
+# ========== YEARLY ARCHIVES ==========
+# Old harvest_summary/harvest_details rows can be moved out of the hot file
+# into one archive file per year (krisan_archive_2024.db next to krisan.db),
+# keeping daily reads and backups of krisan.db small. Rows keep their ids
+# and the rollup tables keep counting them, so totals and trends do not
+# change; row-level reads ATTACH the archives their date range overlaps and
+# read main + archives as a single UNION ALL. The list of archive files is
+# cached per database (and refreshed when its directory changes), and each
+# pooled connection remembers what it has attached, so a query that needs
+# nothing new costs no directory listing and no PRAGMA database_list.
+ARCHIVE_PREFIX = 'archive_'
+
+_archive_lock = threading.Lock()
+_archive_lists = {}  # db path -> (directory mtime, {year: path})
+
+_ARCHIVE_COLUMNS = {
+    'harvest_summary': ['id', *SUMMARY_COLUMNS.values()],
+    'harvest_details': ['id', 'summary_id', *DETAIL_COLUMNS.values()],
+}
+
+def archive_path(year, path=None):
+    stem, ext = os.path.splitext(path or DB_PATH)
+    return f"{stem}_{ARCHIVE_PREFIX}{year}{ext or '.db'}"
+
+def list_archives(path=None):
+    """{year: path} of the archive files that exist for `path` (default DB_PATH), oldest first."""
+    path = path or DB_PATH
+    stem, ext = os.path.splitext(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    mtime = os.stat(directory).st_mtime_ns
+    with _archive_lock:
+        cached = _archive_lists.get(path)
+    if cached is not None and cached[0] == mtime:
+        return dict(cached[1])
+    pattern = re.compile(re.escape(f"{os.path.basename(stem)}_{ARCHIVE_PREFIX}") + r'(\d{4})' + re.escape(ext or '.db'))
+    archives = {}
+    for name in sorted(os.listdir(directory)):
+        match = pattern.fullmatch(name)
+        if match:
+            archives[match.group(1)] = archive_path(match.group(1), path)
+    with _archive_lock:
+        _archive_lists[path] = (mtime, archives)
+    return dict(archives)
+
+def invalidate_archive_list(path=None):
+    """Forget the cached list_archives() of `path` (every database by default) after adding or removing archive files."""
+    with _archive_lock:
+        if path is None:
+            _archive_lists.clear()
+        else:
+            _archive_lists.pop(path, None)
+
+def _attached_archives(c):
+    conn = c.connection if isinstance(c, sqlite3.Cursor) else c
+    schemas = getattr(conn, 'archive_schemas', None)
+    if schemas is None:
+        schemas = [row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith(ARCHIVE_PREFIX)]
+        if isinstance(conn, _Connection):
+            conn.archive_schemas = schemas
+    return list(schemas)
+
+def _attach_archive(conn, schema, path):
+    _attached_archives(conn)
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    if isinstance(conn, _Connection):
+        conn.archive_schemas.append(schema)
+
+def _detach_archive(conn, schema):
+    conn.execute(f"DETACH DATABASE {schema}")
+    if isinstance(conn, _Connection):
+        conn.archive_schemas.remove(schema)
+
+def _create_archive_tables(c, schema):
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.harvest_summary (
+            id INTEGER PRIMARY KEY,
+            tanggal TEXT,
+            house TEXT,
+            tangkai INTEGER,
+            grade_a_pct REAL,
+            pendapatan INTEGER,
+            putih INTEGER,
+            pink INTEGER,
+            kuning INTEGER
+        )
+    ''')
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.harvest_details (
+            id INTEGER PRIMARY KEY,
+            summary_id INTEGER,
+            tanggal TEXT,
+            house TEXT,
+            varietas TEXT,
+            grade TEXT,
+            tipe TEXT,
+            ukuran TEXT,
+            jml_ikat INTEGER,
+            isi_per_ikat INTEGER,
+            total_batang INTEGER,
+            harga_per_ikat INTEGER,
+            harga_per_batang REAL,
+            total_pendapatan INTEGER
+        )
+    ''')
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_summary_tanggal_house ON harvest_summary (tanggal, house)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_details_summary_id ON harvest_details (summary_id)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_details_tanggal_house ON harvest_details (tanggal, house)")
+
+def attach_archives(conn, start_date=None, end_date=None, path=None):
+    """ATTACH the archives overlapping [start_date, end_date]; returns their schema names.
+
+    conn must be a connection to `path` (default DB_PATH), outside a
+    transaction. Attachments stay on the pooled connection, so later calls
+    only pay for archives created since.
+    """
+    first = str(start_date)[:4] if start_date else '0000'
+    last = str(end_date)[:4] if end_date else '9999'
+    attached = set(_attached_archives(conn))
+    schemas = []
+    for year, archive in list_archives(path).items():
+        if not first <= year <= last:
+            continue
+        schema = f"{ARCHIVE_PREFIX}{year}"
+        if schema not in attached:
+            _attach_archive(conn, schema, archive)
+            tables = conn.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master WHERE type = 'table'").fetchone()[0]
+            if tables < len(_ARCHIVE_COLUMNS):
+                # Being created by archive_harvest_before right now
+                _detach_archive(conn, schema)
+                continue
+        schemas.append(schema)
+    return schemas
+
+def _details_storage(schema):
+    # Archives keep the plain harvest_details table; main stores rows in
+    # harvest_details_data behind the harvest_details view
+    return f"{schema}.harvest_details_data" if schema == 'main' else f"{schema}.harvest_details"
+
+def harvest_source(conn, table, start_date=None, end_date=None, with_day=False):
+    """FROM-clause source for `table` and its parameters.
+
+    Main plus any archive the range needs as a UNION ALL; use it as
+    `SELECT ... FROM {source}` with the parameters first, for reads that
+    must see archived reports too (e.g. parquet_export). For details in
+    main the date range is applied to the indexed day numbers, since the
+    view's tanggal is computed. with_day adds those day numbers as a `day`
+    column, for windows that order on the index rather than on tanggal.
+    """
+    schemas = attach_archives(conn, start_date, end_date)
+    day_clauses, params = [], []
+    if table == 'harvest_details':
+        for op, value in (('>=', start_date), ('<=', end_date)):
+            if value:
+                day_clauses.append(f"day {op} ?")
+                params.append(day_number(value))
+    if not schemas and not day_clauses and not with_day:
+        return table, []
+
+    columns = ', '.join(_ARCHIVE_COLUMNS[table])
+    if with_day:
+        # Joined on id, the storage row keeps the scan in (day, ...) index order
+        view_columns = ', '.join(f"v.{c}" for c in _ARCHIVE_COLUMNS[table])
+        main = (f"SELECT {view_columns}, d.day FROM main.{table} v "
+                f"JOIN main.harvest_details_data d ON d.id = v.id{_where([f'd.{c}' for c in day_clauses])}")
+        # Archives keep text dates; julianday() - 2440587.5 counts from 1970-01-01 like day_number()
+        archive_day = ", CAST(julianday(tanggal) - 2440587.5 AS INTEGER) AS day"
+    else:
+        main = f"SELECT {columns} FROM main.{table}"
+        if day_clauses:
+            main += f" WHERE id IN (SELECT id FROM main.harvest_details_data{_where(day_clauses)})"
+        archive_day = ""
+    parts = [main] + [f"SELECT {columns}{archive_day} FROM {s}.{table}" for s in schemas]
+    return f"({' UNION ALL '.join(parts)})", params
+
+@instrumented
+def archive_harvest_before(cutoff):
+    """Move reports dated before `cutoff` into their yearly archive files.
+
+    Returns {year: reports moved}. Each year moves in one transaction, and
+    rows are copied with INSERT OR REPLACE, so an interrupted run can simply
+    be repeated.
+    """
+    cutoff = str(cutoff)
+    moved = {}
+    with get_connection() as conn:
+        years = [row[0] for row in conn.execute(
+            "SELECT DISTINCT substr(tanggal, 1, 4) FROM harvest_summary WHERE tanggal < ? ORDER BY 1", (cutoff,)
+        )]
+        for year in years:
+            if not re.fullmatch(r'\d{4}', year or ''):
+                continue
+            schema = f"{ARCHIVE_PREFIX}{year}"
+            if schema not in _attached_archives(conn):
+                _attach_archive(conn, schema, archive_path(year))
+                invalidate_archive_list(DB_PATH)
+            where = "tanggal >= ? AND tanggal < ?"
+            params = (year, min(cutoff, str(int(year) + 1)))
+            summary_ids = f"SELECT id FROM main.harvest_summary WHERE {where}"
+            with transaction():
+                c = conn.cursor()
+                _create_archive_tables(c, schema)
+                for table, rows_where in (('harvest_summary', where), ('harvest_details', f"summary_id IN ({summary_ids})")):
+                    columns = ', '.join(_ARCHIVE_COLUMNS[table])
+                    c.execute(f'''
+                        INSERT OR REPLACE INTO {schema}.{table} ({columns})
+                        SELECT {columns} FROM main.{table} WHERE {rows_where}
+                    ''', params)
+                    if table == 'harvest_summary':
+                        moved[year] = c.rowcount
+                c.execute(f"DELETE FROM {_details_storage('main')} WHERE summary_id IN ({summary_ids})", params)
+                c.execute(f"DELETE FROM main.harvest_summary WHERE {where}", params)
+    return moved
+
+@instrumented
+def clear_database(start_date=None, end_date=None, house=None):
+    """Purge harvest reports in the range (everything by default), archives included.
+
+    Returns the number of reports deleted.
+    """
+    with get_connection() as conn:
+        schemas = ['main'] + attach_archives(conn, start_date, end_date)
+        with transaction():
+            c = conn.cursor()
+            if not (start_date or end_date or _as_list(house)):
+                deleted = 0
+                for schema in schemas:
+                    deleted += c.execute(f"SELECT COUNT(*) FROM {schema}.harvest_summary").fetchone()[0]
+                    c.execute(f"DELETE FROM {_details_storage(schema)}")
+                    if c.execute(f"DELETE FROM {schema}.harvest_summary").rowcount and schema != 'main':
+                        _mark_rewritten(c)
+                c.execute("DELETE FROM harvest_import_log")
+                _rebuild_rollups(c)
+                return deleted
+
+            clauses, params = _harvest_filters(start_date, end_date, house)
+            summary_ids = []
+            for schema in schemas:
+                summary_ids += [row[0] for row in c.execute(
+                    f"SELECT id FROM {schema}.harvest_summary{_where(clauses)}", params
+                )]
+            _delete_summaries(c, summary_ids)
+            return len(summary_ids)
+
+# ========== FARM LEDGERS ==========
+# Cost journal (page 7), planting schedule and harvest sessions (page 4) and
+# growth records (page 5). Rows go in and come out with the same keys the
+# pages always used for their session_state dicts.
+
+def _insert_row(table, row, columns):
+    with transaction() as conn:
+        cur = conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [row.get(col) for col in columns]
+        )
+        return cur.lastrowid
+
+def _delete_rows(table, row_id=None):
+    with transaction() as conn:
+        if row_id is None:
+            conn.execute(f"DELETE FROM {table}")
+        else:
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (int(row_id),))
+
+# --- Cost journal ---
+COST_JOURNAL_COLUMNS = ['date', 'day', 'category', 'description', 'amount']
+
+@instrumented
+def add_cost_entry(entry):
+    return _insert_row('cost_journal', entry, COST_JOURNAL_COLUMNS)
+
+@instrumented
+def delete_cost_entry(entry_id):
+    _delete_rows('cost_journal', entry_id)
+
+@instrumented
+def clear_cost_journal():
+    _delete_rows('cost_journal')
+
+def _ledger_filters(start_date=None, end_date=None, category=None):
+    clauses, params = [], []
+    if start_date:
+        clauses.append("date >= ?")
+        params.append(str(start_date))
+    if end_date:
+        clauses.append("date <= ?")
+        params.append(str(end_date))
+    categories = _as_list(category)
+    if categories:
+        clauses.append(f"category IN ({', '.join('?' * len(categories))})")
+        params.extend(categories)
+    return clauses, params
+
+@instrumented
+@cached_read
+def query_cost_journal(start_date=None, end_date=None, category=None):
+    clauses, params = _ledger_filters(start_date, end_date, category)
+    with get_connection() as conn:
+        return pd.read_sql_query(
+            f"SELECT id, {', '.join(COST_JOURNAL_COLUMNS)} FROM cost_journal{_where(clauses)} ORDER BY date, id",
+            conn, params=params
+        )
+
+@instrumented
+@cached_read
+def cost_totals_by_category(start_date=None, end_date=None, category=None):
+    """Entries and total amount per category."""
+    clauses, params = _ledger_filters(start_date, end_date, category)
+    with get_connection() as conn:
+        return pd.read_sql_query(f'''
+            SELECT category, COUNT(*) AS entries, SUM(amount) AS amount
+            FROM cost_journal{_where(clauses)} GROUP BY category ORDER BY category
+        ''', conn, params=params)
+
+# --- Planting schedule ---
+# Status is derived from the dates on every read, for the day passed in
+PLANTING_COLUMNS = [
+    'house', 'bed_id', 'planting_date', 'harvest_start', 'harvest_end', 'clearing_start', 'next_planting',
+    'days_vegetatif', 'days_generatif', 'days_harvest', 'days_jeda',
+]
+
+_PLANTING_STATUS = '''
+    CASE
+        WHEN :today < planting_date THEN 'belum tanam'
+        WHEN :today < date(planting_date, '+' || days_vegetatif || ' days') THEN 'vegetatif'
+        WHEN :today < harvest_start THEN 'generatif'
+        WHEN :today <= harvest_end THEN 'panen'
+        WHEN :today < next_planting THEN 'jeda'
+        ELSE 'selesai'
+    END
+'''
+
+@instrumented
+def add_planting_entries(entries):
+    """Insert schedule rows (dicts with PLANTING_COLUMNS); returns how many."""
+    rows = [[entry[col] for col in PLANTING_COLUMNS] for entry in entries]
+    with transaction() as conn:
+        conn.executemany(
+            f"INSERT INTO planting_schedule ({', '.join(PLANTING_COLUMNS)}) VALUES ({', '.join('?' * len(PLANTING_COLUMNS))})",
+            rows
+        )
+    return len(rows)
+
+@instrumented
+def delete_planting_entry(entry_id):
+    _delete_rows('planting_schedule', entry_id)
+
+@instrumented
+def clear_planting_schedule():
+    _delete_rows('planting_schedule')
+
+@cached_read
+def _query_planting_schedule(today, house, status, harvest_from, harvest_to, limit):
+    clauses, params = [], {'today': today}
+    houses = _as_list(house)
+    if houses:
+        clauses.append(f"house IN ({', '.join(f':h{i}' for i in range(len(houses)))})")
+        params.update({f'h{i}': h for i, h in enumerate(houses)})
+    if harvest_from:
+        # Harvest window overlapping [harvest_from, harvest_to]
+        clauses.append("harvest_end >= :harvest_from")
+        params['harvest_from'] = str(harvest_from)
+    if harvest_to:
+        clauses.append("harvest_start <= :harvest_to")
+        params['harvest_to'] = str(harvest_to)
+    sql = f"SELECT * FROM (SELECT id, {', '.join(PLANTING_COLUMNS)}, {_PLANTING_STATUS} AS status FROM planting_schedule{_where(clauses)})"
+    statuses = _as_list(status)
+    if statuses:
+        sql += f" WHERE status IN ({', '.join(f':s{i}' for i in range(len(statuses)))})"
+        params.update({f's{i}': s for i, s in enumerate(statuses)})
+    sql += " ORDER BY harvest_start, id" if harvest_from or harvest_to else " ORDER BY planting_date, id"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    with get_connection() as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+@instrumented
+def query_planting_schedule(house=None, status=None, harvest_from=None, harvest_to=None, limit=None, today=None):
+    """Schedule rows with their status on `today` (default: the current date)."""
+    today = str(today or date.today())
+    return _query_planting_schedule(today, house, status, harvest_from, harvest_to, limit)
+
+@cached_read
+def _planting_status_counts(today, by_house):
+    group = "house, status" if by_house else "status"
+    with get_connection() as conn:
+        return pd.read_sql_query(f'''
+            SELECT {group}, COUNT(*) AS beds
+            FROM (SELECT house, {_PLANTING_STATUS} AS status FROM planting_schedule)
+            GROUP BY {group} ORDER BY {group}
+        ''', conn, params={'today': today})
+
+@instrumented
+def planting_status_counts(by_house=False, today=None):
+    """Number of beds per status (optionally per house and status)."""
+    return _planting_status_counts(str(today or date.today()), by_house)
+
+# --- Harvest sessions ---
+HARVEST_SESSION_COLUMNS = ['date', 'time', 'beds', 'stems']
+
+@instrumented
+def add_harvest_session(session):
+    beds = session.get('beds')
+    if isinstance(beds, (list, tuple)):
+        session = {**session, 'beds': ', '.join(beds)}
+    return _insert_row('harvest_sessions', session, HARVEST_SESSION_COLUMNS)
+
+@instrumented
+@cached_read
+def query_harvest_sessions(start_date=None, end_date=None, limit=None):
+    """Harvest sessions, newest first."""
+    clauses, params = _ledger_filters(start_date, end_date)
+    sql = f"SELECT {', '.join(HARVEST_SESSION_COLUMNS)} FROM harvest_sessions{_where(clauses)} ORDER BY date DESC, id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    with get_connection() as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+@instrumented
+@cached_read
+def harvest_session_totals(start_date=None, end_date=None):
+    clauses, params = _ledger_filters(start_date, end_date)
+    with get_connection() as conn:
+        sessions, stems = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(stems), 0) FROM harvest_sessions{_where(clauses)}", params
+        ).fetchone()
+    return {'sessions': sessions, 'stems': stems}
+
+# --- Growth records ---
+GROWTH_COLUMNS = ['house', 'date', 'week', 'height', 'leaves', 'diameter', 'temp', 'humidity']
+
+@instrumented
+def add_growth_record(record):
+    return _insert_row('growth_data', record, GROWTH_COLUMNS)
+
+@instrumented
+@cached_read
+def query_growth_data(house=None):
+    """Growth records ordered by week (and date within a week)."""
+    clauses, params = [], []
+    houses = _as_list(house)
+    if houses:
+        clauses.append(f"house IN ({', '.join('?' * len(houses))})")
+        params.extend(houses)
+    with get_connection() as conn:
+        return pd.read_sql_query(
+            f"SELECT id, {', '.join(GROWTH_COLUMNS)} FROM growth_data{_where(clauses)} ORDER BY week, date, id",
+            conn, params=params
+        )
+
+@instrumented
+@cached_read
+def latest_growth_record(house):
+    """The record with the highest week for `house`, as a dict (None if there is none)."""
+    with get_connection() as conn:
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(GROWTH_COLUMNS)} FROM growth_data WHERE house = ? ORDER BY week DESC, date DESC, id DESC LIMIT 1",
+            conn, params=[house]
+        )
+    return df.to_dict('records')[0] if not df.empty else None
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance commands for the krisan database")
+    parser.add_argument('--db', default=DB_PATH, help="path to the SQLite file (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('migrate', help="apply pending schema migrations")
+    commands.add_parser('rebuild-rollups', help="recompute the daily/monthly rollup tables")
+    archive_cmd = commands.add_parser('archive', help="move old reports into yearly archive files")
+    archive_cmd.add_argument('--before', required=True, help="archive reports dated before YYYY-MM-DD")
+    purge_cmd = commands.add_parser('purge', help="delete reports in a date range (archives included)")
+    purge_cmd.add_argument('--start', help="first date to delete, YYYY-MM-DD")
+    purge_cmd.add_argument('--end', help="last date to delete, YYYY-MM-DD")
+    purge_cmd.add_argument('--house', action='append', help="only this house (repeatable)")
+    purge_cmd.add_argument('--all', action='store_true', help="required to purge without --start/--end/--house")
+    args = parser.parse_args()
 
-def clear_database():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM harvest_details")
-    c.execute("DELETE FROM harvest_summary")
-    conn.commit()
-    conn.close()
+    DB_PATH = args.db
+    init_db()
+    if args.command == 'migrate':
+        print(f"{DB_PATH}: schema version {get_schema_version()}")
+    elif args.command == 'rebuild-rollups':
+        rebuild_rollups()
+        print(f"{DB_PATH}: rollups rebuilt")
+    elif args.command == 'archive':
+        moved = archive_harvest_before(args.before)
+        for year, n in moved.items():
+            print(f"{archive_path(year)}: {n} reports archived")
+        if not moved:
+            print(f"{DB_PATH}: nothing dated before {args.before}")
+    elif args.command == 'purge':
+        if not (args.start or args.end or args.house or args.all):
+            parser.error("purge needs --start/--end/--house, or --all to delete every report")
+        print(f"{DB_PATH}: {clear_database(args.start, args.end, args.house)} reports deleted")
@@ -0,0 +1,285 @@
+import os
+from datetime import datetime
+import pandas as pd
+
+from utils import db_manager
+from utils.db_manager import DETAIL_COLUMNS
+
+# Bulk import of historical grading books (.xlsx / .csv) into
+# harvest_summary / harvest_details.
+#
+# 1. The file is read in chunks (openpyxl read-only mode, pandas chunksize),
+#    each chunk normalized with vectorized pandas ops and staged into a
+#    TEMP table.
+# 2. Staged rows are grouped into daily reports (tanggal x house) and
+#    committed REPORTS_PER_COMMIT reports per transaction.
+#
+# Every imported report is recorded in harvest_import_log with a content
+# hash: re-importing an unchanged report is skipped, a changed one replaces
+# the previous import of that date and house.
+CHUNK_ROWS = 20000
+REPORTS_PER_COMMIT = 200
+
+VARIETIES = ['Putih', 'Pink', 'Kuning']
+
+# Normalized header -> DETAIL_COLUMNS name
+COLUMN_ALIASES = {
+    'tanggal': 'Tanggal', 'date': 'Tanggal', 'tgl': 'Tanggal',
+    'house': 'House', 'greenhouse': 'House', 'gh': 'House', 'nama_house': 'House',
+    'varietas': 'Varietas', 'variety': 'Varietas', 'warna': 'Varietas',
+    'grade': 'Grade', 'kelas': 'Grade',
+    'tipe': 'Tipe', 'type': 'Tipe', 'jenis': 'Tipe',
+    'ukuran': 'Ukuran', 'size': 'Ukuran',
+    'jml_ikat': 'Jml_Ikat', 'jumlah_ikat': 'Jml_Ikat', 'ikat': 'Jml_Ikat',
+    'isi_per_ikat': 'Isi_per_Ikat', 'isi': 'Isi_per_Ikat', 'batang_per_ikat': 'Isi_per_Ikat',
+    'total_batang': 'Total_Batang', 'jumlah_batang': 'Total_Batang', 'batang': 'Total_Batang',
+    'harga_per_ikat': 'Harga_per_Ikat', 'harga_ikat': 'Harga_per_Ikat',
+    'harga_per_batang': 'Harga_per_Batang', 'harga_batang': 'Harga_per_Batang', 'harga': 'Harga_per_Batang',
+    'total_pendapatan': 'Total_Pendapatan', 'pendapatan': 'Total_Pendapatan',
+}
+REQUIRED_COLUMNS = ['Tanggal', 'House', 'Varietas', 'Grade']
+NUMERIC_COLUMNS = ['Jml_Ikat', 'Isi_per_Ikat', 'Total_Batang', 'Harga_per_Ikat', 'Harga_per_Batang', 'Total_Pendapatan']
+
+def _normalize_header(name):
+    key = str(name).strip().lower()
+    for ch in ' -./%()':
+        key = key.replace(ch, '_')
+    while '__' in key:
+        key = key.replace('__', '_')
+    return COLUMN_ALIASES.get(key.strip('_'))
+
+def normalize_grading_frame(df):
+    """Map a raw grading sheet onto DETAIL_COLUMNS; returns (clean_df, rejected_count)."""
+    renames = {}
+    for col in df.columns:
+        target = _normalize_header(col)
+        if target and target not in renames.values():
+            renames[col] = target
+    df = df[list(renames)].rename(columns=renames)
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ditemukan: {', '.join(missing)}")
+
+    out = pd.DataFrame(index=df.index)
+    # ISO dates (and Excel date cells) first, then Indonesian day-first text like 05/03/2024
+    dates = pd.to_datetime(df['Tanggal'], errors='coerce', format='ISO8601')
+    dayfirst = pd.to_datetime(df['Tanggal'].where(dates.isna()), errors='coerce', format='mixed', dayfirst=True)
+    out['Tanggal'] = dates.fillna(dayfirst).dt.strftime('%Y-%m-%d')
+    for col in ['House', 'Varietas', 'Grade']:
+        out[col] = df[col].astype('string').str.strip()
+    out['Varietas'] = out['Varietas'].str.title()
+
+    num = {col: pd.to_numeric(df[col], errors='coerce') if col in df.columns else pd.Series(float('nan'), index=df.index)
+           for col in NUMERIC_COLUMNS}
+
+    # Stems per bunch: explicit column, else the number in Ukuran ("80 bt/ikat") or Grade ("Grade 80", "R-80")
+    isi = num['Isi_per_Ikat']
+    if 'Ukuran' in df.columns:
+        isi = isi.fillna(pd.to_numeric(df['Ukuran'].astype('string').str.extract(r'(\d+)')[0], errors='coerce'))
+    isi = isi.fillna(pd.to_numeric(out['Grade'].str.extract(r'(\d+)')[0], errors='coerce'))
+    # ... else both counts given: Total_Batang / Jml_Ikat
+    isi = isi.fillna(num['Total_Batang'] / num['Jml_Ikat'])
+
+    ikat = num['Jml_Ikat'].fillna(num['Total_Batang'] / isi)
+    batang = num['Total_Batang'].fillna(ikat * isi)
+    harga_batang = num['Harga_per_Batang'].fillna(num['Harga_per_Ikat'] / isi).fillna(0)
+    harga_ikat = num['Harga_per_Ikat'].fillna(harga_batang * isi).fillna(0)
+    pendapatan = num['Total_Pendapatan'].fillna(ikat * harga_ikat).fillna(0)
+
+    if 'Tipe' in df.columns:
+        tipe = df['Tipe'].astype('string').str.strip()
+    else:
+        tipe = pd.Series(pd.NA, index=df.index, dtype='string')
+    is_bs = out['Grade'].str.upper().str.match(r'^(R-|BS)').fillna(False)
+    out['Tipe'] = tipe.fillna(is_bs.map({True: 'BS/Reject', False: 'Normal'}))
+    if 'Ukuran' in df.columns:
+        out['Ukuran'] = df['Ukuran'].astype('string').str.strip()
+    else:
+        out['Ukuran'] = pd.Series(pd.NA, index=df.index, dtype='string')
+    out['Ukuran'] = out['Ukuran'].fillna(isi.astype('Int64').astype('string') + ' bt/ikat')
+
+    out['Jml_Ikat'] = ikat
+    out['Isi_per_Ikat'] = isi
+    out['Total_Batang'] = batang
+    out['Harga_per_Ikat'] = harga_ikat
+    out['Harga_per_Batang'] = harga_batang
+    out['Total_Pendapatan'] = pendapatan
+
+    # Only one of Jml_Ikat/Total_Batang and no bunch size: the other count is unknown, so the row is rejected
+    valid = out[REQUIRED_COLUMNS].notna().all(axis=1) & (out['Total_Batang'] > 0)
+    valid &= out[['Jml_Ikat', 'Isi_per_Ikat']].notna().all(axis=1)
+    for col in REQUIRED_COLUMNS:
+        valid &= out[col].fillna('') != ''
+    # Comparisons with NA give NA; an unknown row counts as rejected rather than vanishing
+    valid = valid.fillna(False).astype(bool)
+    clean = out[valid].copy()
+    for col in ['Jml_Ikat', 'Isi_per_Ikat', 'Total_Batang', 'Harga_per_Ikat', 'Total_Pendapatan']:
+        clean[col] = clean[col].round().astype('int64')
+    clean['Harga_per_Batang'] = clean['Harga_per_Batang'].astype(float)
+    return clean[list(DETAIL_COLUMNS)], int((~valid).sum())
+
+def _iter_excel_chunks(source, chunk_rows):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header or not any(_normalize_header(h) == 'Tanggal' for h in header if h is not None):
+                continue
+            columns = [str(h) if h is not None else f"_col{i}" for i, h in enumerate(header)]
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+def iter_raw_chunks(source, name=None, chunk_rows=CHUNK_ROWS):
+    """Yield raw DataFrame chunks from a .csv/.xlsx path or file object."""
+    name = (name or getattr(source, 'name', None) or str(source)).lower()
+    if name.endswith(('.xlsx', '.xlsm')):
+        yield from _iter_excel_chunks(source, chunk_rows)
+    elif name.endswith('.csv'):
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype=str, sep=None, engine='python')
+    else:
+        raise ValueError(f"Format file tidak didukung: {name}")
+
+def _create_staging(c):
+    c.execute(f'''
+        CREATE TEMP TABLE IF NOT EXISTS import_staging (
+            {', '.join(f'"{col}"' for col in DETAIL_COLUMNS)}
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS temp.idx_import_staging_key ON import_staging (Tanggal, House)")
+    c.execute("DELETE FROM import_staging")
+
+def _summarize_reports(df):
+    # One summary row per (Tanggal, House), same figures the grading tab saves
+    df = df.assign(_normal=df['Total_Batang'].where(df['Tipe'] == 'Normal', 0))
+    keys = ['Tanggal', 'House']
+    summary = df.groupby(keys).agg(
+        Tangkai=('Total_Batang', 'sum'),
+        Pendapatan=('Total_Pendapatan', 'sum'),
+        _normal=('_normal', 'sum'),
+    )
+    per_variety = df.pivot_table(index=keys, columns='Varietas', values='Total_Batang', aggfunc='sum', fill_value=0)
+    for variety in VARIETIES:
+        summary[variety] = per_variety[variety] if variety in per_variety else 0
+    summary['Grade A %'] = (summary['_normal'] / summary['Tangkai'] * 100).round(1).fillna(0)
+
+    # Order-independent content hash of each report's detail lines
+    row_hashes = pd.util.hash_pandas_object(df[list(DETAIL_COLUMNS)], index=False)
+    summary['content_hash'] = row_hashes.groupby([df['Tanggal'], df['House']]).sum().map('{:016x}'.format)
+    return summary.drop(columns='_normal')
+
+def _commit_reports(conn, df, source):
+    summary = _summarize_reports(df)
+    c = conn.cursor()
+    keys = list(summary.index)
+    logged = {}
+    for tanggal, house in keys:
+        row = c.execute(
+            "SELECT content_hash FROM harvest_import_log WHERE tanggal = ? AND house = ?",
+            (tanggal, house)
+        ).fetchone()
+        if row:
+            logged[(tanggal, house)] = row[0]
+
+    unchanged = [k for k in keys if logged.get(k) == summary.at[k, 'content_hash']]
+    groups = df.groupby(['Tanggal', 'House']).indices
+    now = datetime.now().isoformat(timespec='seconds')
+    inserted = replaced = 0
+    for key in keys:
+        if key in unchanged:
+            continue
+        s = summary.loc[key]
+        # Upsert: a report already in the DB (imported or saved by hand) is replaced in place
+        summary_id, was_replaced = db_manager.upsert_report(c, {
+            'Tanggal': key[0], 'House': key[1],
+            'Tangkai': int(s['Tangkai']), 'Grade A %': float(s['Grade A %']),
+            'Pendapatan': int(s['Pendapatan']),
+            'Putih': int(s['Putih']), 'Pink': int(s['Pink']), 'Kuning': int(s['Kuning']),
+        }, df.iloc[groups[key]])
+        c.execute('''
+            INSERT OR REPLACE INTO harvest_import_log (tanggal, house, content_hash, summary_id, source, imported_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (key[0], key[1], s['content_hash'], summary_id, source, now))
+        replaced += was_replaced
+        inserted += not was_replaced
+    return inserted, replaced, len(unchanged)
+
+def import_grading_file(source, name=None, progress=None):
+    """Import one grading book; progress(stage, done, total) is called as it goes.
+
+    Returns counts of staged/rejected rows and inserted/replaced/unchanged reports.
+    """
+    source_name = os.path.basename(name or getattr(source, 'name', None) or str(source))
+    result = {'rows': 0, 'rejected': 0, 'inserted': 0, 'replaced': 0, 'unchanged': 0}
+
+    db_manager.init_db()
+    with db_manager.get_connection() as conn:
+        # Reports being replaced may already sit in a yearly archive
+        db_manager.attach_archives(conn)
+        # 1. Stage normalized rows
+        with db_manager.transaction():
+            _create_staging(conn)
+        for raw in iter_raw_chunks(source, source_name):
+            clean, rejected = normalize_grading_frame(raw)
+            with db_manager.transaction():
+                conn.executemany(
+                    f"INSERT INTO import_staging VALUES ({', '.join('?' * len(DETAIL_COLUMNS))})",
+                    zip(*[clean[col].tolist() for col in DETAIL_COLUMNS])
+                )
+            result['rows'] += len(clean)
+            result['rejected'] += rejected
+            if progress:
+                progress('staging', result['rows'], None)
+
+        # 2. Commit reports in chunked transactions
+        keys = conn.execute("SELECT DISTINCT Tanggal, House FROM import_staging ORDER BY Tanggal, House").fetchall()
+        for i in range(0, len(keys), REPORTS_PER_COMMIT):
+            first, last = keys[i], keys[min(i + REPORTS_PER_COMMIT, len(keys)) - 1]
+            batch = pd.read_sql_query(
+                "SELECT * FROM import_staging WHERE (Tanggal, House) BETWEEN (?, ?) AND (?, ?)",
+                conn, params=[*first, *last]
+            )
+            with db_manager.transaction():
+                inserted, replaced, unchanged = _commit_reports(conn, batch, source_name)
+            result['inserted'] += inserted
+            result['replaced'] += replaced
+            result['unchanged'] += unchanged
+            if progress:
+                progress('commit', min(i + REPORTS_PER_COMMIT, len(keys)), len(keys))
+
+        with db_manager.transaction():
+            conn.execute("DROP TABLE IF EXISTS temp.import_staging")
+    return result
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import grading books (.xlsx/.csv) into the krisan database")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--db', default=db_manager.DB_PATH, help="path to the SQLite file (default: %(default)s)")
+    args = parser.parse_args()
+
+    db_manager.DB_PATH = args.db
+
+    def print_progress(stage, done, total):
+        if stage == 'staging':
+            print(f"\r  staged {done:,} rows", end='', flush=True)
+        else:
+            print(f"\r  committed {done:,}/{total:,} reports", end='', flush=True)
+
+    for path in args.files:
+        print(path)
+        result = import_grading_file(path, progress=print_progress)
+        print(f"\n  {result['rows']:,} rows ({result['rejected']:,} rejected): "
+              f"{result['inserted']:,} new, {result['replaced']:,} replaced, "
+              f"{result['unchanged']:,} unchanged reports")
@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils import db_manager
+
+# Optional background writer for harvest saves. Pages hand records to one
+# writer thread per database file instead of committing on the script
+# thread; the writer drains whatever is queued into a single transaction
+# (group commit), so concurrent sessions never race for the SQLite write
+# lock. Each submit() returns a Future resolving to the new summary id.
+MAX_BATCH = 64
+MAX_WAIT_SECONDS = 0.05  # how long to keep collecting a batch after the first record
+
+_STOP = object()
+
+class HarvestWriter:
+    def __init__(self, db_path, max_batch=MAX_BATCH, max_wait=MAX_WAIT_SECONDS):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {'committed': 0, 'failed': 0, 'batches': 0, 'last_batch_size': 0, 'last_commit_ms': 0.0}
+        self._thread = threading.Thread(target=self._run, name=f"harvest-writer:{db_path}", daemon=True)
+        self._thread.start()
+
+    def submit(self, summary_data, details_df):
+        future = Future()
+        self._queue.put((summary_data, details_df, future))
+        return future
+
+    def stats(self):
+        with self._stats_lock:
+            return {'queued': self._queue.qsize(), 'alive': self._thread.is_alive(), **self._stats}
+
+    def stop(self, timeout=None):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # finish this batch, stop on the next loop
+                break
+            batch.append(item)
+        return batch
+
+    def _write(self, batch):
+        # Upserts: a report saved twice (even within one batch) is replaced
+        return db_manager.write_reports([(summary_data, details_df) for summary_data, details_df, _ in batch],
+                                        self.db_path)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            start = time.perf_counter()
+            try:
+                results = [(item, summary_id, None) for item, summary_id in zip(batch, self._write(batch))]
+            except Exception:
+                # Isolate the bad record(s): retry one per transaction
+                results = []
+                for item in batch:
+                    try:
+                        results.append((item, self._write([item])[0], None))
+                    except Exception as e:
+                        results.append((item, None, e))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._stats_lock:
+                self._stats['batches'] += 1
+                self._stats['last_batch_size'] = len(batch)
+                self._stats['last_commit_ms'] = elapsed_ms
+                for _, _, error in results:
+                    self._stats['failed' if error else 'committed'] += 1
+            for (_, _, future), summary_id, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(summary_id)
+
+_writers_lock = threading.Lock()
+_writers = {}
+
+def get_harvest_writer():
+    """The process-wide writer for the current db_manager.DB_PATH."""
+    path = db_manager.DB_PATH
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None or not writer._thread.is_alive():
+            writer = _writers[path] = HarvestWriter(path)
+        return writer
+
+def get_writer_stats():
+    """stats() of every writer started in this process, by database path."""
+    with _writers_lock:
+        writers = dict(_writers)
+    return {path: writer.stats() for path, writer in writers.items()}
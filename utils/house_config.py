@@ -0,0 +1,33 @@
+import json
+import os
+
+# House configuration saved from the Kalkulator Produksi page:
+# {"house_1": {"name", "beds", ..., "site", "lat", "lon"}, ...}
+# site/lat/lon place a house at a farm location; houses sharing a site
+# share its weather.
+CONFIG_FILE = "data/krisan_house_config.json"
+
+def load_house_config():
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            return {}
+    return {}
+
+def save_house_config(config):
+    os.makedirs("data", exist_ok=True)
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(config, f)
+
+def house_locations(house_database):
+    """{site: {'lat', 'lon', 'houses'}} for houses with coordinates, in house order."""
+    sites = {}
+    for house in house_database.values():
+        if house.get('lat') is None or house.get('lon') is None:
+            continue
+        site = house.get('site') or house.get('name')
+        entry = sites.setdefault(site, {'lat': house['lat'], 'lon': house['lon'], 'houses': []})
+        entry['houses'].append(house.get('name', site))
+    return sites
@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import pandas as pd
+
+from utils import db_manager
+
+# Columnar export of harvest_summary / harvest_details for analysis outside
+# the app. Files are Hive-partitioned by month:
+#
+#   <out_dir>/harvest_details/year=2025/month=03/part-0.parquet
+#
+# A manifest remembers the row count, max id and write version
+# (harvest_month_versions) of every partition written, so an incremental
+# export only rewrites months that are new or changed, including reports
+# replaced in place under the same id.
+PARQUET_DIR = os.path.join('exports', 'parquet')
+MANIFEST_FILE = '_manifest.json'
+
+TABLES = ('harvest_summary', 'harvest_details')
+# Low-cardinality text columns stored as Parquet dictionary pages
+DICTIONARY_COLUMNS = ['house', 'varietas', 'grade', 'tipe', 'ukuran']
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Export Parquet membutuhkan paket 'pyarrow' (pip install pyarrow)") from e
+    return pyarrow, pyarrow.parquet
+
+def _load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def _save_manifest(out_dir, manifest):
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix='.part')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_FILE))
+
+def _month_stats(conn, table):
+    # Yearly archives included: an archived month is unchanged, not removed
+    source, params = db_manager.harvest_source(conn, table)
+    rows = conn.execute(f'''
+        SELECT substr(tanggal, 1, 7) AS bulan, COUNT(*), MAX(id)
+        FROM {source} WHERE tanggal IS NOT NULL
+        GROUP BY bulan ORDER BY bulan
+    ''', params).fetchall()
+    versions = dict(conn.execute("SELECT bulan, version FROM harvest_month_versions"))
+    return {bulan: {'rows': n, 'max_id': max_id, 'version': versions.get(bulan, 0)} for bulan, n, max_id in rows}
+
+def _partition_dir(out_dir, table, bulan):
+    year, month = bulan.split('-')[:2]
+    return os.path.join(out_dir, table, f"year={year}", f"month={month}")
+
+def _write_partition(conn, out_dir, table, bulan):
+    pa, pq = _require_pyarrow()
+    start, end = f"{bulan}-01", str(pd.Period(bulan, freq='M').end_time.date())
+    source, params = db_manager.harvest_source(conn, table, start, end)
+    df = pd.read_sql_query(
+        f"SELECT * FROM {source} WHERE tanggal BETWEEN ? AND ? ORDER BY tanggal, id",
+        conn, params=params + [start, end]
+    )
+    dictionary_columns = [col for col in DICTIONARY_COLUMNS if col in df.columns]
+    for col in dictionary_columns:
+        df[col] = df[col].astype('category')
+
+    part_dir = _partition_dir(out_dir, table, bulan)
+    os.makedirs(part_dir, exist_ok=True)
+    tmp_path = os.path.join(part_dir, 'part-0.parquet.part')
+    pq.write_table(
+        pa.Table.from_pandas(df, preserve_index=False), tmp_path,
+        compression='zstd', use_dictionary=dictionary_columns
+    )
+    os.replace(tmp_path, os.path.join(part_dir, 'part-0.parquet'))
+    return len(df)
+
+def export_harvest_parquet(out_dir=PARQUET_DIR, incremental=True):
+    """Write month partitions of both harvest tables; returns a per-table report."""
+    _require_pyarrow()
+    if not incremental:
+        for table in TABLES:
+            shutil.rmtree(os.path.join(out_dir, table), ignore_errors=True)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _load_manifest(out_dir) if incremental else {}
+    report = {}
+
+    with db_manager.get_connection() as conn:
+        for table in TABLES:
+            written = manifest.setdefault(table, {})
+            current = _month_stats(conn, table)
+            result = {'written': [], 'skipped': 0, 'removed': [], 'rows': 0}
+
+            for bulan, stats in current.items():
+                if written.get(bulan) == stats:
+                    result['skipped'] += 1
+                    continue
+                result['rows'] += _write_partition(conn, out_dir, table, bulan)
+                result['written'].append(bulan)
+                written[bulan] = stats
+
+            # Months that no longer exist in the DB (purged)
+            for bulan in [b for b in written if b not in current]:
+                shutil.rmtree(_partition_dir(out_dir, table, bulan), ignore_errors=True)
+                del written[bulan]
+                result['removed'].append(bulan)
+
+            report[table] = result
+
+    _save_manifest(out_dir, manifest)
+    return report
+
+def zip_parquet_export(out_dir=PARQUET_DIR):
+    """Bundle the partition tree into a zip on disk and return its path."""
+    zip_path = os.path.join(tempfile.gettempdir(), 'krisan_parquet_export.zip')
+    # Parquet pages are already compressed; store them as-is
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for root, _, files in os.walk(out_dir):
+            for name in files:
+                if name.endswith('.parquet') or name == MANIFEST_FILE:
+                    full = os.path.join(root, name)
+                    zf.write(full, os.path.relpath(full, out_dir))
+    return zip_path
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export krisan harvest tables to month-partitioned Parquet")
+    parser.add_argument('--db', default=db_manager.DB_PATH, help="path to the SQLite file (default: %(default)s)")
+    parser.add_argument('--out', default=PARQUET_DIR, help="output directory (default: %(default)s)")
+    parser.add_argument('--full', action='store_true', help="rewrite every partition instead of only new/changed ones")
+    args = parser.parse_args()
+
+    db_manager.DB_PATH = args.db
+    db_manager.init_db()
+    for table, result in export_harvest_parquet(args.out, incremental=not args.full).items():
+        print(f"{table}: {len(result['written'])} partitions written ({result['rows']:,} rows), "
+              f"{result['skipped']} unchanged, {len(result['removed'])} removed")
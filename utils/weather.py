@@ -0,0 +1,663 @@
+import copy
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.db_manager import get_connection, percentile
+
+# Open-Meteo client shared by the weather pages. One pooled requests.Session
+# per process keeps connections alive between reruns; every call has
+# connect/read timeouts and an overall DEADLINE_SECONDS, and connection
+# errors, timeouts, 429 and 5xx are retried up to MAX_RETRIES times with
+# full-jitter exponential backoff. After BREAKER_FAILURES failed calls in a
+# row the circuit opens: calls fail fast with CircuitOpen for
+# BREAKER_COOLDOWN_SECONDS, then a single trial call decides whether it
+# closes again. Latency and error counters live in process memory (see the
+# Diagnostik page).
+#
+# Results are cached per process, so every session shares them: keyed on
+# the GRID_DEGREES cell around lat/lon (farms in the same cell share one
+# entry, fetched for the cell centre) and the block (current, hourly,
+# daily). Blocks are fresh for CURRENT_TTL_MINUTES (current conditions) or
+# FORECAST_TTL_HOURS (hourly/daily forecast); up to MAX_STALE_HOURS old, an
+# expired block is still served while a background thread refreshes it.
+# Whatever blocks a lookup is missing or has stale are fetched together in
+# one request, and get_weather_many does the same for several locations
+# with one multi-coordinate request (comma-separated latitude/longitude),
+# fanned out into the cache per cell. Requests that cannot be combined
+# (another model, the archive API, more than BATCH_LOCATIONS cells) go
+# through get_json_many, which runs them concurrently.
+#
+# Fetched blocks are also written to WEATHER_DB_PATH, so a restarted
+# process warms its cache from disk, and when Open-Meteo cannot be reached
+# (or offline mode is on) the last-known blocks are served whatever their
+# age, flagged offline together with the time they were fetched.
+FORECAST_URL = 'https://api.open-meteo.com/v1/forecast'
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5
+DEADLINE_SECONDS = 12
+MAX_RETRIES = 2
+BACKOFF_BASE_SECONDS = 0.25
+BACKOFF_MAX_SECONDS = 2.0
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN_SECONDS = 30
+POOL_SIZE = 10
+STATS_WINDOW = 500
+
+GRID_DEGREES = 0.01  # ~1.1 km at the equator
+CURRENT_TTL_MINUTES = 10
+FORECAST_TTL_HOURS = 3
+MAX_STALE_HOURS = 24
+BATCH_LOCATIONS = 50  # cells per multi-location request; more go out as concurrent requests
+CACHE_MAX_ENTRIES = 512
+REFRESH_WORKERS = 4
+
+WEATHER_DB_PATH = 'weather.db'  # its own file: krisan.db backups and read-cache generations stay out of it
+STORE_KEEP_DAYS = 30
+
+CURRENT_VARIABLES = ('temperature_2m', 'relative_humidity_2m', 'rain', 'surface_pressure', 'wind_speed_10m')
+HOURLY_VARIABLES = ('temperature_2m', 'relative_humidity_2m', 'precipitation_probability')
+DAILY_VARIABLES = (
+    'temperature_2m_max', 'temperature_2m_min', 'rain_sum', 'precipitation_probability_max', 'wind_speed_10m_max'
+)
+# block -> (variables, fresh for seconds)
+BLOCKS = {
+    'current': (CURRENT_VARIABLES, CURRENT_TTL_MINUTES * 60),
+    'hourly': (HOURLY_VARIABLES, FORECAST_TTL_HOURS * 3600),
+    'daily': (DAILY_VARIABLES, FORECAST_TTL_HOURS * 3600),
+}
+
+class WeatherError(Exception):
+    """Open-Meteo could not be reached or answered with an error."""
+
+class CircuitOpen(WeatherError):
+    """Calls fail fast while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """Opens after `failures` failed calls in a row; one trial call after `cooldown` seconds."""
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self.opened_at >= self.cooldown else 'open'
+
+    def retry_in(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self.consecutive, self.opened_at = 0, None
+                return
+            self.consecutive += 1
+            # A failed trial call opens it again for another cooldown
+            if self.opened_at is not None or self.consecutive >= self.failures:
+                self.opened_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self.consecutive, self.opened_at, self._trial = 0, None, False
+
+_breaker = CircuitBreaker()
+
+# ========== SESSION ==========
+_session_lock = threading.Lock()
+_session = None
+
+def get_session():
+    """The process-wide pooled session (created on first use)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Retries are done here, with jitter and the breaker, not by urllib3
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+# ========== STATS ==========
+_stats_lock = threading.Lock()
+_COUNTERS = (
+    'calls', 'errors', 'retries', 'timeouts', 'rejected', 'hits', 'stale_hits', 'misses', 'refreshes',
+    'disk_loads', 'offline_hits', 'store_errors',
+)
+_stats = dict.fromkeys(_COUNTERS, 0) | {'last_error': None}
+_samples = deque(maxlen=STATS_WINDOW)
+
+def _count(**counters):
+    with _stats_lock:
+        for name, value in counters.items():
+            _stats[name] += value
+
+def _record_call(elapsed_ms, error):
+    with _stats_lock:
+        _stats['calls'] += 1
+        _samples.append(elapsed_ms)
+        if error is not None:
+            _stats['errors'] += 1
+            _stats['last_error'] = f"{datetime.now():%H:%M:%S} {error}"
+
+def get_weather_stats():
+    """Request counters, latency p50/p95/max, breaker state and cache counters."""
+    with _stats_lock:
+        stats, samples = dict(_stats), list(_samples)
+    with _cache_lock:
+        entries = len(_cache)
+    lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+    return {
+        **stats,
+        'cache_entries': entries,
+        'hit_ratio': (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0,
+        'p50_ms': percentile(samples, 0.5),
+        'p95_ms': percentile(samples, 0.95),
+        'max_ms': max(samples, default=0.0),
+        'breaker': _breaker.state,
+        'breaker_retry_in': _breaker.retry_in(),
+        'offline_mode': _offline_mode,
+    }
+
+def reset_weather_stats():
+    with _stats_lock:
+        _stats.update(dict.fromkeys(_COUNTERS, 0), last_error=None)
+        _samples.clear()
+
+# ========== REQUESTS ==========
+def _backoff(attempt):
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def _attempt(url, params, read_timeout):
+    """One GET; returns (json, None), or (None, error) with error retryable unless it is a WeatherError."""
+    try:
+        response = get_session().get(url, params=params, timeout=(CONNECT_TIMEOUT, read_timeout))
+    except requests.Timeout as e:
+        _count(timeouts=1)
+        return None, e
+    except requests.RequestException as e:
+        return None, e
+    if response.status_code == 429 or response.status_code >= 500:
+        return None, requests.HTTPError(f"HTTP {response.status_code}")
+    try:
+        data = response.json()
+    except ValueError:
+        return None, WeatherError(f"HTTP {response.status_code}: respons bukan JSON")
+    if response.status_code >= 400 or (isinstance(data, dict) and data.get('error')):
+        reason = data.get('reason') if isinstance(data, dict) else None
+        return None, WeatherError(f"HTTP {response.status_code}: {reason or response.reason}")
+    return data, None
+
+def _describe(error):
+    # urllib3 messages repeat the whole URL; the pages show something shorter
+    if isinstance(error, requests.Timeout):
+        return "Open-Meteo tidak merespons (timeout)"
+    if isinstance(error, requests.ConnectionError):
+        return "tidak dapat terhubung ke Open-Meteo"
+    return str(error)
+
+def get_json(url, params):
+    """GET url with timeouts, retries and the circuit breaker; returns the decoded JSON or raises WeatherError."""
+    if not _breaker.allow():
+        _count(rejected=1)
+        raise CircuitOpen(f"Open-Meteo sedang gagal, dicoba lagi dalam {_breaker.retry_in():.0f} detik")
+
+    start = time.perf_counter()
+    deadline = start + DEADLINE_SECONDS
+    error = None
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            pause = _backoff(attempt - 1)
+            if time.perf_counter() + pause + CONNECT_TIMEOUT >= deadline:
+                break
+            _count(retries=1)
+            time.sleep(pause)
+        read_timeout = min(READ_TIMEOUT, max(0.1, deadline - time.perf_counter()))
+        data, error = _attempt(url, params, read_timeout)
+        if error is None or isinstance(error, WeatherError):
+            break
+
+    # A 4xx is our request's fault, not a sign Open-Meteo is down
+    _breaker.record(ok=error is None or isinstance(error, WeatherError))
+    _record_call((time.perf_counter() - start) * 1000, None if error is None else _describe(error))
+    if error is not None:
+        if isinstance(error, WeatherError):
+            raise error
+        raise WeatherError(_describe(error)) from error
+    return data
+
+def _coordinates(value):
+    # Several locations go into one request as comma-separated lists
+    if isinstance(value, (list, tuple)):
+        return ','.join(str(v) for v in value)
+    return value
+
+def forecast(lat, lon, current=None, hourly=None, daily=None, timezone='auto'):
+    """Open-Meteo forecast with the given variable lists.
+
+    lat and lon may be lists of equal length: one request for all those
+    locations, answered with a list in the same order.
+    """
+    params = {'latitude': _coordinates(lat), 'longitude': _coordinates(lon), 'timezone': timezone}
+    for block, variables in (('current', current), ('hourly', hourly), ('daily', daily)):
+        if variables:
+            params[block] = ','.join(variables)
+    return get_json(FORECAST_URL, params)
+
+_fetch_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='weather-fetch')
+
+def get_json_many(calls):
+    """get_json for each (url, params) in calls, run concurrently; results in order.
+
+    For requests that cannot be merged into one. Raises the first
+    WeatherError after all calls have finished.
+    """
+    futures = [_fetch_pool.submit(get_json, url, params) for url, params in calls]
+    errors = [f.exception() for f in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+    return [f.result() for f in futures]
+
+# ========== STORE ==========
+# One row per observation (current) or forecast step (hourly/daily) and
+# grid cell; a newer fetch replaces the steps it covers. A block is read
+# back as the rows of its latest fetch.
+_STORE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS weather_observations (
+        lat REAL NOT NULL,          -- grid cell centre
+        lon REAL NOT NULL,
+        block TEXT NOT NULL,        -- current / hourly / daily
+        time TEXT NOT NULL,         -- local time of the observation or forecast step
+        fetched_at REAL NOT NULL,   -- unix time of the fetch that wrote the row
+        data TEXT NOT NULL,         -- JSON {variable: value}
+        PRIMARY KEY (lat, lon, block, time)
+    ) WITHOUT ROWID
+'''
+_store_lock = threading.Lock()
+_store_ready = set()  # paths the table has been created in
+_last_prune = 0.0
+
+@contextmanager
+def _weather_db():
+    with get_connection(WEATHER_DB_PATH) as conn:
+        if WEATHER_DB_PATH not in _store_ready:
+            with _store_lock:
+                conn.execute(_STORE_SCHEMA)
+                _store_ready.add(WEATHER_DB_PATH)
+        yield conn
+
+def _store_failed(error):
+    # The disk copy is a fallback; the page still gets its weather
+    with _stats_lock:
+        _stats['store_errors'] += 1
+        _stats['last_error'] = f"{datetime.now():%H:%M:%S} {WEATHER_DB_PATH}: {error}"
+
+def _rows(cell, block, data, fetched_at):
+    if block == 'current':
+        return [(*cell, block, data['time'], fetched_at, json.dumps(data))]
+    series = [name for name in data if name != 'time']
+    return [(*cell, block, step, fetched_at, json.dumps({name: data[name][i] for name in series}))
+            for i, step in enumerate(data['time'])]
+
+def _persist(fetched, fetched_at):
+    """Write {cell: {block: data}} from one fetch; rows older than STORE_KEEP_DAYS go once a day."""
+    global _last_prune
+    try:
+        # An answer missing 'time' or a series only costs its disk copy too
+        rows = [row for cell, cell_blocks in fetched.items() for block, data in cell_blocks.items()
+                for row in _rows(cell, block, data, fetched_at)]
+        with _weather_db() as conn:
+            conn.executemany("INSERT OR REPLACE INTO weather_observations VALUES (?, ?, ?, ?, ?, ?)", rows)
+            if fetched_at - _last_prune > 24 * 3600:
+                conn.execute("DELETE FROM weather_observations WHERE fetched_at < ?",
+                             (fetched_at - STORE_KEEP_DAYS * 24 * 3600,))
+                _last_prune = fetched_at
+            conn.commit()
+    except (sqlite3.Error, LookupError, TypeError, ValueError) as e:
+        _store_failed(e)
+
+def _unpack(block, rows):
+    if block == 'current':
+        return json.loads(rows[-1][1])
+    steps = [json.loads(data) for _, data in rows]
+    return {'time': [step for step, _ in rows], **{name: [s.get(name) for s in steps] for name in steps[0]}}
+
+def _load(keys):
+    """{(block, lat, lon): (data, fetched_at)} of the latest stored fetch, for the keys that have one."""
+    loaded = {}
+    try:
+        with _weather_db() as conn:
+            for block, lat, lon in keys:
+                rows = conn.execute('''
+                    SELECT time, data, fetched_at FROM weather_observations
+                    WHERE lat = ? AND lon = ? AND block = ? AND fetched_at = (
+                        SELECT MAX(fetched_at) FROM weather_observations WHERE lat = ? AND lon = ? AND block = ?
+                    )
+                    ORDER BY time
+                ''', (lat, lon, block) * 2).fetchall()
+                if rows:
+                    loaded[(block, lat, lon)] = (_unpack(block, [row[:2] for row in rows]), rows[0][2])
+    except sqlite3.Error as e:
+        _store_failed(e)
+    return loaded
+
+def get_stored_weather():
+    """Cells and blocks in WEATHER_DB_PATH: [{'lat', 'lon', 'block', 'rows', 'fetched_at'}], newest first."""
+    try:
+        with _weather_db() as conn:
+            rows = conn.execute('''
+                SELECT lat, lon, block, COUNT(*), MAX(fetched_at) FROM weather_observations
+                GROUP BY lat, lon, block
+                ORDER BY MAX(fetched_at) DESC
+            ''').fetchall()
+    except sqlite3.Error as e:
+        _store_failed(e)
+        return []
+    return [dict(zip(('lat', 'lon', 'block', 'rows', 'fetched_at'), row)) for row in rows]
+
+def format_age(fetched_at):
+    """How long ago `fetched_at` (unix time) was, for the pages: '5 menit lalu', '3 jam lalu', '2 hari lalu'."""
+    minutes = max(0.0, time.time() - fetched_at) // 60
+    if minutes < 1:
+        return "baru saja"
+    if minutes < 60:
+        return f"{minutes:.0f} menit lalu"
+    if minutes < 48 * 60:
+        return f"{minutes // 60:.0f} jam lalu"
+    return f"{minutes // (24 * 60):.0f} hari lalu"
+
+# ========== CACHE ==========
+_cache_lock = threading.Lock()
+_cache = OrderedDict()  # (block, cell lat, cell lon) -> {'data', 'fetched_at', 'refreshing'}
+_inflight = {}  # key -> Future of the fetch other callers wait on
+_refresh_pool = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='weather-refresh')
+_offline_mode = False
+
+def set_offline_mode(on):
+    """Serve only cached/stored weather, without contacting Open-Meteo (process-wide)."""
+    global _offline_mode
+    _offline_mode = bool(on)
+
+def get_offline_mode():
+    return _offline_mode
+
+def grid_cell(lat, lon):
+    """Centre of the GRID_DEGREES cell holding (lat, lon)."""
+    return (round(round(float(lat) / GRID_DEGREES) * GRID_DEGREES, 6),
+            round(round(float(lon) / GRID_DEGREES) * GRID_DEGREES, 6))
+
+def _put(key, data, fetched_at):
+    # Caller holds _cache_lock
+    _cache[key] = {'data': data, 'fetched_at': fetched_at, 'refreshing': False}
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+def _warm(keys):
+    """Load keys the cache does not hold (new process, or evicted) from the store."""
+    with _cache_lock:
+        absent = [key for key in keys if key not in _cache]
+    if not absent:
+        return
+    loaded = _load(absent)
+    with _cache_lock:
+        for key, (data, fetched_at) in loaded.items():
+            # A fetch may have landed in the meantime
+            if key not in _cache:
+                _put(key, data, fetched_at)
+    _count(disk_loads=len(loaded))
+
+def _fetch_cells(cells, blocks):
+    """Fetch `blocks` for every cell, BATCH_LOCATIONS cells per request; stores them, returns {cell: {block: data}}.
+
+    WeatherError if an answer lacks a location or a requested block.
+    """
+    chunks = [cells[i:i + BATCH_LOCATIONS] for i in range(0, len(cells), BATCH_LOCATIONS)]
+    variables = {block: BLOCKS[block][0] for block in blocks}
+    if len(chunks) == 1:
+        answers = [forecast([lat for lat, _ in cells], [lon for _, lon in cells], **variables)]
+    else:
+        answers = get_json_many([(FORECAST_URL, {
+            'latitude': _coordinates([lat for lat, _ in chunk]),
+            'longitude': _coordinates([lon for _, lon in chunk]),
+            'timezone': 'auto',
+            **{block: ','.join(names) for block, names in variables.items()},
+        }) for chunk in chunks])
+    fetched = {}
+    for chunk, answer in zip(chunks, answers):
+        # A single location is answered with an object rather than a list
+        answer = answer if isinstance(answer, list) else [answer]
+        if len(answer) != len(chunk):
+            raise WeatherError(f"Open-Meteo menjawab {len(answer)} lokasi untuk {len(chunk)} yang diminta")
+        for cell, data in zip(chunk, answer):
+            absent = [block for block in blocks if not isinstance(data, dict) or not isinstance(data.get(block), dict)]
+            if absent:
+                raise WeatherError(f"respons Open-Meteo tanpa data {', '.join(absent)}")
+            fetched[cell] = {block: data[block] for block in blocks}
+    fetched_at = time.time()
+    with _cache_lock:
+        for cell, cell_blocks in fetched.items():
+            for block, data in cell_blocks.items():
+                _put((block, *cell), data, fetched_at)
+    _persist(fetched, fetched_at)
+    return fetched
+
+def _refresh_failed(cells, blocks):
+    # Keep serving the stale blocks; the next lookup tries again
+    with _cache_lock:
+        for cell in cells:
+            for block in blocks:
+                entry = _cache.get((block, *cell))
+                if entry is not None:
+                    entry['refreshing'] = False
+
+def _refresh(cells, blocks):
+    try:
+        _fetch_cells(cells, blocks)
+        _count(refreshes=1)
+    except Exception:
+        _refresh_failed(cells, blocks)
+
+def _lookup(cells, blocks):
+    """{cell: {block: data}} for the cells, from the cache or Open-Meteo (see get_weather_many)."""
+    now = time.time()
+    found = {cell: {} for cell in cells}
+    stale, owned, waits = [], [], []
+    expired = missing = 0
+    with _cache_lock:
+        for cell in found:
+            cell_stale = cell_owned = False
+            for block in blocks:
+                key = (block, *cell)
+                entry = _cache.get(key)
+                ttl = BLOCKS[block][1]
+                age = now - entry['fetched_at'] if entry is not None else None
+                if age is not None and age < max(ttl, MAX_STALE_HOURS * 3600):
+                    _cache.move_to_end(key)
+                    found[cell][block] = entry['data']
+                    expired += age >= ttl
+                    if age >= ttl and not entry['refreshing']:
+                        entry['refreshing'] = cell_stale = True
+                elif key in _inflight:
+                    waits.append((cell, block, _inflight[key]))
+                else:
+                    missing += 1
+                    cell_owned = True
+            if cell_owned:
+                owned.append(cell)
+            elif cell_stale:
+                stale.append(cell)
+        futures = {cell: Future() for cell in owned}
+        for cell in owned:
+            for block in blocks:
+                _inflight.setdefault((block, *cell), futures[cell])
+    lookups = len(found) * len(blocks)
+    _count(hits=lookups - missing - expired, stale_hits=expired, misses=missing)
+
+    if owned:
+        try:
+            fetched = _fetch_cells(owned + stale, blocks)
+        except BaseException as e:
+            for future in futures.values():
+                future.set_exception(e)
+            _refresh_failed(stale, blocks)
+            raise
+        finally:
+            with _cache_lock:
+                for cell in owned:
+                    for block in blocks:
+                        if _inflight.get((block, *cell)) is futures[cell]:
+                            del _inflight[(block, *cell)]
+        for cell, future in futures.items():
+            future.set_result(fetched[cell])
+        for cell, data in fetched.items():
+            found[cell].update(data)
+    elif stale:
+        _refresh_pool.submit(_refresh, stale, blocks)
+    for cell, block, waiting in waits:
+        found[cell][block] = waiting.result()[block]
+    return found
+
+def _last_known(cells, blocks, reason):
+    """{cell: {block: data}} with whatever blocks the cache holds, however old.
+
+    Blocks never fetched for a cell are left out; WeatherError only if
+    nothing at all is known for any of the cells.
+    """
+    with _cache_lock:
+        entries = {(block, *cell): _cache.get((block, *cell)) for cell in cells for block in blocks}
+    known = {key: entry for key, entry in entries.items() if entry is not None}
+    if not known:
+        raise WeatherError(f"{reason}; belum ada data cuaca tersimpan untuk lokasi ini")
+    _count(offline_hits=len(known))
+    return {cell: {block: known[(block, *cell)]['data'] for block in blocks if (block, *cell) in known}
+            for cell in cells}
+
+def get_weather_many(locations, blocks=('current', 'hourly', 'daily')):
+    """{name: {block: data, 'fetched_at': {block: unix time}, 'offline': reason or None, 'missing': [block]}}
+    for {name: (lat, lon)}.
+
+    Locations are looked up by grid cell, in the shared cache and, for
+    blocks it does not hold, the on-disk store. Fresh blocks come from the
+    cache. Cells missing a block are fetched in one multi-location request,
+    together with any cells that are only stale; if nothing is missing,
+    stale cells are served as they are and refreshed in the background.
+    Concurrent misses for the same cell and block wait for one fetch.
+
+    If Open-Meteo cannot be reached, or offline mode is on, the last-known
+    blocks are served however old they are, with 'offline' saying why.
+    Blocks never fetched for a location are then absent from its entry and
+    listed under 'missing' (empty when online); WeatherError only when no
+    block is known for any location.
+    """
+    cells = {name: grid_cell(lat, lon) for name, (lat, lon) in locations.items()}
+    unique = list(dict.fromkeys(cells.values()))
+    _warm([(block, *cell) for cell in unique for block in blocks])
+    offline = "mode offline aktif" if _offline_mode else None
+    if offline:
+        found = _last_known(unique, blocks, offline)
+    else:
+        try:
+            found = _lookup(unique, blocks)
+        except WeatherError as e:
+            offline = str(e)
+            found = _last_known(unique, blocks, offline)
+    now = time.time()
+    with _cache_lock:
+        fetched_at = {cell: {block: _cache.get((block, *cell), {}).get('fetched_at', now) for block in found[cell]}
+                      for cell in unique}
+    return {name: copy.deepcopy(found[cell]) | {
+        'fetched_at': fetched_at[cell],
+        'offline': offline,
+        'missing': [block for block in blocks if block not in found[cell]],
+    } for name, cell in cells.items()}
+
+def get_weather(lat, lon, blocks=('current', 'hourly', 'daily')):
+    """{block: data, 'fetched_at', 'offline', 'missing'} for the grid cell of (lat, lon); see get_weather_many."""
+    return get_weather_many({None: (lat, lon)}, blocks)[None]
+
+def clear_weather_cache(stored=False):
+    """Empty the in-memory cache; with stored=True also everything in WEATHER_DB_PATH."""
+    with _cache_lock:
+        _cache.clear()
+    if stored:
+        with _weather_db() as conn:
+            conn.execute("DELETE FROM weather_observations")
+            conn.commit()
+
+def get_current_weather(lat, lon):
+    return get_weather(lat, lon, ('current',))['current']
+
+def get_daily_forecast(lat, lon):
+    return get_weather(lat, lon, ('daily',))['daily']
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fetch weather through the cache and inspect the on-disk store")
+    parser.add_argument('--url', default=FORECAST_URL, help="forecast endpoint (default: %(default)s)")
+    parser.add_argument('--db', default=WEATHER_DB_PATH, help="weather store (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    get_cmd = commands.add_parser('get', help="current, hourly and daily weather for a location")
+    get_cmd.add_argument('lat', type=float)
+    get_cmd.add_argument('lon', type=float)
+    get_cmd.add_argument('--offline', action='store_true', help="serve from the store without contacting Open-Meteo")
+    commands.add_parser('stored', help="cells and blocks in the store, newest fetch first")
+    commands.add_parser('clear', help="delete everything in the store")
+    args = parser.parse_args()
+
+    FORECAST_URL, WEATHER_DB_PATH = args.url, args.db
+    if args.command == 'get':
+        set_offline_mode(args.offline)
+        try:
+            weather = get_weather(args.lat, args.lon)
+        except WeatherError as e:
+            raise SystemExit(f"{grid_cell(args.lat, args.lon)}: {e}")
+        for block in BLOCKS:
+            if block in weather['missing']:
+                print(f"{block:<8} never fetched")
+                continue
+            data = weather[block]
+            steps = f"{data['time']}" if block == 'current' else f"{len(data['time'])} steps from {data['time'][0]}"
+            print(f"{block:<8} {steps}, fetched {format_age(weather['fetched_at'][block])}")
+        if weather['offline']:
+            print(f"offline: {weather['offline']}")
+    elif args.command == 'stored':
+        for entry in get_stored_weather():
+            print(f"{entry['lat']:>10} {entry['lon']:>11}  {entry['block']:<8}{entry['rows']:>6} rows  "
+                  f"{format_age(entry['fetched_at'])}")
+    elif args.command == 'clear':
+        clear_weather_cache(stored=True)
+        print(f"{WEATHER_DB_PATH}: cleared")